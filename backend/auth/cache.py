@@ -0,0 +1,159 @@
+"""In-process cache of authenticated users.
+
+get_current_user runs on every authenticated request (each chat message,
+history fetch and file download). Caching the UserInfo by user ID for a
+short TTL removes that query from hot endpoints. Entries are invalidated
+explicitly when a user's status changes or the user is deleted; with
+several workers, the invalidation is broadcast over PostgreSQL
+LISTEN/NOTIFY so every process drops its copy.
+"""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+from uuid import UUID
+
+import asyncpg
+
+from backend.auth.models import UserInfo
+from backend.db import execute
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached user stays valid (0 disables the cache)
+USER_CACHE_TTL_SECONDS = float(os.environ.get("AUTH_USER_CACHE_TTL", "30"))
+# Maximum number of cached users (least recently used are evicted)
+USER_CACHE_MAX_SIZE = int(os.environ.get("AUTH_USER_CACHE_SIZE", "1024"))
+# PostgreSQL channel used to broadcast invalidations between workers
+INVALIDATION_CHANNEL = "user_cache_invalidate"
+
+
+class UserCache:
+    """TTL + LRU cache of UserInfo keyed by user ID."""
+
+    def __init__(
+        self,
+        max_size: int = USER_CACHE_MAX_SIZE,
+        ttl_seconds: float = USER_CACHE_TTL_SECONDS,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[UUID, tuple[float, UserInfo]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether caching is active."""
+        return self.ttl_seconds > 0 and self.max_size > 0
+
+    def get(self, user_id: UUID) -> UserInfo | None:
+        """Return the cached user, or None if absent or expired."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return user
+
+    def set(self, user: UserInfo) -> None:
+        """Cache a user, evicting the least recently used entry if full."""
+        if not self.enabled:
+            return
+        self._entries[user.id] = (time.monotonic() + self.ttl_seconds, user)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: UUID) -> None:
+        """Drop a user from the cache."""
+        if self._entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop all cached users."""
+        self._entries.clear()
+
+    @property
+    def stats(self) -> dict:
+        """Return cache statistics."""
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+_user_cache = UserCache()
+
+
+def get_user_cache() -> UserCache:
+    """Return the process-wide user cache."""
+    return _user_cache
+
+
+async def invalidate_user(user_id: UUID) -> None:
+    """Invalidate a user locally and notify other workers."""
+    _user_cache.invalidate(user_id)
+    try:
+        await execute("SELECT pg_notify($1, $2)", INVALIDATION_CHANNEL, str(user_id))
+    except Exception as e:
+        logger.warning(f"Failed to broadcast user cache invalidation: {e}")
+
+
+# ============================================
+# Cross-worker invalidation (LISTEN/NOTIFY)
+# ============================================
+_listener_conn: asyncpg.Connection | None = None
+
+
+def _on_invalidation(conn, pid, channel, payload) -> None:
+    """Handle a NOTIFY from any worker (including this one)."""
+    try:
+        _user_cache.invalidate(UUID(payload))
+    except ValueError:
+        logger.warning(f"Ignoring malformed user cache invalidation: {payload!r}")
+
+
+def _on_listener_terminated(conn) -> None:
+    """Invalidations may be missed from now on; fall back to TTL expiry."""
+    global _listener_conn
+    logger.warning("User cache invalidation listener disconnected")
+    _user_cache.clear()
+    _listener_conn = None
+
+
+async def start_invalidation_listener(database_url: str) -> None:
+    """Listen for invalidations broadcast by other workers.
+
+    Uses a dedicated connection so the listener does not hold a slot in the
+    shared pool.
+    """
+    global _listener_conn
+    if _listener_conn is not None or not _user_cache.enabled:
+        return
+    conn = await asyncpg.connect(database_url)
+    await conn.add_listener(INVALIDATION_CHANNEL, _on_invalidation)
+    conn.add_termination_listener(_on_listener_terminated)
+    _listener_conn = conn
+
+
+async def stop_invalidation_listener() -> None:
+    """Close the invalidation listener connection."""
+    global _listener_conn
+    if _listener_conn is not None:
+        conn = _listener_conn
+        _listener_conn = None
+        conn.remove_termination_listener(_on_listener_terminated)
+        await conn.close()
@@ -4,8 +4,9 @@ from datetime import datetime
 from uuid import UUID
 
 from backend.db import fetch, fetchrow, fetchval, execute
+from backend.auth.cache import invalidate_user
 from backend.auth.models import UserInfo, UserRole, UserStatus
-from backend.auth.security import hash_password
+from backend.auth.security import hash_password_async
 
 
 async def get_user_by_username(username: str) -> dict | None:
@@ -32,7 +33,7 @@ async def get_user_by_id(user_id: UUID) -> dict | None:
 
 async def create_user(username: str, password: str, role: UserRole = UserRole.USER) -> UserInfo:
     """Create a new user."""
-    password_hash = hash_password(password)
+    password_hash = await hash_password_async(password)
     row = await fetchrow(
         """INSERT INTO users (username, password_hash, role)
            VALUES ($1, $2, $3)
@@ -55,6 +56,7 @@ async def update_user_status(user_id: UUID, status: UserStatus) -> UserInfo | No
            RETURNING id, username, role, status, created_at""",
         status.value, user_id
     )
+    await invalidate_user(user_id)
     if row:
         return UserInfo(
             id=row["id"],
@@ -69,6 +71,7 @@ async def update_user_status(user_id: UUID, status: UserStatus) -> UserInfo | No
 async def delete_user(user_id: UUID) -> bool:
     """Delete a user by ID."""
     result = await execute("DELETE FROM users WHERE id = $1", user_id)
+    await invalidate_user(user_id)
     return result == "DELETE 1"
 
 
@@ -4,6 +4,7 @@ from uuid import UUID
 
 from fastapi import Cookie, HTTPException, status
 
+from backend.auth.cache import get_user_cache
 from backend.auth.database import get_user_by_id
 from backend.auth.models import UserInfo, UserRole, UserStatus
 from backend.auth.security import decode_access_token
@@ -39,26 +40,32 @@ async def get_current_user(access_token: str | None = Cookie(default=None)) -> U
             detail="Invalid user ID in token"
         )
 
-    user_data = await get_user_by_id(user_uuid)
-    if not user_data:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
+    cache = get_user_cache()
+    user = cache.get(user_uuid)
+    if user is None:
+        user_data = await get_user_by_id(user_uuid)
+        if not user_data:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
+
+        user = UserInfo(
+            id=user_data["id"],
+            username=user_data["username"],
+            role=UserRole(user_data["role"]),
+            status=UserStatus(user_data["status"]),
+            created_at=user_data["created_at"]
         )
+        cache.set(user)
 
-    if user_data["status"] == "disabled":
+    if user.status == UserStatus.DISABLED:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Account has been disabled"
         )
 
-    return UserInfo(
-        id=user_data["id"],
-        username=user_data["username"],
-        role=UserRole(user_data["role"]),
-        status=UserStatus(user_data["status"]),
-        created_at=user_data["created_at"]
-    )
+    return user
 
 
 async def require_admin(access_token: str | None = Cookie(default=None)) -> UserInfo:
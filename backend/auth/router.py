@@ -20,10 +20,22 @@ from backend.auth.models import (
     UserRole,
     UserStatusUpdate,
 )
-from backend.auth.security import verify_password, create_access_token
+from backend.auth.security import PasswordHasherBusyError, verify_password_async, create_access_token
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
+# Seconds clients should wait before retrying when the hashing queue is full
+HASHER_RETRY_AFTER = 1
+
+
+def _hasher_busy(detail: str) -> HTTPException:
+    """Build the 503 returned when the password hashing queue is full."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": str(HASHER_RETRY_AFTER)},
+    )
+
 
 @router.post("/login", response_model=LoginResponse)
 async def login(request: LoginRequest, response: Response):
@@ -36,7 +48,12 @@ async def login(request: LoginRequest, response: Response):
             detail="Invalid username or password"
         )
 
-    if not verify_password(request.password, user_data["password_hash"]):
+    try:
+        password_ok = await verify_password_async(request.password, user_data["password_hash"])
+    except PasswordHasherBusyError:
+        raise _hasher_busy("Too many login attempts in progress. Please retry shortly.")
+
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password"
@@ -113,11 +130,14 @@ async def create_new_user(
             detail="Username already exists"
         )
 
-    return await create_user(
-        username=user_data.username,
-        password=user_data.password,
-        role=user_data.role
-    )
+    try:
+        return await create_user(
+            username=user_data.username,
+            password=user_data.password,
+            role=user_data.role
+        )
+    except PasswordHasherBusyError:
+        raise _hasher_busy("Password hashing is busy. Please retry shortly.")
 
 
 @users_router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -1,8 +1,12 @@
 """Security utilities for password hashing and JWT handling."""
 
+import asyncio
 import os
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, TypeVar
 
 import bcrypt
 from jose import JWTError, jwt
@@ -12,11 +16,20 @@ JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "dev-secret-key-change-in-prod
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = int(os.environ.get("JWT_EXPIRATION", "24"))
 
+# bcrypt cost factor for new hashes (existing hashes keep the cost they were created with)
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+# Threads dedicated to password hashing, so bcrypt never runs on the event loop
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+# Hashing jobs allowed to wait for a worker before new ones are rejected
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+T = TypeVar("T")
+
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt."""
     password_bytes = password.encode("utf-8")
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     return bcrypt.hashpw(password_bytes, salt).decode("utf-8")
 
 
@@ -28,6 +41,84 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     )
 
 
+class PasswordHasherBusyError(RuntimeError):
+    """Raised when the password hashing queue is full."""
+
+
+class PasswordHashPool:
+    """Bounded thread pool for bcrypt work.
+
+    bcrypt releases the GIL, so running it in threads keeps the event loop
+    (and every SSE stream on it) responsive during a burst of logins.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._pending = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run a hashing function on the pool.
+
+        Raises:
+            PasswordHasherBusyError: If ``max_queue`` jobs are already waiting.
+        """
+        if self._pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PasswordHasherBusyError("Password hashing queue is full")
+
+        self._pending += 1
+        self.max_queue_depth = max(self.max_queue_depth, self._pending - self.workers)
+        start = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+            self.completed += 1
+            self.total_seconds += time.monotonic() - start
+
+    @property
+    def stats(self) -> dict:
+        """Return queue depth and latency statistics."""
+        return {
+            "workers": self.workers,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "in_flight": min(self._pending, self.workers),
+            "queued": max(0, self._pending - self.workers),
+            "max_queue_depth": self.max_queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_ms": round(self.total_seconds * 1000 / self.completed, 2) if self.completed else 0.0,
+        }
+
+
+_hash_pool: PasswordHashPool | None = None
+
+
+def get_password_hash_pool() -> PasswordHashPool:
+    """Return the process-wide password hashing pool."""
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = PasswordHashPool()
+    return _hash_pool
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the dedicated hashing pool."""
+    return await get_password_hash_pool().run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the dedicated hashing pool."""
+    return await get_password_hash_pool().run(verify_password, plain_password, hashed_password)
+
+
 def create_access_token(data: dict[str, Any], expires_delta: timedelta | None = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
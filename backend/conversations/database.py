@@ -129,3 +129,36 @@ async def touch_conversation(thread_id: str, user_id: UUID) -> None:
            WHERE thread_id = $1 AND user_id = $2 AND NOT is_deleted""",
         thread_id, user_id
     )
+
+
+async def touch_or_create_conversation(
+    user_id: UUID, thread_id: str, title: str = "New Conversation"
+) -> Conversation | None:
+    """Create the thread's conversation or bump its updated_at in one round trip.
+
+    Replaces the get_conversation_by_thread + touch_conversation /
+    create_conversation sequence on the chat path.
+
+    Returns:
+        The conversation, or None when the thread belongs to another user
+        or its conversation was deleted (the existing row is left untouched).
+    """
+    row = await fetchrow(
+        """INSERT INTO conversations (user_id, thread_id, title)
+           VALUES ($1, $2, $3)
+           ON CONFLICT (thread_id) DO UPDATE
+               SET updated_at = NOW()
+               WHERE conversations.user_id = EXCLUDED.user_id
+                 AND NOT conversations.is_deleted
+           RETURNING id, thread_id, title, created_at, updated_at""",
+        user_id, thread_id, title[:50]  # Truncate to 50 chars
+    )
+    if row:
+        return Conversation(
+            id=row["id"],
+            thread_id=row["thread_id"],
+            title=row["title"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"]
+        )
+    return None
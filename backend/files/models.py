@@ -47,3 +47,10 @@ class FileSummary(BaseModel):
     size_bytes: int
     created_at: datetime
     download_url: str
+
+
+class UploadSessionCreate(BaseModel):
+    """Request to start a resumable upload."""
+    filename: str
+    size: int = Field(ge=0)
+    content_type: str | None = None
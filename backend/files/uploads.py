@@ -0,0 +1,429 @@
+"""Streamed and resumable file uploads.
+
+Uploads are written to disk chunk by chunk in the thread pool while their
+SHA-256 is computed, so a request never holds a whole file in memory and is
+aborted as soon as it passes the size limit. The digest is handed to document
+ingestion, which keys its parse cache by content, so the file is not read
+again just to hash it.
+
+Stored content is deduplicated per owner: every upload is hard-linked into
+``UPLOAD_DIR/.blobs/{owner}/{sha256}``, and a later upload of the same bytes
+by the same owner is replaced by a link to that blob. Each upload keeps its
+own file ID, but identical content is stored once. Blobs are never shared
+between owners, so an upload reveals nothing about other users' files. The
+link count is the blob's reference count: once every upload linking to it
+has been removed, the blob is deleted by the next sweep of that owner's
+blobs.
+
+Multipart bodies are spooled by the framework before the handler sees the
+file, so single-request uploads are limited to ``MAX_SINGLE_UPLOAD_BYTES``
+and the cap is enforced on the raw request stream. Larger files use
+resumable upload sessions:
+
+1. ``create`` records the file name and total size and returns an upload ID.
+2. The client appends chunks at the current offset. After a dropped
+   connection it asks for the offset and continues from there.
+3. Once the last byte arrives the file is moved into place under a new file ID.
+
+Partial files and their session metadata live under ``UPLOAD_DIR/.partial/``
+and survive a restart. Neither ``.partial`` nor ``.blobs`` is alphanumeric,
+so they never collide with a file ID.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from fastapi import UploadFile
+
+from backend.tools.sandbox_files import UPLOAD_DIR
+
+logger = logging.getLogger(__name__)
+
+MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", "200"))  # Largest accepted upload
+UPLOAD_CHUNK_MB = int(os.environ.get("UPLOAD_CHUNK_MB", "8"))  # Chunk size suggested to resumable clients
+UPLOAD_SESSION_TTL = int(os.environ.get("UPLOAD_SESSION_TTL", "86400"))  # Idle seconds before a partial upload is discarded
+MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
+UPLOAD_CHUNK_BYTES = UPLOAD_CHUNK_MB * 1024 * 1024
+# Largest single-request (multipart) upload; matches the frontend's chunking threshold
+MAX_SINGLE_UPLOAD_BYTES = 8 * 1024 * 1024
+PARTIAL_DIR_NAME = ".partial"
+BLOB_DIR_NAME = ".blobs"
+_READ_SIZE = 1024 * 1024  # Bytes read per step from a spooled multipart file
+
+
+class UploadTooLargeError(ValueError):
+    """The upload exceeds the size limit."""
+
+
+class UploadOffsetError(ValueError):
+    """A chunk does not start at the upload's current offset."""
+
+    def __init__(self, expected: int):
+        super().__init__(f"Chunk must start at offset {expected}")
+        self.expected = expected
+
+
+class UploadSessionNotFoundError(LookupError):
+    """The upload session does not exist, expired or belongs to another user."""
+
+
+def safe_filename(name: str | None) -> str:
+    """Strip any directory components from a client-supplied file name."""
+    return Path(name or "").name or "uploaded_file"
+
+
+@dataclass
+class StoredUpload:
+    """A completed upload in its final location."""
+
+    file_id: str
+    path: Path
+    size: int
+    sha256: str
+    deduplicated: bool = False  # Same content was already stored
+
+
+class _Sink:
+    """Appends to an open file while hashing; writes run in the thread pool."""
+
+    def __init__(self, f, sha, written: int = 0):
+        self._file = f
+        self.sha = sha
+        self.written = written
+
+    def _write(self, data: bytes) -> None:
+        self._file.write(data)
+        self.sha.update(data)  # hashlib releases the GIL for large buffers
+        self.written += len(data)
+
+    async def consume(self, chunks: AsyncIterator[bytes], limit: int) -> None:
+        """
+        Write chunks until the stream ends
+
+        Raises:
+            UploadTooLargeError: the stream goes past ``limit`` bytes; nothing
+                beyond the limit is written
+        """
+        loop = asyncio.get_running_loop()
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            if self.written + len(chunk) > limit:
+                raise UploadTooLargeError(f"File too large. Maximum size: {_describe(limit)}")
+            await loop.run_in_executor(None, self._write, chunk)
+
+
+async def limit_stream(chunks: AsyncIterator[bytes], limit: int) -> AsyncIterator[bytes]:
+    """
+    Pass chunks through, failing once more than ``limit`` bytes have arrived
+
+    Raises:
+        UploadTooLargeError: the stream goes past ``limit`` bytes
+    """
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > limit:
+            raise UploadTooLargeError(f"Request too large. Maximum size: {_describe(limit)}")
+        yield chunk
+
+
+def _describe(size: int) -> str:
+    if size >= 1024 * 1024 and size % (1024 * 1024) == 0:
+        return f"{size // (1024 * 1024)}MB"
+    return f"{size} bytes"
+
+
+def _new_upload_path(filename: str) -> tuple[str, Path]:
+    file_id = uuid.uuid4().hex[:8]
+    file_dir = UPLOAD_DIR / file_id
+    file_dir.mkdir(parents=True, exist_ok=True)
+    return file_id, file_dir / filename
+
+
+def _sweep_blobs(blob_dir: Path) -> None:
+    """Delete blobs no upload links to any more (their only link is the blob itself)."""
+    for blob in blob_dir.iterdir():
+        try:
+            if blob.stat().st_nlink <= 1:
+                blob.unlink()
+        except OSError:
+            continue
+
+
+def _dedupe(path: Path, sha256: str, owner: str) -> bool:
+    """
+    Share storage with the owner's earlier uploads of the same content (runs in a thread)
+
+    Returns:
+        True if ``path`` now links to an existing blob
+    """
+    blob_dir = UPLOAD_DIR / BLOB_DIR_NAME / owner
+    blob = blob_dir / sha256
+    try:
+        blob_dir.mkdir(parents=True, exist_ok=True)
+        _sweep_blobs(blob_dir)
+        if blob.exists() and blob.stat().st_size == path.stat().st_size:
+            link = path.with_name(path.name + ".link")
+            os.link(blob, link)
+            os.replace(link, path)
+            return True
+        os.link(path, blob)
+    except FileExistsError:
+        pass  # Another upload of the same content registered the blob first
+    except OSError as e:
+        logger.warning(f"Failed to deduplicate upload {path}: {e}")
+    return False
+
+
+def _discard(path: Path) -> None:
+    path.unlink(missing_ok=True)
+    try:
+        path.parent.rmdir()
+    except OSError:
+        pass
+
+
+async def save_upload(
+    upload: UploadFile, owner: str, max_bytes: int = MAX_SINGLE_UPLOAD_BYTES
+) -> StoredUpload:
+    """
+    Stream a multipart upload by ``owner`` to a new file ID
+
+    Raises:
+        UploadTooLargeError: the file is larger than ``max_bytes``
+    """
+    loop = asyncio.get_running_loop()
+    file_id, path = await loop.run_in_executor(None, _new_upload_path, safe_filename(upload.filename))
+
+    async def chunks():
+        while chunk := await upload.read(_READ_SIZE):
+            yield chunk
+
+    sink = None
+    try:
+        with open(path, "wb") as f:
+            sink = _Sink(f, hashlib.sha256())
+            await sink.consume(chunks(), max_bytes)
+    except BaseException:
+        await loop.run_in_executor(None, _discard, path)
+        raise
+    sha256 = sink.sha.hexdigest()
+    deduplicated = await loop.run_in_executor(None, _dedupe, path, sha256, owner)
+    return StoredUpload(file_id, path, sink.written, sha256, deduplicated)
+
+
+@dataclass
+class UploadSession:
+    """An unfinished resumable upload."""
+
+    upload_id: str
+    owner: str
+    filename: str
+    content_type: Optional[str]
+    size: int
+    received: int = 0
+    updated: float = field(default_factory=time.time)
+    sha: "hashlib._Hash" = field(default_factory=hashlib.sha256, repr=False)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+    @property
+    def complete(self) -> bool:
+        return self.received >= self.size
+
+    def to_dict(self) -> dict:
+        return {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "offset": self.received,
+            "size": self.size,
+            "chunk_size": UPLOAD_CHUNK_BYTES,
+        }
+
+
+class UploadSessionManager:
+    """Tracks resumable uploads; partial data is kept on disk between requests."""
+
+    def __init__(
+        self,
+        directory: Path,
+        max_bytes: int = MAX_UPLOAD_BYTES,
+        ttl: float = UPLOAD_SESSION_TTL,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sessions: dict[str, UploadSession] = {}
+
+    def _data_path(self, upload_id: str) -> Path:
+        return self.directory / f"{upload_id}.part"
+
+    def _meta_path(self, upload_id: str) -> Path:
+        return self.directory / f"{upload_id}.json"
+
+    def _remove(self, upload_id: str) -> None:
+        self._data_path(upload_id).unlink(missing_ok=True)
+        self._meta_path(upload_id).unlink(missing_ok=True)
+
+    def _sweep(self) -> list[str]:
+        """Delete partial uploads idle for longer than the TTL (runs in a thread)."""
+        if not self.directory.is_dir():
+            return []
+        cutoff = time.time() - self.ttl
+        expired = []
+        for meta in self.directory.glob("*.json"):
+            upload_id = meta.stem
+            data = self._data_path(upload_id)
+            try:
+                updated = max(meta.stat().st_mtime, data.stat().st_mtime if data.exists() else 0)
+            except OSError:
+                continue
+            if updated < cutoff:
+                self._remove(upload_id)
+                expired.append(upload_id)
+        return expired
+
+    def _start(self, session: UploadSession) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._data_path(session.upload_id).touch()
+        self._meta_path(session.upload_id).write_text(json.dumps({
+            "owner": session.owner,
+            "filename": session.filename,
+            "content_type": session.content_type,
+            "size": session.size,
+        }))
+
+    def _restore(self, upload_id: str) -> Optional[UploadSession]:
+        """Rebuild a session from disk after a restart, rehashing the partial data."""
+        try:
+            meta = json.loads(self._meta_path(upload_id).read_text())
+            data = self._data_path(upload_id)
+            session = UploadSession(
+                upload_id=upload_id,
+                owner=meta["owner"],
+                filename=meta["filename"],
+                content_type=meta["content_type"],
+                size=meta["size"],
+                updated=data.stat().st_mtime,
+            )
+            with open(data, "rb") as f:
+                for block in iter(lambda: f.read(_READ_SIZE), b""):
+                    session.sha.update(block)
+                    session.received += len(block)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Failed to restore upload session {upload_id}: {e}")
+            return None
+        return session
+
+    async def create(
+        self, owner: str, filename: str, size: int, content_type: Optional[str] = None
+    ) -> UploadSession:
+        """
+        Start a resumable upload of ``size`` bytes
+
+        Raises:
+            UploadTooLargeError: ``size`` is over the limit
+        """
+        if size > self.max_bytes:
+            raise UploadTooLargeError(f"File too large. Maximum size: {_describe(self.max_bytes)}")
+        session = UploadSession(
+            upload_id=uuid.uuid4().hex,
+            owner=owner,
+            filename=safe_filename(filename),
+            content_type=content_type,
+            size=size,
+        )
+        loop = asyncio.get_running_loop()
+        for upload_id in await loop.run_in_executor(None, self._sweep):
+            self._sessions.pop(upload_id, None)
+        await loop.run_in_executor(None, self._start, session)
+        self._sessions[session.upload_id] = session
+        return session
+
+    async def get(self, upload_id: str, owner: str) -> UploadSession:
+        """
+        Look up an unfinished upload owned by ``owner``
+
+        Raises:
+            UploadSessionNotFoundError: unknown, expired or someone else's upload
+        """
+        # Upload IDs are hex, which also rules out path traversal
+        session = self._sessions.get(upload_id) if upload_id.isalnum() else None
+        if session is None and upload_id.isalnum():
+            session = await asyncio.get_running_loop().run_in_executor(None, self._restore, upload_id)
+            if session is not None:
+                session = self._sessions.setdefault(upload_id, session)
+        if session is None or session.owner != owner or time.time() - session.updated > self.ttl:
+            raise UploadSessionNotFoundError(f"Upload {upload_id} not found")
+        return session
+
+    async def append(
+        self, session: UploadSession, offset: int, chunks: AsyncIterator[bytes]
+    ) -> Optional[StoredUpload]:
+        """
+        Append a chunk that starts at ``offset``
+
+        Bytes received before the stream fails are kept, so the client can
+        resume from the offset reported afterwards.
+
+        Returns:
+            The stored file once the last byte has arrived, otherwise None
+
+        Raises:
+            UploadOffsetError: ``offset`` is not the current offset, or another
+                chunk for this upload is still being written
+            UploadTooLargeError: the chunk goes past the declared size
+        """
+        if session.lock.locked() or offset != session.received:
+            raise UploadOffsetError(session.received)
+        loop = asyncio.get_running_loop()
+        async with session.lock:
+            f = await loop.run_in_executor(None, open, self._data_path(session.upload_id), "ab")
+            sink = _Sink(f, session.sha, session.received)
+            try:
+                await sink.consume(chunks, session.size)
+            finally:
+                session.received = sink.written
+                session.updated = time.time()
+                await loop.run_in_executor(None, f.close)
+            if not session.complete:
+                return None
+            stored = await loop.run_in_executor(None, self._finish, session)
+            self._sessions.pop(session.upload_id, None)
+            return stored
+
+    def _finish(self, session: UploadSession) -> StoredUpload:
+        file_id, path = _new_upload_path(session.filename)
+        os.replace(self._data_path(session.upload_id), path)
+        self._meta_path(session.upload_id).unlink(missing_ok=True)
+        sha256 = session.sha.hexdigest()
+        return StoredUpload(file_id, path, session.received, sha256, _dedupe(path, sha256, session.owner))
+
+    async def abort(self, session: UploadSession) -> None:
+        """Discard an unfinished upload."""
+        self._sessions.pop(session.upload_id, None)
+        await asyncio.get_running_loop().run_in_executor(None, self._remove, session.upload_id)
+
+
+# ============================================
+# Global singleton
+# ============================================
+_sessions: Optional[UploadSessionManager] = None
+
+
+def get_upload_sessions() -> UploadSessionManager:
+    """Return the global resumable upload manager."""
+    global _sessions
+    if _sessions is None:
+        _sessions = UploadSessionManager(UPLOAD_DIR / PARTIAL_DIR_NAME)
+    return _sessions
@@ -0,0 +1,171 @@
+"""Incremental JSON parsing for streamed tool-call arguments.
+
+LLM providers stream tool-call arguments as arbitrary JSON text fragments.
+Re-joining every fragment and calling ``json.loads`` on the accumulated text
+costs O(n^2) for an n-byte argument. ``IncrementalJSONParser`` instead scans
+each fragment exactly once, tracking string/escape state and nesting depth,
+and only decodes the document when the top-level value has been closed.
+"""
+
+import json
+import re
+from typing import Any
+
+# Characters that matter inside a JSON string: the closing quote and escapes.
+_STRING_SPECIAL = re.compile(r'[\\"]')
+# Characters that matter outside strings: nesting delimiters and string starts.
+_STRUCTURAL = re.compile(r'[{}\[\]"]')
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalJSONParser:
+    """Consume a JSON document fragment by fragment and signal completion.
+
+    Objects, arrays and strings at the top level are detected as complete by
+    the scanner, so ``json.loads`` runs once per document. Bare scalars
+    (numbers, ``true``...) have no closing delimiter; for those the parser
+    falls back to attempting a decode after every fragment.
+
+    Usage:
+        parser = IncrementalJSONParser()
+        for fragment in fragments:
+            if parser.feed(fragment):
+                args = parser.value
+    """
+
+    __slots__ = (
+        "_parts",
+        "_size",
+        "_depth",
+        "_in_string",
+        "_escape",
+        "_started",
+        "_scalar",
+        "_complete",
+        "_failed",
+        "_value",
+    )
+
+    def __init__(self) -> None:
+        self._parts: list[str] = []
+        self._size = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self._scalar = False
+        self._complete = False
+        self._failed = False
+        self._value: Any = None
+
+    @property
+    def complete(self) -> bool:
+        """True once a full top-level value has been decoded."""
+        return self._complete and not self._failed
+
+    @property
+    def failed(self) -> bool:
+        """True if the closed document turned out not to be valid JSON."""
+        return self._failed
+
+    @property
+    def value(self) -> Any:
+        """The decoded value (only meaningful when ``complete`` is True)."""
+        return self._value
+
+    @property
+    def size(self) -> int:
+        """Number of characters consumed so far."""
+        return self._size
+
+    @property
+    def text(self) -> str:
+        """The raw accumulated JSON text."""
+        return "".join(self._parts)
+
+    def feed(self, fragment: str) -> bool:
+        """Consume a fragment and return True once the value is complete.
+
+        Fragments arriving after completion (or after a decode failure) are
+        ignored, mirroring the fact that a tool call has a single argument
+        document.
+        """
+        if self._complete or not fragment:
+            return self.complete
+
+        self._parts.append(fragment)
+        self._size += len(fragment)
+
+        if not self._started:
+            stripped = fragment.lstrip(_WHITESPACE)
+            if not stripped:
+                return False
+            self._started = True
+            self._scalar = stripped[0] not in '{["'
+
+        if self._scalar:
+            return self._try_decode(final=False)
+
+        if self._scan(fragment):
+            return self._try_decode(final=True)
+        return False
+
+    def _scan(self, s: str) -> bool:
+        """Advance the scanner over ``s``; return True when the value closes."""
+        pos = 0
+        n = len(s)
+
+        # An escape started at the end of the previous fragment swallows
+        # the first character of this one.
+        if self._escape:
+            self._escape = False
+            pos = 1
+
+        while pos < n:
+            if self._in_string:
+                m = _STRING_SPECIAL.search(s, pos)
+                if m is None:
+                    return False
+                if m.group() == "\\":
+                    if m.end() >= n:
+                        self._escape = True
+                        return False
+                    pos = m.end() + 1
+                    continue
+                self._in_string = False
+                pos = m.end()
+                if self._depth == 0:
+                    return True
+                continue
+
+            m = _STRUCTURAL.search(s, pos)
+            if m is None:
+                return False
+            ch = m.group()
+            pos = m.end()
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth <= 0:
+                    return True
+        return False
+
+    def _try_decode(self, final: bool) -> bool:
+        """Decode the accumulated text.
+
+        Args:
+            final: Whether the scanner saw the value close; a decode error is
+                then permanent instead of meaning "need more input".
+        """
+        try:
+            self._value = json.loads(self.text)
+        except json.JSONDecodeError:
+            if final:
+                self._complete = True
+                self._failed = True
+            return False
+        self._complete = True
+        return True
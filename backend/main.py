@@ -1,5 +1,6 @@
 """FastAPI application for the deep research chat interface."""
 
+import asyncio
 import atexit
 import logging
 import signal
@@ -11,10 +12,13 @@ logger = logging.getLogger(__name__)
 
 import os
 from dotenv import load_dotenv
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.requests import ClientDisconnect
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from sse_starlette.sse import EventSourceResponse
 
@@ -25,16 +29,37 @@ from backend.supervisor import build_supervisor
 from backend.registry import AGENT_REGISTRY
 from backend.skills import SKILL_REGISTRY
 from backend.models import ChatRequest, ThreadCreate
-from backend.stream_handler import stream_agent_response
-from backend.tools.container_pool import get_pool, shutdown_pool, cleanup_all_sunnyagent_containers
+from backend.stream_handler import COALESCE_STATS, CoalesceConfig, stream_agent_response
+from backend.stream_runs import get_run_manager, shutdown_runs
+from backend.tools.container_pool import (
+    get_pool,
+    get_pool_stats,
+    shutdown_pool,
+    cleanup_all_sunnyagent_containers,
+)
+from backend.tools.sandbox_sessions import get_session_manager, shutdown_sessions
+from backend.tools.document_ingest import get_ingestion_manager, shutdown_ingestion
 from backend.auth.router import router as auth_router, users_router
-from backend.auth.dependencies import get_current_user
+from backend.auth.dependencies import get_current_user, require_admin
 from backend.auth.models import UserInfo
 from backend.conversations.router import router as conversations_router
-from backend.conversations.database import touch_conversation, get_conversation_by_thread, create_conversation
+from backend.conversations.database import get_conversation_by_thread, touch_or_create_conversation
 from backend.auth.database import init_default_admin
+from backend.auth.cache import get_user_cache, start_invalidation_listener, stop_invalidation_listener
+from backend.auth.security import get_password_hash_pool
 from backend.db import init_pool, close_pool, init_tables
 from backend.files import database as files_db
+from backend.files.models import UploadSessionCreate
+from backend.files.uploads import (
+    MAX_SINGLE_UPLOAD_BYTES,
+    StoredUpload,
+    UploadOffsetError,
+    UploadSessionNotFoundError,
+    UploadTooLargeError,
+    get_upload_sessions,
+    limit_stream,
+    save_upload,
+)
 from backend.llm import validate_config, get_current_provider
 
 # Environment variables already loaded above
@@ -125,6 +150,12 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.warning(f"Could not initialize default admin: {e}")
 
+        # Keep the user cache coherent across workers
+        try:
+            await start_invalidation_listener(database_url)
+        except Exception as e:
+            logger.warning(f"User cache invalidation listener unavailable: {e}")
+
     # Initialize checkpointer based on environment
     if database_url:
         # Use PostgreSQL for production
@@ -137,6 +168,7 @@ async def lifespan(app: FastAPI):
                 _checkpointer = saver
                 _agent = build_supervisor(checkpointer=_checkpointer)
                 yield
+                await shutdown_runs()
                 _agent = None
                 _checkpointer = None
         except Exception as e:
@@ -150,13 +182,17 @@ async def lifespan(app: FastAPI):
             _checkpointer = saver
             _agent = build_supervisor(checkpointer=_checkpointer)
             yield
+            await shutdown_runs()
             _agent = None
             _checkpointer = None
 
     # Cleanup
     if database_url:
+        await stop_invalidation_listener()
         await close_pool()
+    await shutdown_sessions()
     await shutdown_pool()
+    shutdown_ingestion()
 
 
 app = FastAPI(title="Deep Research Chat", lifespan=lifespan)
@@ -209,6 +245,43 @@ async def get_skill(name: str):
     }
 
 
+@app.get("/api/admin/sandbox")
+async def sandbox_status(admin: UserInfo = Depends(require_admin)):
+    """Return per-resource-class pool, scheduling, health and session statistics (admin only)."""
+    try:
+        manager = await get_session_manager()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Sandbox unavailable: {e}")
+    return {
+        "pools": get_pool_stats(),
+        "scheduling": manager.scheduler_stats(),
+        "sessions": manager.stats,
+    }
+
+
+@app.get("/api/admin/auth")
+async def auth_status(admin: UserInfo = Depends(require_admin)):
+    """Return password hashing queue and authenticated-user cache statistics (admin only)."""
+    return {
+        "password_hashing": get_password_hash_pool().stats,
+        "user_cache": get_user_cache().stats,
+    }
+
+
+@app.get("/api/admin/streaming")
+async def streaming_status(admin: UserInfo = Depends(require_admin)):
+    """Return SSE text_delta coalescing settings and frame counters (admin only)."""
+    config = CoalesceConfig.from_env()
+    return {
+        "coalescing": {
+            "enabled": config.enabled,
+            "interval_ms": config.interval_ms,
+            "max_bytes": config.max_bytes,
+            **COALESCE_STATS.to_dict(),
+        },
+    }
+
+
 def get_uploaded_file_info(file_id: str) -> dict | None:
     """获取上传文件的元数据"""
     file_dir = Path(f"/tmp/sunnyagent_files/{file_id}")
@@ -227,30 +300,56 @@ def get_uploaded_file_info(file_id: str) -> dict | None:
     }
 
 
+def _parse_last_event_id(value: str | None) -> int | None:
+    """Parse an SSE Last-Event-ID header (sequential integer IDs)."""
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
 @app.post("/api/chat")
-async def chat(request: ChatRequest, current_user: UserInfo = Depends(get_current_user)):
+async def chat(
+    request: ChatRequest,
+    current_user: UserInfo = Depends(get_current_user),
+    last_event_id: str | None = Header(default=None),
+):
     """Send a message and stream the agent's response as SSE events.
 
+    The agent runs as a background task that records its events in a replay
+    log, so a dropped connection does not cancel the run. A request carrying
+    a ``Last-Event-ID`` header for a thread with a recorded run resumes that
+    run (replaying only the missing events) instead of starting a new one.
+
     Routing priority:
     1. If request.skill is set, inject skill instructions and use general agent
     2. If request.agent is set, route directly to that agent (skip supervisor)
     3. Otherwise, use the supervisor for intent-based routing
     """
+    runs = get_run_manager()
+    resume_from = _parse_last_event_id(last_event_id)
+    if resume_from is not None:
+        run = runs.get(request.thread_id)
+        if run is not None and run.user_id == str(current_user.id):
+            return EventSourceResponse(
+                run.subscribe(resume_from),
+                media_type="text/event-stream",
+                ping=15,
+            )
+
     message = request.message
 
-    # Check if this thread has an associated conversation
-    # If not, create one (for threads created before conversation management was added)
-    existing_conv = await get_conversation_by_thread(request.thread_id, current_user.id)
-    if existing_conv:
-        # Update the conversation's updated_at timestamp
-        await touch_conversation(request.thread_id, current_user.id)
-    else:
-        # Create a new conversation for this thread (auto-title from first 50 chars of message)
-        title = request.message[:50] if request.message else "New Conversation"
-        try:
-            await create_conversation(current_user.id, request.thread_id, title)
-        except Exception as e:
-            logger.warning(f"Failed to create conversation for thread {request.thread_id}: {e}")
+    # Bump the thread's conversation, or create it if missing (auto-title from
+    # first 50 chars of message), in a single round trip before streaming starts
+    title = request.message[:50] if request.message else "New Conversation"
+    try:
+        conversation = await touch_or_create_conversation(current_user.id, request.thread_id, title)
+        if conversation is None:
+            logger.warning(f"Thread {request.thread_id} has no conversation owned by user {current_user.id}")
+    except Exception as e:
+        logger.warning(f"Failed to record conversation for thread {request.thread_id}: {e}")
 
     # 如果有上传文件，注入元数据（不是内容）
     if request.file_ids:
@@ -268,7 +367,9 @@ async def chat(request: ChatRequest, current_user: UserInfo = Depends(get_curren
             message = f"""[用户上传了以下文件]
 {files_desc}
 
-你可以使用 read_uploaded_file(file_id) 工具读取文件内容。
+你可以使用 read_uploaded_file(file_id) 工具读取文件内容；
+需要用代码处理完整数据时，调用 execute_python 并传入 file_ids，
+文件位于沙箱的 /input/{{file_id}}/{{文件名}}。
 
 ---
 用户消息: {request.message}"""
@@ -285,23 +386,64 @@ async def chat(request: ChatRequest, current_user: UserInfo = Depends(get_curren
     # Always use supervisor to maintain checkpointer consistency
     target = _agent
 
-    async def event_generator():
-        try:
-            async for event in stream_agent_response(
-                target, request.thread_id, message,
-                user_id=str(current_user.id),
-            ):
-                yield event
-        except Exception:
-            logger.exception("Error streaming agent response")
+    # Run the agent in the background; this response only subscribes to it
+    run = runs.start(
+        request.thread_id,
+        str(current_user.id),
+        lambda counter: stream_agent_response(
+            target, request.thread_id, message,
+            user_id=str(current_user.id),
+            event_counter=counter,
+        ),
+    )
 
     return EventSourceResponse(
-        event_generator(),
+        run.subscribe(),
         media_type="text/event-stream",
         ping=15,  # Keepalive every 15 seconds
     )
 
 
+@app.get("/api/threads/{thread_id}/stream")
+async def resume_thread_stream(
+    thread_id: str,
+    current_user: UserInfo = Depends(get_current_user),
+    last_event_id: str | None = Header(default=None),
+):
+    """Reattach to the thread's current or most recent run.
+
+    Replays events after ``Last-Event-ID`` (or the whole run when absent),
+    then follows the live tail until the run finishes. EventSource clients
+    can use this endpoint directly since it is a GET.
+    """
+    run = get_run_manager().get(thread_id)
+    if run is None or run.user_id != str(current_user.id):
+        raise HTTPException(status_code=404, detail="No active stream for this thread")
+
+    return EventSourceResponse(
+        run.subscribe(_parse_last_event_id(last_event_id)),
+        media_type="text/event-stream",
+        ping=15,
+    )
+
+
+@app.post("/api/threads/{thread_id}/cancel")
+async def cancel_thread_stream(
+    thread_id: str,
+    current_user: UserInfo = Depends(get_current_user),
+):
+    """Stop the thread's active run.
+
+    Runs no longer stop when the client disconnects, so stopping a
+    response has to be requested explicitly.
+    """
+    run = get_run_manager().get(thread_id)
+    if run is None or run.user_id != str(current_user.id):
+        raise HTTPException(status_code=404, detail="No active stream for this thread")
+    # Attached streams receive an error (cancelled) and done frame
+    return {"cancelled": run.cancel("Cancelled by user")}
+
+
 @app.post("/api/threads")
 async def create_thread(current_user: UserInfo = Depends(get_current_user)) -> ThreadCreate:
     """Create a new thread and return its ID.
@@ -357,7 +499,7 @@ async def get_thread_history(
 
 
 # File upload constants
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+_MULTIPART_OVERHEAD = 64 * 1024  # Allowance for multipart boundaries and part headers
 ALLOWED_EXTENSIONS = {
     ".txt", ".md", ".json", ".csv",  # 文本文件
     ".pdf",  # PDF
@@ -367,38 +509,27 @@ ALLOWED_EXTENSIONS = {
 }
 
 
-@app.post("/api/files/upload")
-async def upload_file(
-    file: UploadFile = File(...),
-    current_user: UserInfo = Depends(get_current_user)
-):
-    """Upload a file and return its metadata."""
-    # Validate file extension
-    ext = Path(file.filename or "").suffix.lower()
+def _check_extension(filename: str | None) -> None:
+    """Reject file types the agent cannot read."""
+    ext = Path(filename or "").suffix.lower()
     if ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
             detail=f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
         )
 
-    # Read file content
-    content = await file.read()
-
-    # Validate file size
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024 * 1024)}MB"
-        )
-
-    # Generate file ID and save
-    file_id = uuid.uuid4().hex[:8]
-    file_dir = Path(f"/tmp/sunnyagent_files/{file_id}")
-    file_dir.mkdir(parents=True, exist_ok=True)
-    file_path = file_dir / (file.filename or "uploaded_file")
 
-    with open(file_path, "wb") as f:
-        f.write(content)
+async def _register_upload(
+    stored: StoredUpload,
+    filename: str,
+    content_type: str | None,
+    current_user: UserInfo,
+) -> dict:
+    """Hand a stored upload to ingestion, record it and build the upload response."""
+    # 提交到后台解析，agent 读取时直接使用解析结果；内容哈希在上传时已算好
+    ingestion = await asyncio.get_running_loop().run_in_executor(
+        None, get_ingestion_manager().submit, stored.path, stored.sha256
+    )
 
     # Record file in database (if PostgreSQL is available)
     database_url = os.getenv("DATABASE_URL")
@@ -406,24 +537,157 @@ async def upload_file(
         try:
             await files_db.create_file(
                 user_id=current_user.id,
-                file_id=file_id,
-                original_name=file.filename or "uploaded_file",
-                content_type=file.content_type,
-                size_bytes=len(content),
-                storage_path=str(file_path)
+                file_id=stored.file_id,
+                original_name=filename,
+                content_type=content_type,
+                size_bytes=stored.size,
+                storage_path=str(stored.path)
             )
         except Exception as e:
             logger.warning(f"Failed to record file in database: {e}")
 
     return {
-        "file_id": file_id,
-        "filename": file.filename,
-        "size": len(content),
-        "content_type": file.content_type or "application/octet-stream",
-        "download_url": f"/api/files/{file_id}/{file.filename}",
+        "file_id": stored.file_id,
+        "filename": filename,
+        "size": stored.size,
+        "content_type": content_type or "application/octet-stream",
+        "download_url": f"/api/files/{stored.file_id}/{filename}",
+        "ingestion": ingestion,
     }
 
 
+@app.post("/api/files/upload")
+async def upload_file(
+    request: Request,
+    current_user: UserInfo = Depends(get_current_user)
+):
+    """Upload a small file (multipart field ``file``) and return its metadata.
+
+    Multipart bodies are spooled before they can be processed, so this
+    endpoint only accepts files up to MAX_SINGLE_UPLOAD_BYTES. An oversized
+    Content-Length is rejected before the body is read, and bodies without
+    one are cut off as soon as the stream passes the limit. Larger files
+    must use the resumable upload endpoints under /api/files/uploads.
+    """
+    too_large = HTTPException(
+        status_code=413,
+        detail=(
+            f"File too large for a single-request upload (maximum "
+            f"{MAX_SINGLE_UPLOAD_BYTES // (1024 * 1024)}MB). Use /api/files/uploads instead."
+        ),
+    )
+    limit = MAX_SINGLE_UPLOAD_BYTES + _MULTIPART_OVERHEAD
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > limit:
+        raise too_large
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data")
+
+    parser = MultiPartParser(
+        request.headers, limit_stream(request.stream(), limit), max_files=1, max_fields=1
+    )
+    try:
+        form = await parser.parse()
+    except UploadTooLargeError:
+        raise too_large
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+
+    try:
+        file = form.get("file")
+        if not isinstance(file, StarletteUploadFile):
+            raise HTTPException(status_code=400, detail="Missing file field")
+        _check_extension(file.filename)
+        try:
+            stored = await save_upload(file, str(current_user.id))
+        except UploadTooLargeError:
+            raise too_large
+        content_type = file.content_type
+    finally:
+        await form.close()
+    return await _register_upload(stored, stored.path.name, content_type, current_user)
+
+
+@app.post("/api/files/uploads")
+async def create_upload(
+    request: UploadSessionCreate,
+    current_user: UserInfo = Depends(get_current_user)
+):
+    """Start a resumable upload.
+
+    Returns an upload_id, the current offset (0) and a suggested chunk_size.
+    Send the file with PUT /api/files/uploads/{upload_id}?offset=N.
+    """
+    _check_extension(request.filename)
+    try:
+        session = await get_upload_sessions().create(
+            str(current_user.id), request.filename, request.size, request.content_type
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return session.to_dict()
+
+
+async def _get_upload_session(upload_id: str, current_user: UserInfo):
+    try:
+        return await get_upload_sessions().get(upload_id, str(current_user.id))
+    except UploadSessionNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+
+@app.get("/api/files/uploads/{upload_id}")
+async def get_upload(
+    upload_id: str,
+    current_user: UserInfo = Depends(get_current_user)
+):
+    """Get the offset of a resumable upload, to continue after a dropped connection."""
+    session = await _get_upload_session(upload_id, current_user)
+    return session.to_dict()
+
+
+@app.put("/api/files/uploads/{upload_id}")
+async def append_upload(
+    upload_id: str,
+    offset: int,
+    request: Request,
+    current_user: UserInfo = Depends(get_current_user)
+):
+    """Append the raw request body to a resumable upload at ``offset``.
+
+    Returns the upload progress; ``file`` holds the uploaded file's metadata
+    once the last byte has arrived. A 409 response carries the offset to
+    resume from.
+    """
+    session = await _get_upload_session(upload_id, current_user)
+    try:
+        stored = await get_upload_sessions().append(session, offset, request.stream())
+    except UploadOffsetError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "offset": e.expected})
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ClientDisconnect:
+        # 已收到的部分保留在磁盘上，客户端查询 offset 后继续上传
+        raise HTTPException(status_code=400, detail="Client disconnected")
+
+    result = {**session.to_dict(), "file": None}
+    if stored is not None:
+        result["file"] = await _register_upload(
+            stored, session.filename, session.content_type, current_user
+        )
+    return result
+
+
+@app.delete("/api/files/uploads/{upload_id}")
+async def delete_upload(
+    upload_id: str,
+    current_user: UserInfo = Depends(get_current_user)
+):
+    """Abort a resumable upload and discard the received data."""
+    session = await _get_upload_session(upload_id, current_user)
+    await get_upload_sessions().abort(session)
+    return {"upload_id": upload_id, "deleted": True}
+
+
 @app.get("/api/files/{file_id}/download")
 async def download_file_by_id(
     file_id: str,
@@ -511,6 +775,42 @@ async def get_file_content(
     return {"content": content, "filename": file_path.name}
 
 
+@app.get("/api/files/{file_id}/ingestion")
+async def get_file_ingestion(
+    file_id: str,
+    current_user: UserInfo = Depends(get_current_user)
+):
+    """Get the background parsing status of an uploaded document.
+
+    Permission: User must own the file.
+    """
+    # Check permission via database if PostgreSQL is available
+    database_url = os.getenv("DATABASE_URL")
+    if database_url:
+        file_record = await files_db.get_file(file_id, current_user.id)
+        if not file_record:
+            raise HTTPException(status_code=404, detail="File not found")
+        file_path = Path(file_record["storage_path"])
+    else:
+        # Fallback for SQLite mode (no permission check)
+        file_dir = Path(f"/tmp/sunnyagent_files/{file_id}")
+        if not file_dir.exists():
+            raise HTTPException(status_code=404, detail="File not found")
+        files = list(file_dir.iterdir())
+        if not files:
+            raise HTTPException(status_code=404, detail="File not found")
+        file_path = files[0]
+
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="File not found")
+
+    # 没有解析过（如服务重启前上传）的文档会在这里重新提交
+    status = await asyncio.get_running_loop().run_in_executor(
+        None, get_ingestion_manager().submit, file_path
+    )
+    return {"file_id": file_id, **status}
+
+
 @app.get("/api/files/{file_id}/{filename}")
 async def download_file(
     file_id: str,
@@ -521,8 +821,9 @@ async def download_file(
 
     Permission: User must own the file.
 
-    Note: This route MUST be defined after /api/files/{file_id}/content
-    and /api/files/{file_id}/download to avoid path conflicts.
+    Note: This route MUST be defined after /api/files/{file_id}/content,
+    /api/files/{file_id}/download, /api/files/{file_id}/ingestion and
+    /api/files/uploads/{upload_id} to avoid path conflicts.
     """
     # Check permission via database if PostgreSQL is available
     database_url = os.getenv("DATABASE_URL")
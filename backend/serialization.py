@@ -0,0 +1,83 @@
+"""JSON serialization for SSE payloads.
+
+Every SSE event payload goes through ``dumps``. orjson is used when it is
+installed (it is a declared dependency) and falls back to the standard library
+otherwise. The backend can be forced with the
+``SSE_JSON_BACKEND`` environment variable (``auto``, ``orjson`` or ``json``)
+or swapped at runtime with ``set_serializer``.
+
+Both backends emit UTF-8 text without ASCII escaping, matching the previous
+``json.dumps(data, ensure_ascii=False)`` output up to whitespace.
+"""
+
+import json
+import logging
+import os
+from collections.abc import Callable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+Serializer = Callable[[Any], str]
+
+
+def _stdlib_dumps(data: Any) -> str:
+    """Serialize with the standard library json module."""
+    return json.dumps(data, ensure_ascii=False)
+
+
+SERIALIZERS: dict[str, Serializer] = {"json": _stdlib_dumps}
+
+try:
+    import orjson
+
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def _orjson_dumps(data: Any) -> str:
+        """Serialize with orjson, deferring to stdlib for types it rejects."""
+        try:
+            return orjson.dumps(data, option=_ORJSON_OPTIONS).decode("utf-8")
+        except TypeError:
+            return _stdlib_dumps(data)
+
+    SERIALIZERS["orjson"] = _orjson_dumps
+except ImportError:  # pragma: no cover - orjson is optional
+    pass
+
+
+def _resolve(name: str) -> tuple[str, Serializer]:
+    """Resolve a backend name (or "auto") to an available serializer."""
+    name = name.lower()
+    if name == "auto":
+        name = "orjson" if "orjson" in SERIALIZERS else "json"
+    if name not in SERIALIZERS:
+        logger.warning(f"JSON backend '{name}' is not available, using stdlib json")
+        name = "json"
+    return name, SERIALIZERS[name]
+
+
+_backend_name, _dumps = _resolve(os.environ.get("SSE_JSON_BACKEND", "auto"))
+
+
+def dumps(data: Any) -> str:
+    """Serialize an SSE payload with the configured backend."""
+    return _dumps(data)
+
+
+def get_serializer_name() -> str:
+    """Return the name of the active serialization backend."""
+    return _backend_name
+
+
+def set_serializer(name: str) -> str:
+    """Switch the serialization backend.
+
+    Args:
+        name: "auto", "orjson" or "json".
+
+    Returns:
+        The name of the backend actually selected.
+    """
+    global _backend_name, _dumps
+    _backend_name, _dumps = _resolve(name)
+    return _backend_name
@@ -10,11 +10,15 @@ Enhanced with support for:
 - todos_updated: Task list changes from TodoListMiddleware
 - task_spawned/task_completed: Sub-agent task lifecycle
 - Event IDs for SSE reconnection
+- Optional coalescing of text_delta events into fewer frames
+- tool_call_progress: Incremental sandbox output while a tool runs
 """
 
-import json
+import asyncio
+import contextlib
+import os
 import time
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, AsyncIterator
 from dataclasses import dataclass, field
 from typing import Any
 
@@ -22,6 +26,9 @@ from langchain_core.messages import HumanMessage, ToolMessage
 from langchain_core.runnables.config import RunnableConfig
 from langgraph.graph.state import CompiledStateGraph
 
+from backend.json_stream import IncrementalJSONParser
+from backend.serialization import dumps
+
 
 # =============================================================================
 # Backend State Dataclasses (per data-model.md)
@@ -104,6 +111,11 @@ def _format_thinking_content(tool_name: str, args: dict) -> str:
     return str(args)
 
 
+# Payload of events without data (e.g. "done"), encoded once instead of per event.
+# Frames themselves stay dicts: StreamRun reads their event and id for replay.
+_EMPTY_PAYLOAD = "{}"
+
+
 def _format_sse(event: str, data: dict, event_counter: EventCounter | None = None) -> dict:
     """Format a single SSE event dict for sse-starlette EventSourceResponse.
 
@@ -115,12 +127,144 @@ def _format_sse(event: str, data: dict, event_counter: EventCounter | None = Non
     Returns:
         SSE event dict with optional 'id' field for reconnection.
     """
-    result: dict[str, Any] = {"event": event, "data": json.dumps(data, ensure_ascii=False)}
+    payload = dumps(data) if data else _EMPTY_PAYLOAD
+    result: dict[str, Any] = {"event": event, "data": payload}
     if event_counter is not None:
         result["id"] = event_counter.next_id()
     return result
 
 
+@dataclass
+class CoalesceConfig:
+    """Settings for batching consecutive text_delta events into one frame."""
+
+    interval_ms: float = 0.0  # Max time text may wait before flushing; 0 disables
+    max_bytes: int = 4096  # Flush as soon as this much text is pending
+
+    @property
+    def enabled(self) -> bool:
+        """Coalescing is active only with a positive flush interval."""
+        return self.interval_ms > 0
+
+    @classmethod
+    def from_env(cls) -> "CoalesceConfig":
+        """Read SSE_COALESCE_MS / SSE_COALESCE_BYTES from the environment."""
+        return cls(
+            interval_ms=float(os.environ.get("SSE_COALESCE_MS", "0")),
+            max_bytes=int(os.environ.get("SSE_COALESCE_BYTES", "4096")),
+        )
+
+
+@dataclass
+class CoalesceStats:
+    """Process-wide counters for the text_delta coalescing stage."""
+
+    text_events_in: int = 0
+    text_frames_out: int = 0
+
+    @property
+    def frames_saved(self) -> int:
+        """Number of SSE frames avoided by merging text deltas."""
+        return self.text_events_in - self.text_frames_out
+
+    def to_dict(self) -> dict[str, int]:
+        """Return the counters as a plain dict."""
+        return {
+            "text_events_in": self.text_events_in,
+            "text_frames_out": self.text_frames_out,
+            "frames_saved": self.frames_saved,
+        }
+
+
+COALESCE_STATS = CoalesceStats()
+
+# Marks the end of the source stream in the coalescing queue
+_END_OF_STREAM = object()
+
+
+async def coalesce_text_deltas(
+    events: AsyncIterator[tuple[str, dict]],
+    config: CoalesceConfig,
+    stats: CoalesceStats = COALESCE_STATS,
+) -> AsyncGenerator[tuple[str, dict], None]:
+    """Merge consecutive text_delta events into fewer, larger ones.
+
+    Pending text is flushed when ``config.interval_ms`` has elapsed since the
+    first pending delta, when ``config.max_bytes`` is reached, or immediately
+    before any non-text event so ordering is preserved. The source is pumped
+    by a separate task so the interval flush fires even while the model is
+    silent.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=256)
+
+    async def pump() -> None:
+        try:
+            async for item in events:
+                await queue.put(item)
+            await queue.put(_END_OF_STREAM)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            # Close the source even when the consumer stopped early
+            aclose = getattr(events, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    loop = asyncio.get_running_loop()
+    pump_task = asyncio.create_task(pump())
+    interval = config.interval_ms / 1000
+    pending: list[str] = []
+    pending_bytes = 0
+    deadline = 0.0
+
+    def flush() -> tuple[str, dict]:
+        nonlocal pending_bytes
+        text = "".join(pending)
+        pending.clear()
+        pending_bytes = 0
+        stats.text_frames_out += 1
+        return "text_delta", {"text": text}
+
+    try:
+        while True:
+            if pending:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    yield flush()
+                    continue
+            else:
+                item = await queue.get()
+
+            if item is _END_OF_STREAM:
+                break
+            if isinstance(item, Exception):
+                raise item
+
+            event, data = item
+            if event == "text_delta" and len(data) == 1:
+                text = data.get("text", "")
+                stats.text_events_in += 1
+                if not pending:
+                    deadline = loop.time() + interval
+                pending.append(text)
+                pending_bytes += len(text.encode("utf-8"))
+                if pending_bytes >= config.max_bytes:
+                    yield flush()
+                continue
+
+            if pending:
+                yield flush()
+            yield item
+
+        if pending:
+            yield flush()
+    finally:
+        pump_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await pump_task
+
+
 def _format_tool_content(content) -> str:
     """Extract displayable string from tool message content."""
     if isinstance(content, str):
@@ -141,6 +285,8 @@ async def stream_agent_response(
     thread_id: str,
     message: str,
     user_id: str | None = None,
+    event_counter: EventCounter | None = None,
+    coalesce: CoalesceConfig | None = None,
 ) -> AsyncGenerator[dict, None]:
     """Stream agent response as SSE events.
 
@@ -153,23 +299,47 @@ async def stream_agent_response(
     - task_spawned/task_completed: When SubAgentMiddleware delegates tasks
     - thinking events with type field (planning/replanning/routing)
     - tool_call events with task_id for parent task association
+    - tool_call_progress: incremental output written by running tools
 
     Args:
         agent: The compiled supervisor graph.
         thread_id: Thread ID for conversation persistence.
         message: User message to send.
+        user_id: ID of the requesting user, exposed to tools via config.
+        event_counter: Counter for event IDs; pass one to continue an
+            existing ID sequence (e.g. across runs on the same thread).
+        coalesce: text_delta batching settings; defaults to the
+            SSE_COALESCE_* environment configuration.
 
     Yields:
         SSE-formatted event dicts with sequential IDs for reconnection support.
     """
+    # Event counter for SSE reconnection support (T011)
+    if event_counter is None:
+        event_counter = EventCounter()
+    if coalesce is None:
+        coalesce = CoalesceConfig.from_env()
+
+    events = _agent_events(agent, thread_id, message, user_id)
+    if coalesce.enabled:
+        events = coalesce_text_deltas(events, coalesce)
+
+    async for event, data in events:
+        yield _format_sse(event, data, event_counter)
+
+
+async def _agent_events(
+    agent: CompiledStateGraph,
+    thread_id: str,
+    message: str,
+    user_id: str | None,
+) -> AsyncGenerator[tuple[str, dict], None]:
+    """Translate astream() chunks into (event name, payload) pairs."""
     config: RunnableConfig = {"configurable": {"thread_id": thread_id, "user_id": user_id}}
 
     # Checkpointer handles history automatically - just send the new message
     stream_input: dict = {"messages": [HumanMessage(content=message)]}
 
-    # Event counter for SSE reconnection support (T011)
-    event_counter = EventCounter()
-
     # Buffers for tool call streaming (args arrive as JSON fragments)
     tool_call_buffers: dict[str | int, dict] = {}
     displayed_tool_ids: set[str] = set()
@@ -187,7 +357,7 @@ async def stream_agent_response(
     try:
         async for chunk in agent.astream(
             stream_input,
-            stream_mode=["messages", "updates"],
+            stream_mode=["messages", "updates", "custom"],
             subgraphs=True,
             config=config,
         ):
@@ -207,7 +377,7 @@ async def stream_agent_response(
                                 # Only emit if todos actually changed
                                 if todos != previous_todos:
                                     previous_todos = todos
-                                    yield _format_sse(
+                                    yield (
                                         "todos_updated",
                                         {
                                             "todos": [
@@ -220,10 +390,22 @@ async def stream_agent_response(
                                             ],
                                             "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
                                         },
-                                        event_counter,
                                     )
                 continue
 
+            # --- CUSTOM stream: incremental tool output (sandbox stdout/stderr) ---
+            if current_stream_mode == "custom":
+                if isinstance(data, dict) and data.get("type") == "tool_call_progress":
+                    progress_data: dict[str, Any] = {
+                        key: data[key]
+                        for key in ("id", "stream", "text", "truncated")
+                        if key in data
+                    }
+                    if current_task_id:
+                        progress_data["task_id"] = current_task_id
+                    yield "tool_call_progress", progress_data
+                continue
+
             # --- MESSAGES stream: text, tool calls, tool results ---
             if current_stream_mode != "messages":
                 continue
@@ -255,10 +437,9 @@ async def stream_agent_response(
                     tracker = active_tasks.pop(tool_id)
                     tool_status = getattr(msg, "status", "success")
                     status = "success" if tool_status == "success" else "error"
-                    yield _format_sse(
+                    yield (
                         "task_completed",
                         tracker.to_completed_event(status),
-                        event_counter,
                     )
                     # Clear current task context
                     if current_task_id == tool_id:
@@ -270,10 +451,9 @@ async def stream_agent_response(
                     tracker = active_tasks.pop(tool_id)
                     tool_status = getattr(msg, "status", "success")
                     status = "success" if tool_status == "success" else "error"
-                    yield _format_sse(
+                    yield (
                         "task_completed",
                         tracker.to_completed_event(status),
-                        event_counter,
                     )
                     # Clear current task context
                     if current_task_id == tool_id:
@@ -297,7 +477,7 @@ async def stream_agent_response(
                     # Add task_id if within a task context (T010)
                     if current_task_id:
                         event_data["task_id"] = current_task_id
-                    yield _format_sse("tool_call_result", event_data, event_counter)
+                    yield "tool_call_result", event_data
                 continue
 
             # --- AI message chunks (text + tool calls) ---
@@ -311,7 +491,7 @@ async def stream_agent_response(
                 if block_type == "text":
                     text = block.get("text", "")
                     if text:
-                        yield _format_sse("text_delta", {"text": text}, event_counter)
+                        yield "text_delta", {"text": text}
 
                 # Tool call chunks (may arrive as fragments)
                 elif block_type in {"tool_call_chunk", "tool_call"}:
@@ -330,7 +510,7 @@ async def stream_agent_response(
 
                     buffer = tool_call_buffers.setdefault(
                         buffer_key,
-                        {"name": None, "id": None, "args": None, "args_parts": []},
+                        {"name": None, "id": None, "args": None, "parser": None, "last_fragment": None},
                     )
 
                     if chunk_name:
@@ -338,16 +518,21 @@ async def stream_agent_response(
                     if chunk_id:
                         buffer["id"] = chunk_id
 
-                    # Accumulate args (may arrive as dict or string fragments)
+                    # Accumulate args (may arrive as dict or string fragments).
+                    # String fragments are fed to an incremental parser so each
+                    # byte is scanned once instead of re-parsing the whole buffer.
                     if isinstance(chunk_args, dict):
                         buffer["args"] = chunk_args
-                        buffer["args_parts"] = []
+                        buffer["parser"] = None
+                        buffer["last_fragment"] = None
                     elif isinstance(chunk_args, str):
-                        if chunk_args:
-                            parts: list[str] = buffer.setdefault("args_parts", [])
-                            if not parts or chunk_args != parts[-1]:
-                                parts.append(chunk_args)
-                            buffer["args"] = "".join(parts)
+                        if chunk_args and chunk_args != buffer["last_fragment"]:
+                            buffer["last_fragment"] = chunk_args
+                            parser: IncrementalJSONParser | None = buffer["parser"]
+                            if parser is None:
+                                parser = buffer["parser"] = IncrementalJSONParser()
+                            parser.feed(chunk_args)
+                            buffer["args"] = parser.value if parser.complete else None
                     elif chunk_args is not None:
                         buffer["args"] = chunk_args
 
@@ -358,14 +543,7 @@ async def stream_agent_response(
                         continue
 
                     parsed_args = buffer.get("args")
-                    if isinstance(parsed_args, str):
-                        if not parsed_args:
-                            continue
-                        try:
-                            parsed_args = json.loads(parsed_args)
-                        except json.JSONDecodeError:
-                            continue
-                    elif parsed_args is None:
+                    if parsed_args is None:
                         continue
 
                     if not isinstance(parsed_args, dict):
@@ -384,7 +562,7 @@ async def stream_agent_response(
                             }
                             if thinking_type:
                                 thinking_data["type"] = thinking_type
-                            yield _format_sse("thinking", thinking_data, event_counter)
+                            yield "thinking", thinking_data
                         tool_call_buffers.pop(buffer_key, None)
                         continue
 
@@ -402,7 +580,7 @@ async def stream_agent_response(
                                 "content": f"Routing to {agent_name}: {task_desc}",
                                 "type": "routing",
                             }
-                            yield _format_sse("thinking", thinking_data, event_counter)
+                            yield "thinking", thinking_data
 
                             # 2. Emit task_spawned event (new behavior)
                             tracker = TaskTracker(
@@ -412,7 +590,7 @@ async def stream_agent_response(
                             )
                             active_tasks[buffer_id] = tracker
                             current_task_id = buffer_id
-                            yield _format_sse("task_spawned", tracker.to_spawned_event(), event_counter)
+                            yield "task_spawned", tracker.to_spawned_event()
 
                         tool_call_buffers.pop(buffer_key, None)
                         continue
@@ -430,7 +608,7 @@ async def stream_agent_response(
                             )
                             active_tasks[buffer_id] = tracker
                             current_task_id = buffer_id
-                            yield _format_sse("task_spawned", tracker.to_spawned_event(), event_counter)
+                            yield "task_spawned", tracker.to_spawned_event()
                         tool_call_buffers.pop(buffer_key, None)
                         continue
 
@@ -452,7 +630,7 @@ async def stream_agent_response(
                         # Add task_id if within a task context (T010)
                         if current_task_id:
                             tool_event_data["task_id"] = current_task_id
-                        yield _format_sse("tool_call_start", tool_event_data, event_counter)
+                        yield "tool_call_start", tool_event_data
 
                     tool_call_buffers.pop(buffer_key, None)
 
@@ -460,14 +638,13 @@ async def stream_agent_response(
         # The route tool returns a Command object which doesn't generate ToolMessage,
         # so we need to clean up active tasks when the stream ends
         for task_id, tracker in list(active_tasks.items()):
-            yield _format_sse(
+            yield (
                 "task_completed",
                 tracker.to_completed_event("success"),
-                event_counter,
             )
         active_tasks.clear()
 
     except Exception as e:
-        yield _format_sse("error", {"message": str(e)}, event_counter)
+        yield "error", {"message": str(e)}
 
-    yield _format_sse("done", {}, event_counter)
+    yield "done", {}
@@ -0,0 +1,240 @@
+"""Background agent runs with a bounded per-thread SSE replay log.
+
+An agent run used to live inside the HTTP response generator, so a dropped
+connection cancelled the run and a reconnect had to re-invoke the whole
+graph. Runs now execute as background tasks that append every formatted SSE
+event to a ring buffer keyed by thread_id. HTTP responses are just
+subscribers: they replay the events after the client's ``Last-Event-ID``
+and then follow the live tail.
+
+Event IDs are monotonically increasing per thread (a new run continues from
+the previous run's last ID), so a stale ``Last-Event-ID`` from an earlier
+run simply replays the whole current run.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+
+from backend.stream_handler import EventCounter, _format_sse
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of events retained per run (oldest are dropped first)
+MAX_REPLAY_EVENTS = int(os.environ.get("SSE_REPLAY_MAX_EVENTS", "2000"))
+# How long a finished run stays available for reconnecting clients
+REPLAY_RETENTION_SECONDS = float(os.environ.get("SSE_REPLAY_RETENTION_SECONDS", "300"))
+
+
+class StreamRun:
+    """A single agent run and the ring buffer of SSE events it produced."""
+
+    def __init__(
+        self,
+        thread_id: str,
+        user_id: str | None,
+        start_id: int = 0,
+        max_events: int = MAX_REPLAY_EVENTS,
+    ):
+        self.thread_id = thread_id
+        self.user_id = user_id
+        self.start_id = start_id
+        self.last_id = start_id
+        self.created_at = time.time()
+        self.finished_at: float | None = None
+        self.counter = EventCounter(_counter=start_id)
+        self.task: asyncio.Task | None = None
+        self.terminated = False  # A "done" event has been recorded
+        self._events: deque[dict] = deque(maxlen=max_events)
+        self._wakeup = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        """True once the run has produced its final event."""
+        return self.finished_at is not None
+
+    def append(self, event: dict) -> None:
+        """Record an emitted event and wake up subscribers."""
+        if self.terminated:
+            return  # Nothing follows "done"
+        if event.get("event") == "done":
+            self.terminated = True
+        event_id = event.get("id")
+        self.last_id = int(event_id) if event_id is not None else self.last_id + 1
+        self._events.append(event)
+        self._notify()
+
+    def terminate(self, message: str, cancelled: bool = False) -> None:
+        """Record a terminal error and done frame unless the run already ended."""
+        if self.terminated:
+            return
+        data: dict = {"message": message}
+        if cancelled:
+            data["cancelled"] = True
+        self.append(_format_sse("error", data, self.counter))
+        self.append(_format_sse("done", {}, self.counter))
+
+    def cancel(self, reason: str = "Run cancelled") -> bool:
+        """Cancel the run's task and end attached streams with ``reason``.
+
+        The terminal frames are recorded right away, before the task unwinds,
+        so a run started next on the same thread continues after their IDs.
+
+        Returns:
+            True if an active task was cancelled.
+        """
+        if self.task is None or self.task.done():
+            return False
+        self.terminate(reason, cancelled=True)
+        self.task.cancel()
+        return True
+
+    def finish(self) -> None:
+        """Mark the run as finished and wake up subscribers."""
+        if self.finished_at is None:
+            self.finished_at = time.time()
+            self._notify()
+
+    def _notify(self) -> None:
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    def _events_after(self, cursor: int) -> list[dict]:
+        """Return buffered events with an ID greater than ``cursor``."""
+        first_id = self.last_id - len(self._events) + 1
+        start = max(cursor + 1, first_id)
+        count = self.last_id - start + 1
+        if count <= 0:
+            return []
+        # A cursor from an earlier run on the thread only misses this run's
+        # events if the buffer has already dropped the first of them
+        lost = first_id - max(cursor, self.start_id) - 1
+        if lost > 0:
+            logger.warning(
+                f"Replay for thread {self.thread_id} lost {lost} "
+                "events that were evicted from the buffer"
+            )
+        # New events sit at the tail, so index from the right
+        return [self._events[i] for i in range(-count, 0)]
+
+    async def subscribe(self, last_event_id: int | None = None) -> AsyncGenerator[dict, None]:
+        """Yield buffered events after ``last_event_id``, then follow the live tail.
+
+        Args:
+            last_event_id: The last event ID the client received. ``None``
+                replays the run from its first event.
+        """
+        cursor = self.start_id if last_event_id is None else last_event_id
+        while True:
+            waiter = self._wakeup
+            batch = self._events_after(cursor)
+            if batch:
+                for event in batch:
+                    yield event
+                cursor = int(batch[-1].get("id", cursor + len(batch)))
+                continue
+            if self.done:
+                return
+            await waiter.wait()
+
+
+class StreamRunManager:
+    """Own background agent runs, at most one active run per thread."""
+
+    def __init__(
+        self,
+        max_events: int = MAX_REPLAY_EVENTS,
+        retention_seconds: float = REPLAY_RETENTION_SECONDS,
+    ):
+        self.max_events = max_events
+        self.retention_seconds = retention_seconds
+        self._runs: dict[str, StreamRun] = {}
+
+    def get(self, thread_id: str) -> StreamRun | None:
+        """Return the current (running or recently finished) run for a thread."""
+        return self._runs.get(thread_id)
+
+    def start(
+        self,
+        thread_id: str,
+        user_id: str | None,
+        source_factory: Callable[[EventCounter], AsyncIterator[dict]],
+    ) -> StreamRun:
+        """Start a background run for a thread.
+
+        An active run on the same thread is cancelled first: two runs must not
+        write to the same checkpoint thread concurrently.
+
+        Args:
+            thread_id: Thread the run belongs to.
+            user_id: Owner of the run, checked when clients resume.
+            source_factory: Builds the SSE event iterator, given the event
+                counter that continues this thread's ID sequence.
+        """
+        previous = self._runs.get(thread_id)
+        start_id = 0
+        if previous is not None:
+            if previous.cancel("Run superseded by a new message"):
+                logger.info(f"Superseding active run on thread {thread_id}")
+            start_id = previous.last_id
+
+        run = StreamRun(thread_id, user_id, start_id=start_id, max_events=self.max_events)
+        run.task = asyncio.create_task(self._drive(run, source_factory(run.counter)))
+        self._runs[thread_id] = run
+        return run
+
+    async def _drive(self, run: StreamRun, source: AsyncIterator[dict]) -> None:
+        """Pump the agent's events into the run buffer, independent of clients."""
+        try:
+            async for event in source:
+                run.append(event)
+        except asyncio.CancelledError:
+            logger.info(f"Run on thread {run.thread_id} cancelled")
+            run.terminate("Run cancelled", cancelled=True)
+            raise
+        except Exception as e:
+            logger.exception("Error streaming agent response")
+            run.terminate(str(e))
+        finally:
+            # A source that stops without "done" still ends attached streams cleanly
+            run.terminate("Run ended unexpectedly")
+            run.finish()
+            loop = asyncio.get_running_loop()
+            loop.call_later(self.retention_seconds, self._expire, run)
+
+    def _expire(self, run: StreamRun) -> None:
+        """Drop a finished run once its retention window has passed."""
+        if self._runs.get(run.thread_id) is run:
+            del self._runs[run.thread_id]
+
+    async def shutdown(self) -> None:
+        """Cancel all active runs and forget buffered events."""
+        tasks = [r.task for r in self._runs.values() if r.cancel("Server shutting down")]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._runs.clear()
+
+
+# ============================================
+# Global singleton
+# ============================================
+_manager: StreamRunManager | None = None
+
+
+def get_run_manager() -> StreamRunManager:
+    """Return the process-wide run manager."""
+    global _manager
+    if _manager is None:
+        _manager = StreamRunManager()
+    return _manager
+
+
+async def shutdown_runs() -> None:
+    """Cancel all background runs (called on application shutdown)."""
+    global _manager
+    if _manager is not None:
+        await _manager.shutdown()
+        _manager = None
@@ -5,11 +5,14 @@ from .container_pool import (
     cleanup_all_sunnyagent_containers,
 )
 from .sandbox import execute_python, execute_python_with_file
+from .sandbox_sessions import get_session_manager, shutdown_sessions
 
 __all__ = [
     "execute_python",
     "execute_python_with_file",
     "get_pool",
     "shutdown_pool",
+    "get_session_manager",
+    "shutdown_sessions",
     "cleanup_all_sunnyagent_containers",
 ]
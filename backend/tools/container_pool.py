@@ -1,16 +1,25 @@
 """
 容器池管理器 - 预热容器以实现 ~10-50ms 执行响应
+
+每种资源规格（ResourceClass）一个独立的容器池：重计算任务使用 large 规格，
+不与普通执行争抢 standard 池的容器。
 """
 from __future__ import annotations
 
 import asyncio
 import logging
+import os
+import time
+from collections import deque
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional
 
 import docker
 
+from .docker_executor import docker_call, get_docker_executor
+from .metrics import LatencyHistogram
+
 logger = logging.getLogger(__name__)
 
 # 项目标识 - 用于 Docker Desktop 分组显示
@@ -20,6 +29,85 @@ CONTAINER_LABELS = {
     "com.docker.compose.service": "sandbox",
     "com.docker.compose.oneoff": "False",
 }
+CLASS_LABEL = f"{PROJECT_NAME}.sandbox.class"  # 容器所属的资源规格
+SANDBOX_IMAGE = "sunnyagent-sandbox:latest"
+
+# 弹性池配置
+POOL_MIN_SIZE = int(os.environ.get("SANDBOX_POOL_MIN", "2"))  # 常驻容器下限
+POOL_MAX_SIZE = int(os.environ.get("SANDBOX_POOL_MAX", "10"))  # 池化容器上限
+POOL_LOW_WATERMARK = int(os.environ.get("SANDBOX_POOL_LOW_WATERMARK", "1"))  # 空闲容器低于此值时后台预热
+POOL_IDLE_TTL = float(os.environ.get("SANDBOX_POOL_IDLE_TTL", "300"))  # 空闲超过此秒数的容器会被回收（不低于下限）
+POOL_MAX_OVERFLOW = int(os.environ.get("SANDBOX_POOL_MAX_OVERFLOW", "2"))  # 池满时允许的临时容器数
+POOL_ACQUIRE_TIMEOUT = float(os.environ.get("SANDBOX_ACQUIRE_TIMEOUT", "30"))  # 等待空闲容器的超时（秒）
+POOL_MAINTENANCE_INTERVAL = 30.0  # 空闲回收检查间隔（秒）
+POOL_MIN_READY = int(os.environ.get("SANDBOX_POOL_MIN_READY", "1"))  # 启动时至少就绪的容器数，其余后台预热
+POOL_WARMUP_CONCURRENCY = int(os.environ.get("SANDBOX_WARMUP_CONCURRENCY", "4"))  # 预热时并发创建的容器数
+POOL_ACQUIRE_CHECK = os.environ.get("SANDBOX_ACQUIRE_CHECK", "1") != "0"  # 取出空闲容器时确认其仍在运行
+
+# large 规格：处理大文件或重计算，按需创建
+LARGE_MEM_LIMIT = os.environ.get("SANDBOX_LARGE_MEM", "2g")
+LARGE_CPUS = float(os.environ.get("SANDBOX_LARGE_CPUS", "2"))
+LARGE_POOL_MAX = int(os.environ.get("SANDBOX_LARGE_POOL_MAX", "2"))
+# office 规格：预装 LibreOffice 的镜像，配置镜像后才启用
+OFFICE_IMAGE = os.environ.get("SANDBOX_OFFICE_IMAGE", "")
+OFFICE_POOL_MAX = int(os.environ.get("SANDBOX_OFFICE_POOL_MAX", "2"))
+
+
+@dataclass(frozen=True)
+class ResourceClass:
+    """沙箱容器规格，每个规格对应一个独立的容器池"""
+
+    name: str
+    description: str
+    mem_limit: str
+    cpu_quota: int  # 100000 为 1 CPU
+    image: str = SANDBOX_IMAGE
+    min_size: int = 0
+    max_size: int = 2
+    low_watermark: int = 0
+    max_overflow: int = 0
+
+
+DEFAULT_RESOURCE_CLASS = "standard"
+
+
+def _resource_classes() -> dict[str, ResourceClass]:
+    classes = [
+        ResourceClass(
+            name=DEFAULT_RESOURCE_CLASS,
+            description="512MB 内存 / 1 CPU，适合大多数任务",
+            mem_limit="512m",
+            cpu_quota=100000,
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            low_watermark=POOL_LOW_WATERMARK,
+            max_overflow=POOL_MAX_OVERFLOW,
+        ),
+        ResourceClass(
+            name="large",
+            description=f"{LARGE_MEM_LIMIT} 内存 / {LARGE_CPUS:g} CPU，处理大文件或重计算时使用",
+            mem_limit=LARGE_MEM_LIMIT,
+            cpu_quota=int(LARGE_CPUS * 100000),
+            max_size=LARGE_POOL_MAX,
+        ),
+    ]
+    if OFFICE_IMAGE:
+        classes.append(ResourceClass(
+            name="office",
+            description="预装 LibreOffice，需要转换或渲染 Office 文档时使用",
+            mem_limit="1g",
+            cpu_quota=100000,
+            image=OFFICE_IMAGE,
+            max_size=OFFICE_POOL_MAX,
+        ))
+    return {rc.name: rc for rc in classes}
+
+
+RESOURCE_CLASSES = _resource_classes()
+
+
+class PoolExhaustedError(RuntimeError):
+    """池和临时容器都已用尽，且在超时内没有容器归还"""
 
 
 @dataclass
@@ -29,39 +117,102 @@ class PooledContainer:
     container: docker.models.containers.Container
     created_at: datetime = field(default_factory=datetime.now)
     use_count: int = 0
+    last_used_at: float = field(default_factory=time.monotonic)
+    overflow: bool = False  # 临时容器，归还时直接销毁
+    files: dict[str, str] = field(default_factory=dict)  # 已复制到容器的文件：容器内路径 → 内容哈希
+    files_owner: Optional[str] = None  # 已复制文件所属的用户
 
 
 class ContainerPool:
     """
     Docker 容器池
 
-    启动时预热指定数量的容器，执行请求时从池中获取空闲容器，
+    启动时预热 min_size 个容器，执行请求时从池中获取空闲容器，
     执行完成后归还到池中，避免每次创建/销毁容器的开销。
+
+    池在 [min_size, max_size] 之间弹性伸缩：
+    - 空闲容器不足 low_watermark 时在后台预热新容器
+    - 空闲超过 idle_ttl 的容器被回收，直到回到 min_size
+    - 池已满时最多创建 max_overflow 个临时容器，归还时销毁；
+      临时容器也用尽后等待归还，超时抛出 PoolExhaustedError
+    - 需要替换的容器移出池后在后台销毁，归还不等待 Docker 调用
+    - 空闲容器定期检查，取出时再确认一次；已退出（如 OOM）或执行出错的
+      容器被替换
     """
 
     def __init__(
         self,
-        image: str = "sunnyagent-sandbox:latest",
-        pool_size: int = 5,
+        image: str = SANDBOX_IMAGE,
+        min_size: int = POOL_MIN_SIZE,
+        max_size: int = POOL_MAX_SIZE,
         max_uses_per_container: int = 100,
         mem_limit: str = "512m",
         cpu_quota: int = 100000,  # 1 CPU
+        low_watermark: int = POOL_LOW_WATERMARK,
+        idle_ttl: float = POOL_IDLE_TTL,
+        max_overflow: int = POOL_MAX_OVERFLOW,
+        acquire_timeout: float = POOL_ACQUIRE_TIMEOUT,
+        maintenance_interval: float = POOL_MAINTENANCE_INTERVAL,
+        min_ready: int = POOL_MIN_READY,
+        warmup_concurrency: int = POOL_WARMUP_CONCURRENCY,
+        acquire_check: bool = POOL_ACQUIRE_CHECK,
+        name: str = DEFAULT_RESOURCE_CLASS,
+        client: Optional[docker.DockerClient] = None,
     ):
-        self.client = docker.from_env()
+        self.client = client or docker.from_env()
+        self.name = name
         self.image = image
-        self.pool_size = pool_size
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size)
         self.max_uses = max_uses_per_container
         self.mem_limit = mem_limit
         self.cpu_quota = cpu_quota
-
-        self._pool: asyncio.Queue[PooledContainer] = asyncio.Queue()
+        self.low_watermark = low_watermark
+        self.idle_ttl = idle_ttl
+        self.max_overflow = max_overflow
+        self.acquire_timeout = acquire_timeout
+        self.maintenance_interval = maintenance_interval
+        self.min_ready = min(min_ready, min_size)
+        self.warmup_concurrency = max(1, warmup_concurrency)
+        self.acquire_check = acquire_check
+
+        self._idle: deque[PooledContainer] = deque()  # 右端最近归还，左端空闲最久
+        self._waiters: deque[asyncio.Future[PooledContainer]] = deque()
         self._lock = asyncio.Lock()
         self._initialized = False
+        self._size = 0  # 池化容器数（空闲 + 使用中 + 创建中）
+        self._creating = 0
+        self._overflow = 0
+        self._name_seq = 0
+        self._prewarm_task: Optional[asyncio.Task] = None
+        self._retiring: set[asyncio.Task] = set()  # 后台销毁中的容器
+        self._warmup_task: Optional[asyncio.Task] = None
+        self._warmup: dict = {"ready_ms": None, "total_ms": None, "failed": 0}
+        self._maintenance_task: Optional[asyncio.Task] = None
         self._total_created = 0
+        self._total_destroyed = 0
+        self._overflow_created = 0
+        self._prewarmed = 0
+        self._shrunk = 0
+        self._recycled = 0
+        self._exhausted = 0
+        self._acquire_wait = LatencyHistogram()  # 获取容器的等待时间（含新建和等待归还）
+        self._health = {
+            "checks": 0,
+            "unhealthy": 0,  # 检查时发现已退出的容器
+            "oom_killed": 0,
+            "exec_failures": 0,
+            "replaced": 0,
+        }
         self._all_containers: set[str] = set()  # 跟踪所有创建的容器ID
 
     async def initialize(self) -> None:
-        """启动时预热容器池"""
+        """
+        启动时预热容器池
+
+        并发创建 min_size 个容器，min_ready 个就绪后即返回，
+        其余容器在后台继续预热，不阻塞应用启动。
+        """
         async with self._lock:
             if self._initialized:
                 return
@@ -69,40 +220,87 @@ class ContainerPool:
             # 清理上次运行遗留的容器
             await self.cleanup_all_project_containers()
 
-            logger.info(f"Initializing container pool with {self.pool_size} containers...")
-
-            for i in range(self.pool_size):
-                try:
-                    pooled = await self._create_container()
-                    await self._pool.put(pooled)
-                    logger.info(f"Container {i + 1}/{self.pool_size} ready")
-                except Exception as e:
-                    logger.error(f"Failed to create container {i + 1}: {e}")
-                    raise
+            logger.info(
+                f"Initializing container pool with {self.min_size} containers "
+                f"(concurrency {self.warmup_concurrency}, waiting for {self.min_ready})..."
+            )
+            start = time.monotonic()
+            semaphore = asyncio.Semaphore(self.warmup_concurrency)
+
+            async def warm_one() -> None:
+                async with semaphore:
+                    pooled = await self._create_pooled()
+                self._put_back(pooled)
+
+            pending = {asyncio.create_task(warm_one()) for _ in range(self.min_size)}
+            ready = 0
+            while pending and ready < self.min_ready:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        self._warmup["failed"] += 1
+                        logger.error(f"Failed to create container: {task.exception()}")
+                    else:
+                        ready += 1
+
+            if ready < self.min_ready:
+                for task in pending:
+                    task.cancel()
+                raise RuntimeError(
+                    f"Only {ready}/{self.min_ready} sandbox containers could be started"
+                )
 
+            self._warmup["ready_ms"] = round((time.monotonic() - start) * 1000, 1)
             self._initialized = True
-            logger.info("Container pool initialized successfully")
+            self._maintenance_task = asyncio.create_task(self._maintain())
+            if pending:
+                logger.info(
+                    f"Container pool ready with {ready} containers in {self._warmup['ready_ms']} ms, "
+                    f"warming {len(pending)} more in background"
+                )
+                self._warmup_task = asyncio.create_task(self._finish_warmup(pending, start))
+            else:
+                self._warmup["total_ms"] = self._warmup["ready_ms"]
+                logger.info(f"Container pool initialized in {self._warmup['ready_ms']} ms")
 
-    async def _create_container(self) -> PooledContainer:
+    async def _finish_warmup(self, pending: set[asyncio.Task], start: float) -> None:
+        """等待后台预热的容器全部就绪"""
+        try:
+            results = await asyncio.gather(*pending, return_exceptions=True)
+        except asyncio.CancelledError:
+            for task in pending:
+                task.cancel()
+            raise
+        for result in results:
+            if isinstance(result, Exception):
+                self._warmup["failed"] += 1
+                logger.warning(f"Failed to pre-warm container: {result}")
+        self._warmup["total_ms"] = round((time.monotonic() - start) * 1000, 1)
+        logger.info(f"Container pool warm-up complete in {self._warmup['total_ms']} ms")
+        # 失败的名额由常规预热补齐
+        self._maybe_prewarm()
+
+    async def _create_container(self, overflow: bool = False) -> PooledContainer:
         """创建新的池化容器"""
-        loop = asyncio.get_event_loop()
-        container_name = f"{PROJECT_NAME}-sandbox-{self._total_created + 1}"
+        # 先占用序号再 await，避免并发创建时重名
+        self._name_seq += 1
+        container_name = f"{PROJECT_NAME}-sandbox-{self.name}-{self._name_seq}"
 
         # 清理同名旧容器（如果存在）
         try:
-            existing = await loop.run_in_executor(
-                None, lambda: self.client.containers.get(container_name)
+            existing = await docker_call(
+                "inspect", lambda: self.client.containers.get(container_name)
             )
-            await loop.run_in_executor(None, lambda: existing.remove(force=True))
+            await docker_call("remove", lambda: existing.remove(force=True))
         except docker.errors.NotFound:
             pass
 
-        container = await loop.run_in_executor(
-            None,
+        container = await docker_call(
+            "run",
             lambda: self.client.containers.run(
                 self.image,
                 name=container_name,  # 命名容器
-                labels=CONTAINER_LABELS,  # 添加标签用于分组
+                labels={**CONTAINER_LABELS, CLASS_LABEL: self.name},  # 添加标签用于分组
                 detach=True,
                 mem_limit=self.mem_limit,
                 cpu_quota=self.cpu_quota,
@@ -113,76 +311,273 @@ class ContainerPool:
         )
         self._all_containers.add(container.id)
         self._total_created += 1
-        return PooledContainer(container=container)
+        return PooledContainer(container=container, overflow=overflow)
 
-    async def acquire(self, timeout: float = 30.0) -> PooledContainer:
+    async def _create_pooled(self) -> PooledContainer:
+        """在池容量内创建容器（await 前先占用名额）"""
+        self._size += 1
+        self._creating += 1
+        try:
+            return await self._create_container()
+        except BaseException:
+            self._size -= 1
+            raise
+        finally:
+            self._creating -= 1
+
+    async def _create_overflow(self) -> PooledContainer:
+        """创建临时容器（await 前先占用名额）"""
+        self._overflow += 1
+        try:
+            pooled = await self._create_container(overflow=True)
+        except BaseException:
+            self._overflow -= 1
+            raise
+        self._overflow_created += 1
+        return pooled
+
+    def _hand_to_waiter(self, pooled: PooledContainer) -> bool:
+        """把容器直接交给最早的等待者"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(pooled)
+                return True
+        return False
+
+    def _put_back(self, pooled: PooledContainer) -> None:
+        """把容器交给等待者，没有等待者则放回空闲队列"""
+        pooled.last_used_at = time.monotonic()
+        if not self._hand_to_waiter(pooled):
+            self._idle.append(pooled)
+
+    def _needs_container(self) -> bool:
+        """是否需要在后台补充容器"""
+        if not self._initialized or self._size >= self.max_size:
+            return False
+        return (
+            self._size < self.min_size
+            or len(self._idle) + self._creating < self.low_watermark
+            or any(not w.done() for w in self._waiters)
+        )
+
+    def _maybe_prewarm(self) -> None:
+        """空闲容器低于水位线时启动后台预热"""
+        if self._prewarm_task is not None and not self._prewarm_task.done():
+            return
+        if self._needs_container():
+            self._prewarm_task = asyncio.create_task(self._prewarm())
+
+    async def _prewarm(self) -> None:
+        """后台补充容器直到回到水位线"""
+        while self._needs_container():
+            try:
+                pooled = await self._create_pooled()
+            except Exception as e:
+                logger.warning(f"Failed to pre-warm container: {e}")
+                return
+            self._prewarmed += 1
+            self._put_back(pooled)
+
+    async def _maintain(self) -> None:
+        """定期回收空闲过久的容器"""
+        while True:
+            await asyncio.sleep(self.maintenance_interval)
+            try:
+                await self._probe_idle()
+                await self._shrink_idle()
+                self._maybe_prewarm()
+            except Exception as e:
+                logger.warning(f"Container pool maintenance failed: {e}")
+
+    async def _is_healthy(self, pooled: PooledContainer) -> bool:
+        """查询容器状态，容器已退出或不存在时返回 False"""
+        self._health["checks"] += 1
+        try:
+            await docker_call("inspect", pooled.container.reload)
+        except docker.errors.NotFound:
+            return False
+        except Exception as e:
+            # Docker daemon 暂时不可用时不替换容器，执行失败时再处理
+            logger.warning(f"Health check failed for container {pooled.container.id[:12]}: {e}")
+            return True
+        state = pooled.container.attrs.get("State", {})
+        if state.get("Running"):
+            return True
+        if state.get("OOMKilled"):
+            self._health["oom_killed"] += 1
+        return False
+
+    def _replace(self, pooled: PooledContainer, reason: str) -> None:
+        """把不可用的容器移出池，在后台销毁，由预热补充"""
+        logger.warning(f"Replacing sandbox container {pooled.container.id[:12]}: {reason}")
+        self._health["replaced"] += 1
+        if pooled.overflow:
+            self._overflow -= 1
+        else:
+            self._size -= 1
+        self._retire(pooled)
+        self._maybe_prewarm()
+
+    async def _probe_idle(self) -> None:
+        """检查所有空闲容器，替换已退出的容器"""
+        idle = list(self._idle)
+        results = await asyncio.gather(*(self._is_healthy(p) for p in idle))
+        for pooled, healthy in zip(idle, results):
+            # 检查期间可能已被取走
+            if not healthy and pooled in self._idle:
+                self._idle.remove(pooled)
+                self._health["unhealthy"] += 1
+                self._replace(pooled, "not running")
+
+    async def _take_idle(self) -> Optional[PooledContainer]:
+        """取出最近归还的空闲容器，跳过并替换已退出的容器"""
+        while self._idle:
+            pooled = self._idle.pop()
+            if not self.acquire_check or await self._is_healthy(pooled):
+                return pooled
+            self._health["unhealthy"] += 1
+            self._replace(pooled, "not running")
+        return None
+
+    async def _shrink_idle(self) -> None:
+        """销毁空闲超过 idle_ttl 的容器，但保留 min_size 个"""
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._idle and self._size > self.min_size and self._idle[0].last_used_at < cutoff:
+            pooled = self._idle.popleft()
+            self._size -= 1
+            self._shrunk += 1
+            await self._destroy_container(pooled)
+
+    async def _wait_for_release(self, timeout: float) -> PooledContainer:
+        """等待其他请求归还容器"""
+        waiter: asyncio.Future[PooledContainer] = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(waiter, timeout=timeout)
+        except asyncio.TimeoutError:
+            # 超时与归还同时发生时不丢失容器
+            if waiter.done() and not waiter.cancelled():
+                return waiter.result()
+            self._exhausted += 1
+            raise PoolExhaustedError(
+                f"No sandbox container available within {timeout:.0f}s "
+                f"({self._size} pooled, {self._overflow} overflow in use)"
+            )
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._put_back(waiter.result())
+            raise
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    async def acquire(self, timeout: Optional[float] = None) -> PooledContainer:
         """
         从池中获取一个空闲容器
 
+        依次尝试：空闲容器 → 池未满时新建 → 临时容器 → 等待归还。
+        取出空闲容器时先确认其仍在运行（acquire_check）。
+
         Args:
-            timeout: 等待超时时间（秒）
+            timeout: 等待归还的超时时间（秒），默认 acquire_timeout
 
         Returns:
             PooledContainer 实例
-        """
-        try:
-            pooled = await asyncio.wait_for(self._pool.get(), timeout=timeout)
-            pooled.use_count += 1
-            return pooled
-        except asyncio.TimeoutError:
-            logger.warning("Pool exhausted, creating temporary container")
-            return await self._create_container()
 
-    async def release(self, pooled: PooledContainer) -> None:
+        Raises:
+            PoolExhaustedError: 超时仍无可用容器
         """
-        将容器归还到池中
+        start = time.monotonic()
+        pooled = await self._take_idle()
+        if pooled is None:
+            if self._size < self.max_size:
+                pooled = await self._create_pooled()
+            elif self._overflow < self.max_overflow:
+                logger.warning("Pool at max size, creating overflow container")
+                pooled = await self._create_overflow()
+            else:
+                pooled = await self._wait_for_release(
+                    self.acquire_timeout if timeout is None else timeout
+                )
 
-        如果容器使用次数超过限制，则销毁并创建新容器
-        """
-        # 检查是否需要替换
-        if pooled.use_count >= self.max_uses:
-            logger.info(f"Container reached {self.max_uses} uses, replacing...")
-            await self._destroy_container(pooled)
-            pooled = await self._create_container()
+        pooled.use_count += 1
+        self._acquire_wait.observe((time.monotonic() - start) * 1000)
+        self._maybe_prewarm()
+        return pooled
 
-        # 清理容器输出目录
-        try:
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                lambda: pooled.container.exec_run(["rm", "-rf", "/output/*"]),
-            )
-        except Exception as e:
-            logger.warning(f"Failed to clean output dir: {e}")
+    async def release(
+        self, pooled: PooledContainer, discard: bool = False, exec_failed: bool = False
+    ) -> None:
+        """
+        将容器归还到池中，不等待任何 Docker 调用
+
+        临时容器优先交给等待者，否则在后台销毁；
+        池化容器使用次数超过限制或 discard 为 True（容器状态不可复用）时
+        移出池并在后台销毁，由预热补充新容器。
+        exec_failed 为 True（Docker 无法在容器中执行命令）时同样替换容器，
+        并计入健康统计。
+        /output 由下一次执行在运行代码前清空（见 sandbox._python_command）。
+        """
+        if exec_failed:
+            self._health["exec_failures"] += 1
+            self._replace(pooled, "exec failed")
+            return
 
-        await self._pool.put(pooled)
+        if pooled.overflow:
+            if not discard and self._hand_to_waiter(pooled):
+                return
+            self._overflow -= 1
+            self._retire(pooled)
+            return
+
+        if discard or pooled.use_count >= self.max_uses:
+            if discard:
+                logger.info("Discarding container, replacing in background...")
+            else:
+                logger.info(f"Container reached {self.max_uses} uses, replacing in background...")
+            self._size -= 1
+            self._recycled += 1
+            self._retire(pooled)
+            self._maybe_prewarm()
+            return
+
+        self._put_back(pooled)
+
+    def _retire(self, pooled: PooledContainer) -> None:
+        """在后台销毁已移出池的容器"""
+        task = asyncio.create_task(self._destroy_container(pooled))
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
 
     async def _destroy_container(self, pooled: PooledContainer) -> None:
         """安全销毁容器"""
         container_id = pooled.container.id
         try:
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, lambda: pooled.container.stop(timeout=5))
-            await loop.run_in_executor(None, lambda: pooled.container.remove(force=True))
+            await docker_call("remove", lambda: pooled.container.stop(timeout=5))
+            await docker_call("remove", lambda: pooled.container.remove(force=True))
         except Exception as e:
             logger.error(f"Error destroying container: {e}")
         finally:
             self._all_containers.discard(container_id)
+            self._total_destroyed += 1
 
     async def cleanup_all_project_containers(self) -> None:
-        """清理所有 sandbox 容器（保留 postgres 等其他服务）"""
-        logger.info("Cleaning up all sunnyagent sandbox containers...")
-        loop = asyncio.get_event_loop()
+        """清理本规格的所有 sandbox 容器（保留其他规格和 postgres 等其他服务）"""
+        logger.info(f"Cleaning up all sunnyagent {self.name} sandbox containers...")
 
         try:
-            containers = await loop.run_in_executor(
-                None,
+            containers = await docker_call(
+                "inspect",
                 lambda: self.client.containers.list(
                     all=True,
                     filters={
                         "label": [
                             f"com.docker.compose.project={PROJECT_NAME}",
                             "com.docker.compose.service=sandbox",
+                            f"{CLASS_LABEL}={self.name}",
                         ]
                     }
                 )
@@ -191,7 +586,7 @@ class ContainerPool:
             for container in containers:
                 try:
                     logger.info(f"Removing container: {container.name}")
-                    await loop.run_in_executor(None, lambda c=container: c.remove(force=True))
+                    await docker_call("remove", lambda c=container: c.remove(force=True))
                 except Exception as e:
                     logger.warning(f"Failed to remove {container.name}: {e}")
 
@@ -203,52 +598,139 @@ class ContainerPool:
         """关闭池中所有容器"""
         logger.info("Shutting down container pool...")
 
+        # 停止后台任务
+        for task in (self._warmup_task, self._maintenance_task, self._prewarm_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._warmup_task = None
+        self._maintenance_task = None
+        self._prewarm_task = None
+
+        # 等待后台销毁完成
+        if self._retiring:
+            await asyncio.gather(*self._retiring, return_exceptions=True)
+
+        # 唤醒所有等待者
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(PoolExhaustedError("Container pool is shutting down"))
+
         # 先清空队列
-        while not self._pool.empty():
-            try:
-                await asyncio.wait_for(self._pool.get(), timeout=1.0)
-            except asyncio.TimeoutError:
-                break
+        self._idle.clear()
 
         # 基于标签清理所有容器
         await self.cleanup_all_project_containers()
 
         self._all_containers.clear()
+        self._size = 0
+        self._overflow = 0
         self._initialized = False
         logger.info("Container pool shutdown complete")
 
     @property
     def stats(self) -> dict:
         """返回池状态统计"""
+        available = len(self._idle)
         return {
-            "pool_size": self.pool_size,
-            "available": self._pool.qsize(),
+            "resource_class": self.name,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "size": self._size,
+            "available": available,
+            "in_use": self._size - available - self._creating,
+            "creating": self._creating,
+            "overflow_in_use": self._overflow,
+            "max_overflow": self.max_overflow,
+            "waiting": sum(1 for w in self._waiters if not w.done()),
             "total_created": self._total_created,
+            "total_destroyed": self._total_destroyed,
+            "overflow_created": self._overflow_created,
+            "prewarmed": self._prewarmed,
+            "shrunk": self._shrunk,
+            "recycled": self._recycled,
+            "retiring": len(self._retiring),
+            "exhausted": self._exhausted,
+            "acquire_wait": self._acquire_wait.snapshot(),
+            "health": dict(self._health),
+            "warmup": dict(self._warmup),
             "initialized": self._initialized,
+            "docker": get_docker_executor().stats,
         }
 
 
 # ============================================
 # 全局单例
 # ============================================
-_pool: Optional[ContainerPool] = None
+_pools: dict[str, ContainerPool] = {}
+# 正在初始化的容器池（规格 → 初始化任务），初始化成功后才放入 _pools
+_initializing: dict[str, asyncio.Task] = {}
+
+
+async def _create_pool(resource_class: str) -> ContainerPool:
+    """创建并初始化容器池，成功后才对外可见；失败时清理，下次调用重试"""
+    rc = RESOURCE_CLASSES[resource_class]
+    pool = ContainerPool(
+        name=rc.name,
+        image=rc.image,
+        min_size=rc.min_size,
+        max_size=rc.max_size,
+        low_watermark=rc.low_watermark,
+        max_overflow=rc.max_overflow,
+        mem_limit=rc.mem_limit,
+        cpu_quota=rc.cpu_quota,
+    )
+    try:
+        await pool.initialize()
+    except BaseException:
+        await pool.shutdown()
+        raise
+    finally:
+        _initializing.pop(resource_class, None)
+    _pools[resource_class] = pool
+    return pool
+
+
+async def get_pool(resource_class: str = DEFAULT_RESOURCE_CLASS) -> ContainerPool:
+    """
+    获取指定规格的全局容器池（首次使用时创建）
+
+    并发的首次调用共用同一个初始化任务，都在初始化完成后才拿到容器池。
+
+    Raises:
+        KeyError: 未知的资源规格
+        RuntimeError: 容器池初始化失败
+    """
+    pool = _pools.get(resource_class)
+    if pool is not None:
+        return pool
+    if resource_class not in RESOURCE_CLASSES:
+        raise KeyError(resource_class)
+    task = _initializing.get(resource_class)
+    if task is None:
+        task = _initializing[resource_class] = asyncio.create_task(_create_pool(resource_class))
+    # 单个调用方被取消时不影响其他等待同一初始化的调用方
+    return await asyncio.shield(task)
 
 
-async def get_pool() -> ContainerPool:
-    """获取全局容器池单例"""
-    global _pool
-    if _pool is None:
-        _pool = ContainerPool()
-        await _pool.initialize()
-    return _pool
+def get_pool_stats() -> dict[str, dict]:
+    """返回已创建的各规格容器池的统计"""
+    return {name: pool.stats for name, pool in _pools.items()}
 
 
 async def shutdown_pool() -> None:
-    """关闭全局容器池"""
-    global _pool
-    if _pool is not None:
-        await _pool.shutdown()
-        _pool = None
+    """关闭所有规格的全局容器池"""
+    initializing = list(_initializing.values())
+    for task in initializing:
+        task.cancel()
+    await asyncio.gather(*initializing, return_exceptions=True)
+    while _pools:
+        _, pool = _pools.popitem()
+        await pool.shutdown()
 
 
 async def cleanup_all_sunnyagent_containers() -> None:
@@ -0,0 +1,200 @@
+"""
+Docker SDK 调用执行器 - 阻塞的 Docker API 调用在专用线程池中执行
+
+Docker SDK 是同步的，之前所有调用都交给事件循环的默认线程池，
+与其他阻塞任务共用线程，且对 Docker daemon 的并发请求没有上限：
+突发的大量 exec 会占满默认线程池，拖慢与 Docker 无关的任务。
+
+这里为 Docker 调用单独建线程池，并按操作类型限制并发数；
+超出上限的调用在事件循环中排队，不占用线程。每类操作记录耗时直方图。
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from .metrics import LatencyHistogram
+
+T = TypeVar("T")
+
+# 各类操作的并发上限
+DOCKER_OP_LIMITS = {
+    "run": int(os.environ.get("SANDBOX_DOCKER_MAX_RUN", "4")),  # 创建并启动容器
+    "exec": int(os.environ.get("SANDBOX_DOCKER_MAX_EXEC", "16")),  # 在容器内执行命令（占用整个执行过程）
+    "get_archive": int(os.environ.get("SANDBOX_DOCKER_MAX_GET_ARCHIVE", "4")),  # 从容器复制文件
+    "put_archive": int(os.environ.get("SANDBOX_DOCKER_MAX_PUT_ARCHIVE", "4")),  # 向容器复制文件
+    "remove": int(os.environ.get("SANDBOX_DOCKER_MAX_REMOVE", "4")),  # 停止并删除容器
+    "inspect": int(os.environ.get("SANDBOX_DOCKER_MAX_INSPECT", "4")),  # 查询、列出容器
+}
+# 线程数，默认为各操作上限之和（排队发生在事件循环中，而不是线程池里）
+DOCKER_WORKERS = int(os.environ.get("SANDBOX_DOCKER_WORKERS", "0")) or sum(DOCKER_OP_LIMITS.values())
+
+class _OpLimiter:
+    """
+    单类操作的并发上限
+
+    等待者是各自事件循环上的 Future，不绑定某个事件循环，
+    全局执行器可以在多个事件循环之间复用。
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.active = 0
+        self.max_waiting = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for w in self._waiters if not w.done())
+
+    async def acquire(self) -> None:
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            return
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            # release() 把名额直接转交给等待者，active 不变
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class _OpStats:
+    def __init__(self, limit: int):
+        self.limiter = _OpLimiter(limit)
+        self.latency = LatencyHistogram()
+        self.errors = 0
+        self.wait_ms = 0.0
+
+    def finish(self, future: concurrent.futures.Future, elapsed_ms: Optional[float]) -> None:
+        self.limiter.release()
+        if elapsed_ms is not None:
+            self.latency.observe(elapsed_ms)
+        if not future.cancelled() and future.exception() is not None:
+            self.errors += 1
+
+
+class DockerExecutor:
+    """
+    Docker SDK 调用的专用线程池
+
+    每次调用先在事件循环中取得该类操作的名额，再提交到线程池；
+    名额在线程中的调用真正结束时才归还（等待方被取消时调用仍在执行，
+    不会因此突破上限）。
+    """
+
+    def __init__(
+        self,
+        op_limits: Optional[dict[str, int]] = None,
+        workers: Optional[int] = None,
+    ):
+        op_limits = dict(DOCKER_OP_LIMITS if op_limits is None else op_limits)
+        self.workers = workers or DOCKER_WORKERS
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="docker")
+        self._ops = {op: _OpStats(limit) for op, limit in op_limits.items()}
+
+    async def run(self, op: str, fn: Callable[..., T], *args) -> T:
+        """
+        在线程池中执行一次 Docker 调用
+
+        Args:
+            op: 操作类型，须为 DOCKER_OP_LIMITS 中的键
+            fn: 阻塞调用
+
+        Raises:
+            ValueError: 未知的操作类型
+        """
+        stats = self._ops.get(op)
+        if stats is None:
+            raise ValueError(f"Unknown Docker operation: {op}")
+
+        loop = asyncio.get_running_loop()
+        queued_at = time.perf_counter()
+        await stats.limiter.acquire()
+        stats.wait_ms += (time.perf_counter() - queued_at) * 1000
+        timing: dict[str, float] = {}
+
+        def call() -> T:
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                timing["ms"] = (time.perf_counter() - start) * 1000
+
+        def done(future: concurrent.futures.Future) -> None:
+            try:
+                loop.call_soon_threadsafe(stats.finish, future, timing.get("ms"))
+            except RuntimeError:
+                # 事件循环已关闭，没有等待者需要唤醒
+                stats.finish(future, timing.get("ms"))
+
+        try:
+            future = self._executor.submit(call)
+        except BaseException:
+            stats.limiter.release()
+            raise
+        future.add_done_callback(done)
+        return await asyncio.wrap_future(future)
+
+    @property
+    def stats(self) -> dict:
+        """返回各类操作的并发与耗时统计"""
+        ops = {}
+        for op, stats in self._ops.items():
+            limiter = stats.limiter
+            ops[op] = {
+                "limit": limiter.limit,
+                "in_flight": limiter.active,
+                "waiting": limiter.waiting,
+                "max_waiting": limiter.max_waiting,
+                "errors": stats.errors,
+                "avg_wait_ms": (
+                    round(stats.wait_ms / stats.latency.count, 2) if stats.latency.count else 0.0
+                ),
+                **stats.latency.snapshot(),
+            }
+        return {"workers": self.workers, "ops": ops}
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+# ============================================
+# 全局单例
+# ============================================
+_executor: Optional[DockerExecutor] = None
+
+
+def get_docker_executor() -> DockerExecutor:
+    """获取全局 Docker 调用执行器单例"""
+    global _executor
+    if _executor is None:
+        _executor = DockerExecutor()
+    return _executor
+
+
+async def docker_call(op: str, fn: Callable[..., T], *args) -> T:
+    """在全局 Docker 执行器中执行一次阻塞的 Docker 调用"""
+    return await get_docker_executor().run(op, fn, *args)
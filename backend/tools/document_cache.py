@@ -0,0 +1,297 @@
+"""
+已解析文档缓存 - 按文件内容哈希缓存上传文档的解析结果
+
+agent 和子 agent 会在多轮对话中反复读取同一个上传文件，PDF/Office 文档
+每次重新解析要几百毫秒到数秒。解析得到的规范化文档（见 document_parsers）
+按 (内容 sha256, 解析器版本) 保存在上传目录下的 .parsed/（不是字母数字，
+不会与文件 ID 冲突），进程重启后仍然有效：
+
+- {key}.data：页文本、正文分块和表格行（每行一个 JSON 数组）依次写入
+- {key}.json：索引，记录每页和每个正文分块在数据文件中的位置、每个表格的
+  行数和每 ROW_BLOCK 行的起始位置
+
+索引常驻内存 LRU，页、正文片段和表格行按需从数据文件中按位置读取：
+翻阅 500 页的 PDF 或百万行的工作表时，每次只读需要的部分。
+
+内容相同的文件即使文件 ID 不同也共用一条缓存。解析逻辑或存储格式变化时
+递增 PARSER_VERSION，旧缓存自然失效。
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from .sandbox_files import UPLOAD_DIR
+
+logger = logging.getLogger(__name__)
+
+PARSER_VERSION = 4  # 解析结果格式的版本
+CACHE_MEMORY_MB = int(os.environ.get("DOCUMENT_CACHE_MEMORY_MB", "64"))  # 内存中索引的上限
+CACHE_DIR_NAME = ".parsed"
+TEXT_CHUNK_CHARS = 64 * 1024  # 正文按字符分块存储，按偏移读取时只读相关的块
+ROW_BLOCK = 1000  # 表格每隔多少行记录一次起始位置
+
+
+class StoredDocument:
+    """
+    缓存中的一个解析结果
+
+    索引在内存中，内容按需从数据文件读取（读文件，在线程中调用）。
+    """
+
+    def __init__(self, index: dict, data_path: Path):
+        self.index = index
+        self.data_path = data_path
+
+    @property
+    def kind(self) -> str:
+        return self.index["kind"]
+
+    @property
+    def metadata(self) -> dict:
+        return self.index["metadata"]
+
+    @property
+    def page_count(self) -> int:
+        return len(self.index["pages"])
+
+    @property
+    def text_chars(self) -> int:
+        return self.index["text"]["chars"]
+
+    @property
+    def tables(self) -> list[dict]:
+        """表格列表：[{"name": 名称, "rows": 行数}]"""
+        return [{"name": t["name"], "rows": t["rows"]} for t in self.index["tables"]]
+
+    def _read_spans(self, spans: list[list[int]]) -> list[str]:
+        if not spans:
+            return []
+        with open(self.data_path, "rb") as f:
+            result = []
+            for offset, length in spans:
+                f.seek(offset)
+                result.append(f.read(length).decode("utf-8"))
+            return result
+
+    def pages(self, start: int, end: int) -> list[str]:
+        """第 start 到 end 页（0 起始，不含 end）的文本"""
+        return self._read_spans(self.index["pages"][start:end])
+
+    def text(self, offset: int, length: int) -> str:
+        """正文从第 offset 个字符起的 length 个字符"""
+        offset = max(0, offset)
+        end = min(offset + length, self.text_chars)
+        if offset >= end:
+            return ""
+        first = offset // TEXT_CHUNK_CHARS
+        last = (end - 1) // TEXT_CHUNK_CHARS
+        chunks = "".join(self._read_spans(self.index["text"]["chunks"][first:last + 1]))
+        base = first * TEXT_CHUNK_CHARS
+        return chunks[offset - base:end - base]
+
+    def rows(self, table: int, start: int, end: int) -> list[list[str]]:
+        """第 table 个表格第 start 到 end 行（0 起始，不含 end）"""
+        info = self.index["tables"][table]
+        start = max(0, start)
+        end = min(end, info["rows"])
+        if start >= end:
+            return []
+        block = start // ROW_BLOCK
+        with open(self.data_path, "rb") as f:
+            f.seek(info["blocks"][block])
+            for _ in range(start - block * ROW_BLOCK):
+                f.readline()
+            return [json.loads(f.readline()) for _ in range(end - start)]
+
+
+def _write_data(document: dict, path: Path) -> dict:
+    """
+    把规范化文档写入数据文件，返回索引
+
+    表格逐行写入：rows 是迭代器（如逐行读取的工作表）时边读边写，不保留已写的行。
+    """
+    with open(path, "wb") as f:
+
+        def span(text: str) -> list[int]:
+            raw = text.encode("utf-8")
+            offset = f.tell()
+            f.write(raw)
+            return [offset, len(raw)]
+
+        pages = [span(text) for text in document["pages"]]
+        body = document.get("text", "")
+        chunks = [span(body[i:i + TEXT_CHUNK_CHARS]) for i in range(0, len(body), TEXT_CHUNK_CHARS)]
+        tables = []
+        for table in document["tables"]:
+            blocks = []
+            count = 0
+            for row in table["rows"]:
+                if count % ROW_BLOCK == 0:
+                    blocks.append(f.tell())
+                f.write(json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n")
+                count += 1
+            tables.append({"name": table["name"], "rows": count, "blocks": blocks})
+
+    return {
+        "kind": document["kind"],
+        "metadata": document["metadata"],
+        "pages": pages,
+        "text": {"chars": len(body), "chunks": chunks},
+        "tables": tables,
+    }
+
+
+class DocumentCache:
+    """解析结果缓存：磁盘保存全部内容，内存 LRU 保存索引，可在多个线程中使用"""
+
+    def __init__(self, directory: Path, max_bytes: int = CACHE_MEMORY_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # key → (文档, 索引序列化后的字节数)
+        self._entries: OrderedDict[str, tuple[StoredDocument, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._stores = 0
+
+    @staticmethod
+    def _key(digest: str) -> str:
+        return f"{digest}-v{PARSER_VERSION}"
+
+    def _index_path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _data_path(self, key: str) -> Path:
+        return self.directory / f"{key}.data"
+
+    def _remember(self, key: str, document: StoredDocument, size: int) -> None:
+        """放入内存 LRU，调用方持有锁"""
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (document, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+
+    def contains(self, digest: str) -> bool:
+        """是否已缓存（不加载索引）"""
+        key = self._key(digest)
+        with self._lock:
+            if key in self._entries:
+                return True
+        return self._index_path(key).exists()
+
+    def get(self, digest: str) -> Optional[StoredDocument]:
+        """按内容哈希取解析结果，未缓存时返回 None"""
+        key = self._key(digest)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._memory_hits += 1
+                return entry[0]
+
+        document = None
+        try:
+            raw = self._index_path(key).read_bytes()
+            document = StoredDocument(json.loads(raw), self._data_path(key))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read parsed document cache {key}: {e}")
+
+        with self._lock:
+            if document is None:
+                self._misses += 1
+                return None
+            self._disk_hits += 1
+            self._remember(key, document, len(raw))
+        return document
+
+    def write(self, digest: str, document: dict) -> dict:
+        """
+        把解析结果写入缓存目录并返回索引，不放入内存
+
+        只读写文件，在解析进程中调用时文档内容不必传回 API 进程。
+
+        Raises:
+            OSError: 写入失败
+        """
+        key = self._key(digest)
+        index_path = self._index_path(key)
+        data_path = self._data_path(key)
+        # 先写临时文件再改名，并发读取不会看到写了一半的文件；
+        # 数据文件先于索引就位，索引存在即表示缓存完整
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_data = data_path.with_name(data_path.name + suffix)
+        tmp_index = index_path.with_name(index_path.name + suffix)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            index = _write_data(document, tmp_data)
+            tmp_index.write_bytes(json.dumps(index, ensure_ascii=False).encode("utf-8"))
+            os.replace(tmp_data, data_path)
+            os.replace(tmp_index, index_path)
+        except OSError:
+            tmp_data.unlink(missing_ok=True)
+            tmp_index.unlink(missing_ok=True)
+            raise
+        return index
+
+    def adopt(self, digest: str, index: dict) -> StoredDocument:
+        """登记已由 write() 写入缓存目录的解析结果（如解析进程写入的），放入内存"""
+        key = self._key(digest)
+        stored = StoredDocument(index, self._data_path(key))
+        size = len(json.dumps(index, ensure_ascii=False).encode("utf-8"))
+        with self._lock:
+            self._remember(key, stored, size)
+            self._stores += 1
+        return stored
+
+    def put(self, digest: str, document: dict) -> StoredDocument:
+        """
+        保存解析结果并建立索引
+
+        Raises:
+            OSError: 写入失败
+        """
+        return self.adopt(digest, self.write(digest, document))
+
+    @property
+    def stats(self) -> dict:
+        """返回缓存命中统计"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "stores": self._stores,
+            }
+
+
+# ============================================
+# 全局单例
+# ============================================
+_cache: Optional[DocumentCache] = None
+
+
+def get_document_cache() -> DocumentCache:
+    """获取全局解析结果缓存单例"""
+    global _cache
+    if _cache is None:
+        _cache = DocumentCache(UPLOAD_DIR / CACHE_DIR_NAME)
+    return _cache
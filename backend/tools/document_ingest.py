@@ -0,0 +1,508 @@
+"""
+上传文档解析流水线 - 上传后在进程池中解析文档，agent 读取时直接使用解析结果
+
+pypdf、python-docx、openpyxl 的解析是同步的 CPU 密集操作：放在工具调用里，
+agent 第一次读取大文件要等几秒，解析还占着 GIL 拖慢同一进程里的其他请求。
+上传完成后立即把文档提交给解析进程池。解析进程把规范化的解析结果直接写入
+DocumentCache 的缓存目录，只把索引传回 API 进程：文档内容（如工作表的全部行）
+不经过管道，也不会整个留在 Web 服务进程的内存里。
+
+同一内容只解析一次：正在解析时再次提交（或 agent 读取）会等待同一个任务；
+解析失败的文档记录错误，不反复重试。
+
+解析进程池是有界的：排队的文件数有上限，每个文件有解析时限，超时或被放弃
+（所有等待的工具调用都已取消）的解析会结束对应的解析进程。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection, wait
+from pathlib import Path
+from typing import Callable, Optional
+
+from .document_cache import DocumentCache, StoredDocument, get_document_cache
+from .document_parsers import extract_document, is_parsed_type
+from .metrics import LatencyHistogram
+from .sandbox_files import file_digest
+
+logger = logging.getLogger(__name__)
+
+INGEST_WORKERS = int(os.environ.get("DOCUMENT_INGEST_WORKERS", "2"))  # 解析进程数
+PARSE_TIMEOUT = float(os.environ.get("DOCUMENT_PARSE_TIMEOUT", "120"))  # 单个文件的解析时限（秒）
+PARSE_MAX_QUEUE = int(os.environ.get("DOCUMENT_PARSE_MAX_QUEUE", "32"))  # 排队等待解析的文件数上限
+MAX_RECORDED_FAILURES = 256  # 记录解析失败的文档数上限
+_CANCEL_CHECK_INTERVAL = 0.1  # 解析中检查是否被取消的间隔（秒）
+
+# 解析状态
+STATUS_PENDING = "pending"  # 排队或正在解析
+STATUS_READY = "ready"  # 已解析，读取时直接使用缓存
+STATUS_FAILED = "failed"  # 解析失败
+STATUS_DEFERRED = "deferred"  # 解析队列已满，第一次读取时再解析
+STATUS_NOT_REQUIRED = "not_required"  # 文本文件，读取时直接读原文件
+
+
+class ParseTimeoutError(TimeoutError):
+    """解析超过时限，解析进程已结束"""
+
+
+class ParserBusyError(RuntimeError):
+    """排队等待解析的文件已达上限"""
+
+
+def parse_to_cache(path: str, digest: str, directory: str) -> dict:
+    """
+    解析文档并写入缓存目录（解析进程的入口），只返回索引
+
+    Raises:
+        OSError: 写入缓存失败
+        同 extract_document()
+    """
+    return DocumentCache(Path(directory)).write(digest, extract_document(path))
+
+
+def _parser_main(conn: Connection, fn: Callable[..., dict]) -> None:
+    """解析进程：循环接收任务参数，返回 ("ok", 结果) 或 ("error", 异常)"""
+    while True:
+        try:
+            args = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            conn.send(("ok", fn(*args)))
+        except Exception as e:
+            try:
+                conn.send(("error", e))
+            except Exception:
+                # 异常对象无法跨进程传递
+                conn.send(("error", RuntimeError(str(e))))
+
+
+def _settle(future: Future, result=None, error: Optional[BaseException] = None) -> None:
+    """设置任务结果；任务已被取消时忽略"""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class _Worker:
+    """一个解析进程及与它通信的管道"""
+
+    def __init__(self, fn: Callable[..., dict]):
+        context = multiprocessing.get_context("spawn")
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_parser_main, args=(child, fn), daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join(5)
+        self.conn.close()
+
+
+class ParserPool:
+    """
+    有界的解析进程池
+
+    每个解析进程由一个调度线程管理，一次解析一个文件。任务用
+    concurrent.futures.Future 表示：排队中或解析中都可以 cancel()，
+    解析中的任务被取消或超时时结束该解析进程，下一个任务启动新进程。
+    """
+
+    def __init__(
+        self,
+        workers: int = INGEST_WORKERS,
+        timeout: float = PARSE_TIMEOUT,
+        max_queue: int = PARSE_MAX_QUEUE,
+        fn: Callable[..., dict] = parse_to_cache,
+    ):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_queue = max_queue
+        self._fn = fn
+        self._queue: queue.SimpleQueue[Optional[tuple[tuple, Future]]] = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self._processes: set[_Worker] = set()
+        self._queued: set[Future] = set()  # 排队中（未取消）的任务
+        self._running = 0
+        self._closed = False
+        self._timeouts = 0
+        self._cancelled = 0
+        self._spawned = 0
+
+    def submit(self, *args) -> Future:
+        """
+        提交一个文件，返回解析结果的 Future
+
+        Args:
+            args: 解析函数的参数（如文件路径），需要可以跨进程传递
+
+        Raises:
+            ParserBusyError: 排队的文件已达 max_queue
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Parser pool is shut down")
+            if len(self._queued) >= self.max_queue:
+                raise ParserBusyError("文档解析队列已满，请稍后重试")
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._slot, name=f"document-parser-{len(self._threads)}", daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+            # 不调用 set_running_or_notify_cancel()：解析中也可以 cancel()
+            future: Future = Future()
+            self._queued.add(future)
+        future.add_done_callback(self._dequeue)
+        self._queue.put((args, future))
+        return future
+
+    def _dequeue(self, future: Future) -> None:
+        with self._lock:
+            self._queued.discard(future)
+
+    def _slot(self) -> None:
+        worker: Optional[_Worker] = None
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            args, future = item
+            with self._lock:
+                self._queued.discard(future)
+                if future.cancelled():
+                    self._cancelled += 1
+                    continue
+                self._running += 1
+            try:
+                worker = self._parse(worker, args, future)
+            finally:
+                with self._lock:
+                    self._running -= 1
+        if worker is not None:
+            self._retire(worker)
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._fn)
+        with self._lock:
+            self._processes.add(worker)
+            self._spawned += 1
+        return worker
+
+    def _retire(self, worker: _Worker) -> None:
+        worker.kill()
+        with self._lock:
+            self._processes.discard(worker)
+
+    def _parse(self, worker: Optional[_Worker], args: tuple, future: Future) -> Optional[_Worker]:
+        """解析一个文件，返回可以继续使用的解析进程（进程已结束时返回 None）"""
+        try:
+            if worker is None or not worker.process.is_alive():
+                worker = self._spawn()
+            worker.conn.send(args)
+        except Exception as e:
+            if worker is not None:
+                self._retire(worker)
+            _settle(future, error=BrokenProcessPool(f"无法启动解析进程：{e}"))
+            return None
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            ready = wait(
+                [worker.conn, worker.process.sentinel],
+                timeout=max(0.0, min(remaining, _CANCEL_CHECK_INTERVAL)),
+            )
+            if worker.conn in ready:
+                try:
+                    status, value = worker.conn.recv()
+                except (EOFError, OSError):
+                    ready = [worker.process.sentinel]
+                else:
+                    if status == "ok":
+                        _settle(future, value)
+                    else:
+                        _settle(future, error=value)
+                    return worker
+            if ready:
+                # 解析进程异常退出（如内存耗尽被杀）
+                self._retire(worker)
+                _settle(future, error=BrokenProcessPool("解析进程异常退出"))
+                return None
+            if future.cancelled():
+                self._retire(worker)
+                with self._lock:
+                    self._cancelled += 1
+                return None
+            if remaining <= 0:
+                self._retire(worker)
+                with self._lock:
+                    self._timeouts += 1
+                _settle(future, error=ParseTimeoutError(f"解析超过 {self.timeout:g} 秒，已终止"))
+                return None
+
+    @property
+    def stats(self) -> dict:
+        """返回排队与解析进程统计"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "processes": len(self._processes),
+                "queued": len(self._queued),
+                "running": self._running,
+                "max_queue": self.max_queue,
+                "timeouts": self._timeouts,
+                "cancelled": self._cancelled,
+                "spawned": self._spawned,
+            }
+
+    def shutdown(self) -> None:
+        """结束所有解析进程，排队中的任务被取消"""
+        with self._lock:
+            self._closed = True
+            threads = list(self._threads)
+            workers = list(self._processes)
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].cancel()
+        for _ in threads:
+            self._queue.put(None)
+        for worker in workers:
+            worker.kill()
+
+
+@dataclass(eq=False)
+class _Job:
+    """一个内容哈希的解析任务"""
+
+    parse: Future  # 解析进程池中的任务，结果是解析进程写入缓存的索引
+    stored: Future = field(default_factory=Future)  # 解析结果登记到缓存后的 StoredDocument
+    pinned: bool = False  # 由上传或同步读取提交：没有异步等待方时也继续解析
+    waiters: int = 0  # 正在等待的异步读取数
+    start: float = field(default_factory=time.perf_counter)
+
+
+class IngestionManager:
+    """
+    上传文档的解析流水线
+
+    submit() 只提交不等待，供上传接口调用；aload() 取得解析结果，
+    未解析完时等待，供工具调用；load() 是在线程中阻塞等待的同步版本。
+    """
+
+    def __init__(
+        self,
+        workers: int = INGEST_WORKERS,
+        timeout: float = PARSE_TIMEOUT,
+        max_queue: int = PARSE_MAX_QUEUE,
+    ):
+        self.workers = max(1, workers)
+        self._parser = ParserPool(self.workers, timeout, max_queue)
+        # 完成回调可能在持有锁时同步执行（如 cancel()），需要可重入
+        self._lock = threading.RLock()
+        self._jobs: dict[str, _Job] = {}  # 内容哈希 → 正在进行的解析任务
+        self._failures: OrderedDict[str, BaseException] = OrderedDict()
+        self._parse_time = LatencyHistogram()
+        self._submitted = 0
+        self._ingested = 0
+        self._failed = 0
+        self._abandoned = 0
+
+    def _job(self, path: Path, digest: str, pinned: bool = False) -> Optional[_Job]:
+        """
+        返回该内容的解析任务，已缓存时返回 None（调用方持有锁）
+
+        Raises:
+            ParserBusyError: 解析队列已满
+            该内容上次解析失败的异常
+        """
+        job = self._jobs.get(digest)
+        if job is not None:
+            job.pinned = job.pinned or pinned
+            return job
+        error = self._failures.get(digest)
+        if error is not None:
+            raise error
+        # 完成回调先登记缓存再移除任务，持有锁时任务不存在说明已缓存或从未解析
+        cache = get_document_cache()
+        if cache.contains(digest):
+            return None
+
+        job = _Job(self._parser.submit(str(path), digest, str(cache.directory)), pinned=pinned)
+        self._jobs[digest] = job
+        self._submitted += 1
+        job.parse.add_done_callback(lambda f: self._finished(digest, job))
+        return job
+
+    def _finished(self, digest: str, job: _Job) -> None:
+        parse = job.parse
+        stored: Optional[StoredDocument] = None
+        error = None if parse.cancelled() else parse.exception()
+        if not parse.cancelled() and error is None:
+            # 解析进程已写好缓存文件，这里只登记索引
+            stored = get_document_cache().adopt(digest, parse.result())
+        with self._lock:
+            if self._jobs.get(digest) is job:
+                del self._jobs[digest]
+            if parse.cancelled():
+                job.stored.cancel()
+                return
+            self._parse_time.observe((time.perf_counter() - job.start) * 1000)
+            if error is None:
+                self._ingested += 1
+            else:
+                self._failed += 1
+                logger.warning(f"Failed to parse uploaded document {digest[:12]}: {error}")
+                # 解析进程异常退出、磁盘写入失败不一定是文档本身的问题，下次读取时重试
+                if not isinstance(error, (BrokenProcessPool, OSError)):
+                    self._failures[digest] = error
+                    while len(self._failures) > MAX_RECORDED_FAILURES:
+                        self._failures.popitem(last=False)
+        _settle(job.stored, stored, error)
+
+    def submit(self, path: Path, digest: Optional[str] = None) -> dict:
+        """
+        提交文档解析并返回解析状态，不等待解析完成
+
+        已解析或正在解析的内容不会重复提交，因此也用于查询状态。
+
+        Args:
+            path: 上传文件路径
+            digest: 文件内容的 sha256，调用方已算出时传入
+        """
+        if not is_parsed_type(path):
+            return {"status": STATUS_NOT_REQUIRED}
+        digest = digest or file_digest(path)
+        with self._lock:
+            try:
+                job = self._job(path, digest, pinned=True)
+            except ParserBusyError:
+                return {"status": STATUS_DEFERRED}
+            except Exception as e:
+                return {"status": STATUS_FAILED, "error": str(e)}
+        if job is None:
+            return {"status": STATUS_READY}
+        future = job.stored
+        if not future.done() or future.cancelled():
+            return {"status": STATUS_PENDING}
+        error = future.exception()
+        if error is not None:
+            return {"status": STATUS_FAILED, "error": str(error)}
+        return {"status": STATUS_READY}
+
+    def _cached(self, path: Path) -> tuple[str, Optional[StoredDocument]]:
+        """计算内容哈希并读取缓存（读文件，在线程中调用）"""
+        if not is_parsed_type(path):
+            raise ValueError(f"不支持解析的文件类型：{path.suffix.lower()}")
+        digest = file_digest(path)
+        return digest, get_document_cache().get(digest)
+
+    def load(self, path: Path) -> StoredDocument:
+        """
+        取得文档的解析结果，还没有解析完时阻塞等待（在线程中调用）
+
+        Raises:
+            ValueError: 不是需要解析的文档类型
+            ParseTimeoutError: 解析超时
+            ParserBusyError: 解析队列已满
+            Exception: 解析失败时解析器抛出的异常
+        """
+        digest, document = self._cached(path)
+        if document is not None:
+            return document
+        with self._lock:
+            job = self._job(path, digest, pinned=True)
+        if job is None:
+            return get_document_cache().get(digest)
+        return job.stored.result()
+
+    async def aload(self, path: Path) -> StoredDocument:
+        """
+        load() 的异步版本：读文件在线程中执行，等待解析时不占用线程
+
+        调用被取消且没有其他等待方时取消解析（由上传提交的解析除外），
+        正在解析的文件会结束解析进程。
+
+        Raises:
+            同 load()
+        """
+        loop = asyncio.get_running_loop()
+        digest, document = await loop.run_in_executor(None, self._cached, path)
+        if document is not None:
+            return document
+        with self._lock:
+            job = self._job(path, digest)
+            if job is not None:
+                job.waiters += 1
+        if job is None:
+            return await loop.run_in_executor(None, get_document_cache().get, digest)
+
+        try:
+            # shield：一个等待方被取消不影响同一任务的其他等待方
+            return await asyncio.shield(asyncio.wrap_future(job.stored))
+        finally:
+            with self._lock:
+                job.waiters -= 1
+                if not job.waiters and not job.pinned and not job.stored.done():
+                    self._abandoned += 1
+                    job.parse.cancel()
+
+    @property
+    def stats(self) -> dict:
+        """返回解析任务统计"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "in_flight": len(self._jobs),
+                "submitted": self._submitted,
+                "ingested": self._ingested,
+                "failed": self._failed,
+                "abandoned": self._abandoned,
+                "parse_time": self._parse_time.snapshot(),
+                "parser": self._parser.stats,
+            }
+
+    def shutdown(self) -> None:
+        self._parser.shutdown()
+
+
+# ============================================
+# 全局单例
+# ============================================
+_manager: Optional[IngestionManager] = None
+
+
+def get_ingestion_manager() -> IngestionManager:
+    """获取全局文档解析流水线单例"""
+    global _manager
+    if _manager is None:
+        _manager = IngestionManager()
+    return _manager
+
+
+def shutdown_ingestion() -> None:
+    """结束解析进程（应用退出时调用）"""
+    global _manager
+    if _manager is not None:
+        _manager.shutdown()
+        _manager = None
@@ -0,0 +1,148 @@
+"""
+文档解析 - 把上传的 PDF/Office 文件解析为规范化的文档结构
+
+在解析进程池中执行，只依赖解析库本身。解析结果是一个 dict：
+
+    {
+        "kind": "pdf" | "docx" | "xlsx" | "pptx",
+        "pages": ["第 1 页文本", ...],      # PDF 的页、PPT 的幻灯片
+        "text": "正文",                     # Word 正文（其他类型为空）
+        "tables": [{"name": "Sheet1", "rows": [["a", "b"], ...]}, ...],  # Excel 工作表、Word 表格
+        "metadata": {...},
+    }
+
+tables 和每个表格的 rows 可以是只能按顺序遍历一次的迭代器：Excel 工作表的行
+边读边交给缓存写入（见 DocumentCache.write），百万行的工作表也不会整个留在
+内存里。结果在解析进程中直接写入缓存，不跨进程传递。
+
+单元格统一转成字符串，空行跳过。
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterator
+
+
+def _cell(value) -> str:
+    return str(value) if value is not None else ""
+
+
+def _pdf(file_path: Path) -> dict:
+    from pypdf import PdfReader
+
+    reader = PdfReader(str(file_path))
+    pages = [page.extract_text() or "" for page in reader.pages]
+    info = reader.metadata or {}
+    return {
+        "kind": "pdf",
+        "pages": pages,
+        "text": "",
+        "tables": [],
+        "metadata": {
+            "page_count": len(pages),
+            "title": info.get("/Title") and str(info.get("/Title")),
+            "author": info.get("/Author") and str(info.get("/Author")),
+        },
+    }
+
+
+def _docx(file_path: Path) -> dict:
+    from docx import Document
+
+    doc = Document(str(file_path))
+    paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
+    tables = []
+    for i, table in enumerate(doc.tables, 1):
+        rows = [[cell.text for cell in row.cells] for row in table.rows]
+        tables.append({"name": f"Table {i}", "rows": [r for r in rows if any(c.strip() for c in r)]})
+    props = doc.core_properties
+    return {
+        "kind": "docx",
+        "pages": [],
+        "text": "\n\n".join(paragraphs),
+        "tables": tables,
+        "metadata": {
+            "paragraph_count": len(paragraphs),
+            "table_count": len(tables),
+            "title": props.title or None,
+            "author": props.author or None,
+        },
+    }
+
+
+def _sheet_rows(sheet) -> Iterator[list[str]]:
+    for row in sheet.iter_rows(values_only=True):
+        cells = [_cell(cell) for cell in row]
+        if any(c.strip() for c in cells):  # Skip empty rows
+            yield cells
+
+
+def _xlsx(file_path: Path) -> dict:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(str(file_path), read_only=True, data_only=True)
+    sheet_names = list(wb.sheetnames)
+
+    def tables() -> Iterator[dict]:
+        # 逐个工作表逐行读取，遍历结束（或中途放弃）时关闭工作簿
+        try:
+            for sheet_name in sheet_names:
+                yield {"name": sheet_name, "rows": _sheet_rows(wb[sheet_name])}
+        finally:
+            wb.close()
+
+    return {
+        "kind": "xlsx",
+        "pages": [],
+        "text": "",
+        "tables": tables(),
+        # 行数在写入缓存时统计，见索引中的 tables
+        "metadata": {"sheets": sheet_names},
+    }
+
+
+def _pptx(file_path: Path) -> dict:
+    from pptx import Presentation
+
+    prs = Presentation(str(file_path))
+    slides = []
+    for slide in prs.slides:
+        texts = [shape.text for shape in slide.shapes if hasattr(shape, "text") and shape.text.strip()]
+        slides.append("\n".join(texts))
+    return {
+        "kind": "pptx",
+        "pages": slides,
+        "text": "",
+        "tables": [],
+        "metadata": {"slide_count": len(slides)},
+    }
+
+
+# 扩展名 → 解析函数
+EXTRACTORS = {
+    ".pdf": _pdf,
+    ".docx": _docx,
+    ".xlsx": _xlsx,
+    ".xls": _xlsx,
+    ".pptx": _pptx,
+}
+
+
+def is_parsed_type(file_path: Path) -> bool:
+    """是否需要解析（文本文件直接读取，不经过解析）"""
+    return file_path.suffix.lower() in EXTRACTORS
+
+
+def extract_document(path: str) -> dict:
+    """
+    解析文档（在解析进程中调用，结果交给 DocumentCache.write 写入缓存）
+
+    Raises:
+        ValueError: 不是需要解析的文档类型
+        Exception: 解析库抛出的异常
+    """
+    file_path = Path(path)
+    extractor = EXTRACTORS.get(file_path.suffix.lower())
+    if extractor is None:
+        raise ValueError(f"不支持解析的文件类型：{file_path.suffix.lower()}")
+    return extractor(file_path)
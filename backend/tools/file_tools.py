@@ -1,32 +1,191 @@
 """File reading tools for uploaded files."""
 
+import asyncio
+import codecs
 from pathlib import Path
 
 from langchain_core.tools import tool
 
-MAX_TEXT_SIZE = 50 * 1024  # 50KB 文本截断限制
-MAX_PDF_PAGES = 20  # PDF 最多读取 20 页
-MAX_EXCEL_ROWS = 500  # Excel 最多读取 500 行
+from .document_cache import StoredDocument
+from .document_ingest import get_ingestion_manager
+from .sandbox_files import UPLOAD_DIR
+
+MAX_TEXT_SIZE = 50 * 1024  # 每次最多读取 50K 字符
+MAX_PDF_PAGES = 20  # PDF 每次最多读取 20 页
+MAX_EXCEL_ROWS = 500  # 每个表格每次最多读取 500 行
+
+# 需要解析的文档类型：扩展名 → 解析失败的提示
+_READ_ERRORS = {
+    ".pdf": "读取 PDF 失败",
+    ".docx": "读取 Word 文件失败",
+    ".xlsx": "读取 Excel 文件失败",
+    ".xls": "读取 Excel 文件失败",
+    ".pptx": "读取 PowerPoint 文件失败",
+}
+
+
+def _read_text(file_path: Path, offset: int = 0) -> str:
+    """文本文件从字节偏移 offset 起读取最多 MAX_TEXT_SIZE 个字符（直接定位，不从头读取）"""
+    size = file_path.stat().st_size
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        raw = f.read(MAX_TEXT_SIZE * 4)  # UTF-8 每个字符最多 4 字节
+
+    # 偏移落在多字节字符中间时跳过残缺的部分；末尾残缺的字符留在解码器中，不输出
+    skip = 0
+    while skip < min(3, len(raw)) and raw[skip] & 0xC0 == 0x80:
+        skip += 1
+    content = codecs.getincrementaldecoder("utf-8")().decode(raw[skip:])[:MAX_TEXT_SIZE]
+    end = offset + skip + len(content.encode("utf-8"))
+    if end >= size:
+        return content
+    return (
+        content
+        + f"\n\n[... 仅显示第 {offset}-{end} 字节，原文件共 {size} 字节；"
+        f"使用 offset={end} 继续读取 ...]"
+    )
+
+
+def _parse_range(spec: str, total: int) -> tuple[int, int]:
+    """把 "5" 或 "5-10"（从 1 开始，含两端）转换为从 0 开始的半开区间"""
+    first, _, last = spec.partition("-")
+    try:
+        start = int(first)
+        end = int(last) if last else start
+    except ValueError:
+        raise ValueError(f'无效的页码范围 "{spec}"，应为 "5" 或 "5-10"') from None
+    if start < 1 or end < start:
+        raise ValueError(f'无效的页码范围 "{spec}"，应为 "5" 或 "5-10"')
+    if start > total:
+        raise ValueError(f"页码超出范围：共 {total} 页")
+    return start - 1, min(end, total)
+
+
+def _render_pages(document: StoredDocument, pages: str | None) -> str:
+    total = document.page_count
+    start, end = _parse_range(pages, total) if pages else (0, total)
+    if document.kind == "pdf":
+        end = min(end, start + MAX_PDF_PAGES)
+        blocks = [f"[Page {i}]\n{text}" for i, text in enumerate(document.pages(start, end), start + 1)]
+    else:
+        blocks = [
+            "\n".join(filter(None, [f"[Slide {i}]", text]))
+            for i, text in enumerate(document.pages(start, end), start + 1)
+        ]
+
+    result = "\n\n".join(blocks)
+    if end < total:
+        following = f"{end + 1}-{min(end + MAX_PDF_PAGES, total)}"
+        result += (
+            f"\n\n[... 仅显示第 {start + 1}-{end} 页，原文件共 {total} 页；"
+            f'使用 pages="{following}" 继续读取 ...]'
+        )
+    return result
+
+
+def _render_tables(document: StoredDocument, sheet: str | None, start_row: int, prefix: str) -> str:
+    tables = document.tables
+    names = [t["name"] for t in tables]
+    if sheet is not None:
+        if sheet not in names:
+            raise ValueError(f"找不到表格 {sheet}，可用的表格：{', '.join(names) or '无'}")
+        selected = [names.index(sheet)]
+        if start_row > max(1, tables[selected[0]]["rows"]):
+            raise ValueError(f"起始行超出范围：{sheet} 共 {tables[selected[0]]['rows']} 行")
+    else:
+        selected = range(len(tables))
+
+    parts = []
+    for i in selected:
+        name, total = names[i], tables[i]["rows"]
+        start = start_row - 1
+        rows = document.rows(i, start, start + MAX_EXCEL_ROWS)
+        table = [f"=== {prefix}{name} ===", "\n".join("\t".join(row) for row in rows)]
+        end = start + len(rows)
+        if end < total:
+            table.append(
+                f"[... 仅显示第 {start + 1}-{end} 行，共 {total} 行；"
+                f'使用 sheet="{name}", start_row={end + 1} 继续读取 ...]'
+            )
+        parts.append("\n\n".join(table))
+    return "\n\n".join(parts)
+
+
+def _render_docx(document: StoredDocument, sheet: str | None, start_row: int, offset: int) -> str:
+    # 指定表格时只读表格
+    if sheet is not None:
+        return _render_tables(document, sheet, start_row, "")
+
+    total = document.text_chars
+    content = document.text(offset, MAX_TEXT_SIZE)
+    end = offset + len(content)
+    parts = [content] if content else []
+    if end < total:
+        parts.append(
+            f"[... 仅显示正文第 {offset + 1}-{end} 字符，正文共 {total} 字符；"
+            f"使用 offset={end} 继续读取 ...]"
+        )
+        return "\n\n".join(parts)
+    # 正文读完后接着输出表格
+    if document.tables:
+        parts.append(_render_tables(document, None, start_row, ""))
+    return "\n\n".join(parts)
+
+
+def render_document(
+    document: StoredDocument,
+    pages: str | None = None,
+    sheet: str | None = None,
+    start_row: int = 1,
+    offset: int = 0,
+) -> str:
+    """
+    按读取范围把解析结果渲染为工具返回的文本（读缓存数据文件，在线程中调用）
+
+    Raises:
+        ValueError: 读取范围无效
+    """
+    if start_row < 1:
+        raise ValueError("start_row 从 1 开始")
+    if offset < 0:
+        raise ValueError("offset 不能为负数")
+    if document.kind in ("pdf", "pptx"):
+        return _render_pages(document, pages)
+    if document.kind == "xlsx":
+        return _render_tables(document, sheet, start_row, "Sheet: ")
+    return _render_docx(document, sheet, start_row, offset)
 
 
 @tool
-def read_uploaded_file(file_id: str) -> str:
+async def read_uploaded_file(
+    file_id: str,
+    pages: str | None = None,
+    sheet: str | None = None,
+    start_row: int = 1,
+    offset: int = 0,
+) -> str:
     """读取用户上传的文件内容。
 
     支持的文件类型：
-    - 文本文件：txt, md, json, csv（直接读取，超过50KB截断）
-    - PDF 文件：提取文本内容（最多读取前20页）
-    - Word 文件：docx（提取文本内容）
-    - Excel 文件：xlsx, xls（提取表格数据，最多500行）
+    - 文本文件：txt, md, json, csv（每次最多读取 50K 字符）
+    - PDF 文件：提取文本内容（每次最多读取 20 页）
+    - Word 文件：docx（提取正文和表格，正文每次最多读取 50K 字符）
+    - Excel 文件：xlsx, xls（提取表格数据，每个工作表每次最多读取 500 行）
     - PowerPoint 文件：pptx（提取幻灯片文本）
 
+    内容没有读完时，结果末尾会提示继续读取需要传入的参数。
+
     Args:
         file_id: 文件 ID（从用户消息的附件信息中获取）
+        pages: PDF/PowerPoint 的页码范围，如 "21-40"（从 1 开始）
+        sheet: 只读取指定的 Excel 工作表或 Word 表格（如 "Table 1"）
+        start_row: 表格从第几行开始读取（从 1 开始）
+        offset: 文本文件的字节偏移，或 Word 正文的字符偏移
 
     Returns:
         文件内容的文本形式
     """
-    file_dir = Path(f"/tmp/sunnyagent_files/{file_id}")
+    file_dir = UPLOAD_DIR / file_id
     if not file_dir.exists():
         return f"错误：找不到文件 ID {file_id}"
 
@@ -36,59 +195,17 @@ def read_uploaded_file(file_id: str) -> str:
 
     file_path = files[0]
     ext = file_path.suffix.lower()
+    loop = asyncio.get_running_loop()
 
     # 文本文件
     if ext in {".txt", ".md", ".json", ".csv"}:
+        if offset < 0:
+            return "错误：offset 不能为负数"
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-            if len(content) > MAX_TEXT_SIZE:
-                return (
-                    content[:MAX_TEXT_SIZE]
-                    + f"\n\n[... 内容已截断，原文件共 {len(content)} 字符 ...]"
-                )
-            return content
+            return await loop.run_in_executor(None, _read_text, file_path, offset)
         except Exception as e:
             return f"读取文件失败：{e}"
 
-    # PDF 文件
-    if ext == ".pdf":
-        try:
-            from pypdf import PdfReader
-
-            reader = PdfReader(str(file_path))
-            total_pages = len(reader.pages)
-            pages_to_read = min(total_pages, MAX_PDF_PAGES)
-
-            pages_text = []
-            for i in range(pages_to_read):
-                text = reader.pages[i].extract_text() or ""
-                pages_text.append(f"[Page {i+1}]\n{text}")
-
-            result = "\n\n".join(pages_text)
-            if total_pages > MAX_PDF_PAGES:
-                result += f"\n\n[... 仅显示前 {MAX_PDF_PAGES} 页，原文件共 {total_pages} 页 ...]"
-            return result
-        except Exception as e:
-            return f"读取 PDF 失败：{e}"
-
-    # Word 文件 (docx)
-    if ext == ".docx":
-        try:
-            from docx import Document
-
-            doc = Document(str(file_path))
-            paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
-            content = "\n\n".join(paragraphs)
-            if len(content) > MAX_TEXT_SIZE:
-                return (
-                    content[:MAX_TEXT_SIZE]
-                    + f"\n\n[... 内容已截断，原文件共 {len(content)} 字符 ...]"
-                )
-            return content
-        except Exception as e:
-            return f"读取 Word 文件失败：{e}"
-
     # 旧版 Word 文件 (doc) - 不支持直接读取
     if ext == ".doc":
         return (
@@ -96,55 +213,21 @@ def read_uploaded_file(file_id: str) -> str:
             "建议：请将文件另存为 .docx 格式后重新上传，或使用 activate_skill('docx') 获取处理指南。"
         )
 
-    # Excel 文件 (xlsx, xls)
-    if ext in {".xlsx", ".xls"}:
+    # PDF、Word (docx)、Excel (xlsx, xls)、PowerPoint (pptx)：上传后已在后台解析，
+    # 还没有解析完时在解析进程池中等待，不阻塞事件循环；按范围只读取需要的部分
+    if ext in _READ_ERRORS:
         try:
-            from openpyxl import load_workbook
-
-            wb = load_workbook(str(file_path), read_only=True, data_only=True)
-            result_parts = []
-
-            for sheet_name in wb.sheetnames:
-                sheet = wb[sheet_name]
-                result_parts.append(f"=== Sheet: {sheet_name} ===")
-
-                rows = []
-                row_count = 0
-                for row in sheet.iter_rows(values_only=True):
-                    if row_count >= MAX_EXCEL_ROWS:
-                        result_parts.append(f"\n[... 仅显示前 {MAX_EXCEL_ROWS} 行 ...]")
-                        break
-                    # Convert row to string, handling None values
-                    row_str = "\t".join(str(cell) if cell is not None else "" for cell in row)
-                    if row_str.strip():  # Skip empty rows
-                        rows.append(row_str)
-                        row_count += 1
-
-                result_parts.append("\n".join(rows))
-
-            wb.close()
-            return "\n\n".join(result_parts)
+            document = await get_ingestion_manager().aload(file_path)
         except Exception as e:
-            return f"读取 Excel 文件失败：{e}"
-
-    # PowerPoint 文件 (pptx)
-    if ext == ".pptx":
+            return f"{_READ_ERRORS[ext]}：{e}"
         try:
-            from pptx import Presentation
-
-            prs = Presentation(str(file_path))
-            slides_text = []
-
-            for i, slide in enumerate(prs.slides, 1):
-                slide_content = [f"[Slide {i}]"]
-                for shape in slide.shapes:
-                    if hasattr(shape, "text") and shape.text.strip():
-                        slide_content.append(shape.text)
-                slides_text.append("\n".join(slide_content))
-
-            return "\n\n".join(slides_text)
-        except Exception as e:
-            return f"读取 PowerPoint 文件失败：{e}"
+            return await loop.run_in_executor(
+                None, render_document, document, pages, sheet, start_row, offset
+            )
+        except ValueError as e:
+            return f"错误：{e}"
+        except OSError as e:
+            return f"{_READ_ERRORS[ext]}：{e}"
 
     # 旧版 PowerPoint 文件 (ppt) - 不支持直接读取
     if ext == ".ppt":
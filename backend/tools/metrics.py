@@ -0,0 +1,49 @@
+"""
+运行统计 - 各组件共用的耗时直方图
+"""
+from __future__ import annotations
+
+import bisect
+
+# 耗时直方图的桶上界（毫秒），最后一个桶为 +Inf
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    """固定分桶的耗时直方图"""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q: float) -> float:
+        """估算分位数：返回累计数达到 q 的桶的上界（最后一个桶返回最大值）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return float(min(bound, self.max_ms))
+        return self.max_ms
+
+    def snapshot(self) -> dict:
+        labels = [f"<={b}" for b in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.5), 2),
+            "p99_ms": round(self.quantile(0.99), 2),
+            "max_ms": round(self.max_ms, 2),
+            "buckets": dict(zip(labels, self.counts)),
+        }
@@ -1,19 +1,37 @@
 """
 代码执行沙箱工具 - 供 Agent 调用
 """
-import asyncio
 import io
 import logging
 import mimetypes
 import os
+import shutil
 import tarfile
 import uuid
+from collections.abc import Iterable
+from pathlib import Path
 from typing import Annotated
 
+import docker
 from langchain_core.tools import tool, InjectedToolArg
 from langgraph.prebuilt import ToolRuntime
 
-from .container_pool import get_pool
+from .container_pool import (
+    DEFAULT_RESOURCE_CLASS,
+    RESOURCE_CLASSES,
+    PoolExhaustedError,
+    get_pool,
+)
+from .docker_executor import docker_call
+from .sandbox_sessions import (
+    SESSIONS_ENABLED,
+    WORKER_CLIENT,
+    SandboxLease,
+    SessionManager,
+    get_session_manager,
+)
+from .sandbox_files import UploadNotFoundError, inject_uploads, resolve_upload
+from .sandbox_stream import ProgressForwarder, exec_with_progress
 
 logger = logging.getLogger(__name__)
 
@@ -21,9 +39,166 @@ logger = logging.getLogger(__name__)
 TEMP_DIR = "/tmp/sunnyagent_files"
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# 通过容器内的 fork server 执行代码（见 dockerfiles/sandbox/worker.py），
+# 设为 0 则每次启动新的 python 进程（兼容旧镜像）
+USE_SANDBOX_WORKER = os.environ.get("SANDBOX_WORKER", "1") != "0"
+
+# 未指定资源规格时，输入文件总大小达到此值（MB）改用 large 规格
+LARGE_INPUT_BYTES = int(float(os.environ.get("SANDBOX_LARGE_INPUT_MB", "20")) * 1024 * 1024)
+
+
+# 不经过 worker 时由 shell 清空输出目录后再执行代码
+_CLEAN_OUTPUT_THEN_RUN = 'find /output -mindepth 1 -delete 2>/dev/null; exec python -c "$1"'
+
+
+def _python_command(code: str, session_id: str | None = None, clean_output: bool = True) -> list[str]:
+    """
+    构造在容器内执行代码的命令
+
+    容器归还到池中时不再清理 /output，由下一次执行在运行代码前清空
+    （clean_output），不需要额外的 docker exec。
+    """
+    if USE_SANDBOX_WORKER:
+        command = ["python", "-S", WORKER_CLIENT]
+        if clean_output:
+            command.append("--clean-output")
+        if session_id:
+            command += ["--session", session_id]
+        return command + [code]
+    if clean_output:
+        return ["sh", "-c", _CLEAN_OUTPUT_THEN_RUN, "sh", code]
+    return ["python", "-c", code]
+
+
+class _ChunkReader(io.RawIOBase):
+    """把 get_archive 返回的数据块迭代器包装成只读文件对象，不拼接数据块"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._current = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._current:
+            try:
+                self._current = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._current))
+        buffer[:size] = self._current[:size]
+        self._current = self._current[size:]
+        return size
+
+
+def extract_archive_file(chunks: Iterable[bytes], dest_path: str) -> bool:
+    """
+    流式解析 tar 数据，把第一个普通文件直接写入 dest_path
+
+    只保留一个数据块和一个复制缓冲区，内存占用与文件大小无关；
+    不按归档中的路径解压，避免路径穿越。
+
+    Returns:
+        归档中是否有普通文件
+    """
+    with tarfile.open(fileobj=_ChunkReader(chunks), mode="r|") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            source = tar.extractfile(member)
+            with open(dest_path, "wb") as dest:
+                shutil.copyfileobj(source, dest)
+            return True
+    return False
+
+
+def output_path(host_output_dir: str, output_filename: str) -> str:
+    """
+    校验输出文件名并返回宿主机上的保存路径
+
+    output_filename 由模型给出，只允许不含目录的普通文件名，
+    并确认解析后的路径仍在 host_output_dir 内。
+
+    Raises:
+        ValueError: 文件名为空、是 . / ..、包含路径分隔符，或解析后越出输出目录
+    """
+    if output_filename in ("", ".", "..") or Path(output_filename).name != output_filename:
+        raise ValueError(f"无效的输出文件名 {output_filename!r}，只能是不含目录的文件名")
+    root = Path(host_output_dir).resolve()
+    local_path = (root / output_filename).resolve()
+    if local_path.parent != root:
+        raise ValueError(f"无效的输出文件名 {output_filename!r}，只能是不含目录的文件名")
+    return str(local_path)
+
+
+def copy_file_from_container(container, path: str, dest_path: str) -> None:
+    """把容器内的文件流式复制到 dest_path（阻塞调用，需在线程中执行）"""
+    bits, _ = container.get_archive(path)
+    if not extract_archive_file(bits, dest_path):
+        raise FileNotFoundError(f"{path} is not a regular file")
+
+
+def _user_id(tool_runtime: ToolRuntime | None) -> str | None:
+    """从 tool_runtime 的 config 中获取 user_id"""
+    if tool_runtime and tool_runtime.config:
+        return tool_runtime.config.get("configurable", {}).get("user_id")
+    return None
+
+
+def _session_id(tool_runtime: ToolRuntime | None) -> str | None:
+    """开启会话时以对话线程 ID 作为会话 ID，同一线程固定使用同一个容器和解释器"""
+    if not (SESSIONS_ENABLED and USE_SANDBOX_WORKER and tool_runtime and tool_runtime.config):
+        return None
+    return tool_runtime.config.get("configurable", {}).get("thread_id")
+
+
+def _resource_class(requested: str | None, file_ids: list[str] | None) -> str:
+    """
+    选择执行使用的资源规格：优先使用指定的规格，否则按输入文件总大小选择
+
+    Raises:
+        ValueError: 指定了未知的规格
+    """
+    if requested:
+        if requested not in RESOURCE_CLASSES:
+            raise ValueError(f"未知的资源规格 {requested}，可选: {', '.join(RESOURCE_CLASSES)}")
+        return requested
+    if file_ids and "large" in RESOURCE_CLASSES:
+        total = 0
+        for file_id in file_ids:
+            try:
+                total += resolve_upload(file_id).stat().st_size
+            except UploadNotFoundError:
+                continue  # 由 inject_uploads 报告
+        if total >= LARGE_INPUT_BYTES:
+            return "large"
+    return DEFAULT_RESOURCE_CLASS
+
+
+async def _acquire(
+    tool_runtime: ToolRuntime | None, resource_class: str | None, file_ids: list[str] | None
+) -> tuple[SessionManager, SandboxLease]:
+    """
+    获取执行用的容器（按用户公平排队），默认规格时可能使用对话线程的会话
+
+    Raises:
+        ValueError: 未知的资源规格
+        PoolExhaustedError: 池中没有可用容器
+    """
+    pool = await get_pool(_resource_class(resource_class, file_ids))
+    manager = await get_session_manager()
+    lease = await manager.acquire(_session_id(tool_runtime), pool, _user_id(tool_runtime))
+    return manager, lease
+
 
 @tool
-async def execute_python(code: str) -> str:
+async def execute_python(
+    code: str,
+    file_ids: list[str] | None = None,
+    resource_class: str | None = None,
+    tool_runtime: Annotated[ToolRuntime | None, InjectedToolArg] = None,
+) -> str:
     """
     在安全沙箱中执行 Python 代码。
 
@@ -33,28 +208,48 @@ async def execute_python(code: str) -> str:
     - 图像: Pillow, matplotlib
     - PDF: pypdf, pdfplumber, reportlab
 
+    开启沙箱会话时，同一对话中先前执行定义的变量（如已加载的 DataFrame）
+    在后续调用中仍然可用。
+
+    需要处理用户上传的文件时，把文件 ID 传给 file_ids，文件会放在
+    /input/{file_id}/{原文件名}，代码可直接读取完整文件，
+    例如: pd.read_csv('/input/1a2b3c4d/sales.csv')
+
     Args:
         code: 要执行的 Python 代码
+        file_ids: 需要在沙箱中读取的上传文件 ID 列表（可选）
+        resource_class: 容器规格（可选）：standard（默认）或 large（更多内存和 CPU，
+            处理大数据量或重计算时使用）；不填时按输入文件大小自动选择
 
     Returns:
         代码执行的输出结果，包括 stdout 和 stderr
     """
-    pool = await get_pool()
-    pooled = await pool.acquire()
+    try:
+        manager, lease = await _acquire(tool_runtime, resource_class, file_ids)
+    except (PoolExhaustedError, ValueError) as e:
+        return f"执行异常: {str(e)}"
 
     try:
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
-            lambda: pooled.container.exec_run(
-                ["python", "-c", code],
-                stdout=True,
-                stderr=True,
-                demux=True,
-            ),
-        )
+        await inject_uploads(lease.pooled, file_ids, _user_id(tool_runtime))
+        command = _python_command(code, lease.session_id, lease.first_run)
+        if tool_runtime is not None and tool_runtime.tool_call_id:
+            # 执行过程中把输出推送到 SSE 流（tool_call_progress 事件）
+            forwarder = ProgressForwarder(tool_runtime.stream_writer, tool_runtime.tool_call_id)
+            result = await exec_with_progress(lease.container, command, forwarder)
+            exit_code, stdout, stderr = result.exit_code, result.stdout, result.stderr
+        else:
+            result = await docker_call(
+                "exec",
+                lambda: lease.container.exec_run(
+                    command,
+                    stdout=True,
+                    stderr=True,
+                    demux=True,
+                ),
+            )
+            exit_code = result.exit_code
+            stdout, stderr = result.output
 
-        stdout, stderr = result.output
         output_parts = []
 
         if stdout:
@@ -64,21 +259,27 @@ async def execute_python(code: str) -> str:
 
         output = "\n".join(output_parts).strip()
 
-        if result.exit_code != 0:
-            return f"执行失败 (exit code {result.exit_code}):\n{output}"
+        if exit_code != 0:
+            return f"执行失败 (exit code {exit_code}):\n{output}"
 
         return output if output else "执行完成，无输出"
 
+    except docker.errors.APIError as e:
+        # 容器已退出或 Docker 无法在其中执行命令，归还时替换容器
+        lease.failed = True
+        return f"执行异常: {str(e)}"
     except Exception as e:
         return f"执行异常: {str(e)}"
     finally:
-        await pool.release(pooled)
+        await manager.release(lease)
 
 
 @tool
 async def execute_python_with_file(
     code: str,
     output_filename: str,
+    file_ids: list[str] | None = None,
+    resource_class: str | None = None,
     tool_runtime: Annotated[ToolRuntime | None, InjectedToolArg] = None,
 ) -> str:
     """
@@ -87,28 +288,41 @@ async def execute_python_with_file(
     代码中应将输出文件保存到 /output/ 目录。
     例如: prs.save('/output/presentation.pptx')
 
+    上传文件的 ID 传给 file_ids 后可在 /input/{file_id}/{原文件名} 读取。
+
     Args:
         code: Python 代码
         output_filename: 期望的输出文件名（如 "report.pptx"）
+        file_ids: 需要在沙箱中读取的上传文件 ID 列表（可选）
+        resource_class: 容器规格（可选）：standard（默认）或 large（更多内存和 CPU）；
+            部署配置了 office 规格时，转换 Office 文档可使用 office（预装 LibreOffice）
 
     Returns:
         成功时返回包含下载链接的 markdown 文本，失败时返回错误信息
     """
-    pool = await get_pool()
-    pooled = await pool.acquire()
-
     # 生成唯一文件 ID
     file_id = str(uuid.uuid4())[:8]
     host_output_dir = os.path.join(TEMP_DIR, file_id)
+    try:
+        local_path = output_path(host_output_dir, output_filename)
+    except ValueError as e:
+        return f"❌ {str(e)}"
+
+    try:
+        manager, lease = await _acquire(tool_runtime, resource_class, file_ids)
+    except (PoolExhaustedError, ValueError) as e:
+        return f"执行异常: {str(e)}"
+
     os.makedirs(host_output_dir, exist_ok=True)
 
     try:
+        await inject_uploads(lease.pooled, file_ids, _user_id(tool_runtime))
+
         # 执行代码
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
-            lambda: pooled.container.exec_run(
-                ["python", "-c", code],
+        result = await docker_call(
+            "exec",
+            lambda: lease.container.exec_run(
+                _python_command(code, lease.session_id, lease.first_run),
                 stdout=True,
                 stderr=True,
             ),
@@ -117,33 +331,24 @@ async def execute_python_with_file(
         if result.exit_code != 0:
             return f"❌ 代码执行失败:\n```\n{result.output.decode()}\n```"
 
-        # 从容器中复制输出文件
+        # 从容器中复制输出文件（边下载边写入，不在内存中缓存整个文件）
         try:
-            bits, stat = await loop.run_in_executor(
-                None,
-                lambda: pooled.container.get_archive(f"/output/{output_filename}"),
+            await docker_call(
+                "get_archive",
+                lambda: copy_file_from_container(
+                    lease.container, f"/output/{output_filename}", local_path
+                ),
             )
-
-            # 解压 tar 包
-            tar_data = b"".join(bits)
-            tar = tarfile.open(fileobj=io.BytesIO(tar_data))
-            tar.extractall(host_output_dir)
-            tar.close()
-
         except Exception as e:
             if "NotFound" in str(type(e).__name__) or "404" in str(e):
                 return f"❌ 文件 /output/{output_filename} 未生成，请检查代码中的保存路径"
             return f"❌ 获取文件失败: {str(e)}"
 
         # 验证文件存在
-        local_path = os.path.join(host_output_dir, output_filename)
         if not os.path.exists(local_path):
             return f"❌ 文件 {output_filename} 提取失败"
 
-        # 从 tool_runtime 的 config 中获取 user_id
-        user_id = None
-        if tool_runtime and tool_runtime.config:
-            user_id = tool_runtime.config.get("configurable", {}).get("user_id")
+        user_id = _user_id(tool_runtime)
 
         # 注册文件到数据库（需要 user_id）
         if user_id:
@@ -169,7 +374,10 @@ async def execute_python_with_file(
         download_url = f"/api/files/{file_id}/{output_filename}"
         return f"✅ 文件已生成\n\n[📥 点击下载 {output_filename}]({download_url})"
 
+    except docker.errors.APIError as e:
+        lease.failed = True
+        return f"❌ 执行异常: {str(e)}"
     except Exception as e:
         return f"❌ 执行异常: {str(e)}"
     finally:
-        await pool.release(pooled)
+        await manager.release(lease)
@@ -0,0 +1,155 @@
+"""
+上传文件注入 - 把用户上传的文件复制到沙箱容器的 /input/ 目录
+
+文件放在容器内 /input/{file_id}/{原文件名}。每个容器记录已复制文件的
+内容哈希，同一文件再次用于同一容器时不重复复制。
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import tarfile
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import IO
+
+from .container_pool import PooledContainer
+from .docker_executor import docker_call
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = Path("/tmp/sunnyagent_files")
+INPUT_DIR = "/input"
+ARCHIVE_SPOOL_BYTES = 8 * 1024 * 1024  # 复制到容器的 tar 包超过此大小时写入临时文件
+
+
+class UploadNotFoundError(LookupError):
+    """上传文件不存在"""
+
+
+def resolve_upload(file_id: str) -> Path:
+    """返回上传文件在本机的路径"""
+    # file_id 只由字母数字组成，拒绝路径穿越
+    if not file_id.isalnum():
+        raise UploadNotFoundError(f"找不到文件 ID {file_id}")
+    file_dir = UPLOAD_DIR / file_id
+    files = sorted(file_dir.iterdir()) if file_dir.is_dir() else []
+    if not files:
+        raise UploadNotFoundError(f"找不到文件 ID {file_id}")
+    return files[0]
+
+
+@lru_cache(maxsize=256)
+def _digest(path: str, size: int, mtime_ns: int) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    """文件内容的 sha256，按路径、大小和修改时间缓存"""
+    stat = path.stat()
+    return _digest(str(path), stat.st_size, stat.st_mtime_ns)
+
+
+def _build_archive(files: dict[str, Path]) -> IO[bytes]:
+    """
+    构造写入容器根目录的 tar 包，files 为 容器内路径 → 本机路径
+
+    上传文件可能有数百 MB，tar 包超过 ARCHIVE_SPOOL_BYTES 后写入临时文件，
+    不整个放在内存中。返回定位到开头的文件对象，调用方负责关闭。
+    """
+    archive = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_BYTES)
+    try:
+        _write_archive(archive, files)
+        archive.seek(0)
+    except BaseException:
+        archive.close()
+        raise
+    return archive
+
+
+def _write_archive(archive: IO[bytes], files: dict[str, Path]) -> None:
+    with tarfile.open(fileobj=archive, mode="w") as tar:
+        directories: set[str] = set()
+        for dest, source in files.items():
+            parent = os.path.dirname(dest.lstrip("/"))
+            parts = parent.split("/")
+            for i in range(1, len(parts) + 1):
+                directory = "/".join(parts[:i])
+                if directory not in directories:
+                    directories.add(directory)
+                    info = tarfile.TarInfo(directory)
+                    info.type = tarfile.DIRTYPE
+                    info.mode = 0o755
+                    tar.addfile(info)
+            info = tarfile.TarInfo(dest.lstrip("/"))
+            info.size = source.stat().st_size
+            info.mode = 0o644
+            with open(source, "rb") as f:
+                tar.addfile(info, f)
+
+
+def _prepare(
+    pooled: PooledContainer, file_ids: list[str]
+) -> tuple[dict[str, str], dict[str, Path], dict[str, str]]:
+    """解析文件并比对容器内的哈希，返回 (全部路径, 需要复制的文件, 新哈希)"""
+    paths: dict[str, str] = {}
+    missing: dict[str, Path] = {}
+    digests: dict[str, str] = {}
+    for file_id in dict.fromkeys(file_ids):
+        source = resolve_upload(file_id)
+        dest = f"{INPUT_DIR}/{file_id}/{source.name}"
+        paths[file_id] = dest
+        digest = file_digest(source)
+        if pooled.files.get(dest) != digest:
+            missing[dest] = source
+            digests[dest] = digest
+    return paths, missing, digests
+
+
+async def inject_uploads(
+    pooled: PooledContainer, file_ids: list[str] | None, owner: str | None
+) -> dict[str, str]:
+    """
+    把上传文件复制到容器的 /input/ 目录，容器中已有相同内容时跳过
+
+    池化容器会被不同用户复用：容器中留有其他用户的文件时先清空 /input/，
+    即使本次没有要复制的文件。
+
+    Returns:
+        file_id → 容器内路径
+
+    Raises:
+        UploadNotFoundError: 文件 ID 不存在
+    """
+    loop = asyncio.get_event_loop()
+    if pooled.files and pooled.files_owner != owner:
+        result = await docker_call(
+            "exec", lambda: pooled.container.exec_run(["rm", "-rf", INPUT_DIR])
+        )
+        if result.exit_code != 0:
+            raise RuntimeError(f"Failed to clear {INPUT_DIR}: {result.output!r}")
+        pooled.files.clear()
+    if not file_ids:
+        return {}
+
+    paths, missing, digests = await loop.run_in_executor(
+        None, lambda: _prepare(pooled, file_ids)
+    )
+    if missing:
+        archive = await loop.run_in_executor(None, lambda: _build_archive(missing))
+        try:
+            # put_archive 接受文件对象，按块读取发送
+            await docker_call("put_archive", lambda: pooled.container.put_archive("/", archive))
+        finally:
+            archive.close()
+        pooled.files.update(digests)
+        pooled.files_owner = owner
+        logger.info(f"Copied {len(missing)} uploaded file(s) into container {pooled.container.id[:12]}")
+    return paths
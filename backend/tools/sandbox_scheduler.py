@@ -0,0 +1,214 @@
+"""
+沙箱执行的公平调度 - 按用户分配执行名额
+
+容器池按先来先到分配容器：一个用户的 agent 并行发起大量 task() 子任务时，
+会占满容器，其他用户的执行只能一直排队。调度器放在容器池前面：
+
+- 每个用户同时执行的数量不超过 per_user_limit
+- 总名额（容器池的容量）空出时，优先分配给正在执行数最少的用户，
+  执行数相同时先排队的优先
+- 沙箱会话固定的容器（空闲时也不归还到池中）占用保留名额（reserve()），
+  不再分配给其他执行：取得名额的执行总能从池中拿到容器，不会在池的
+  先来先到队列里等待。在已有会话的容器上执行（pinned）不需要容器名额，
+  只受每个用户的上限限制
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import os
+import time
+from collections import deque
+from typing import Optional
+
+from .metrics import LatencyHistogram
+
+USER_MAX_CONCURRENT = int(os.environ.get("SANDBOX_USER_MAX_CONCURRENT", "4"))  # 每个用户同时执行的上限
+ANONYMOUS_USER = "anonymous"  # 没有 user_id 的执行共用一个名额组
+
+
+class _UserWait:
+    """单个用户的排队统计"""
+
+    __slots__ = ("count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+
+class FairScheduler:
+    """
+    按用户公平分配执行名额
+
+    acquire() 取得名额后才去获取容器，执行结束后 release() 归还名额。
+    """
+
+    def __init__(self, capacity: int, per_user_limit: int = USER_MAX_CONCURRENT):
+        self.capacity = max(1, capacity)
+        self.per_user_limit = max(1, per_user_limit)
+
+        self._active = 0  # 占用容器名额的执行数（不含 pinned 执行）
+        self._reserved = 0  # 会话固定的容器数
+        self._running: dict[str, int] = {}
+        # 每个用户的等待队列：(排队序号, Future, 是否 pinned)
+        self._queues: dict[str, deque[tuple[int, asyncio.Future[None], bool]]] = {}
+        self._seq = itertools.count()
+        self._queue_wait = LatencyHistogram()
+        self._user_waits: dict[str, _UserWait] = {}
+        self._admitted = 0
+        self._throttled = 0  # 总名额未满、因用户上限而排队的次数
+        self._cancelled = 0
+
+    def _eligible(self, user: str) -> bool:
+        return self._running.get(user, 0) < self.per_user_limit
+
+    def _has_capacity(self) -> bool:
+        return self._active + self._reserved < self.capacity
+
+    def _admissible(self, user: str, pinned: bool) -> bool:
+        return self._eligible(user) and (pinned or self._has_capacity())
+
+    def _grant(self, user: str, pinned: bool) -> None:
+        if not pinned:
+            self._active += 1
+        self._running[user] = self._running.get(user, 0) + 1
+        self._admitted += 1
+
+    def _observe_wait(self, user: str, ms: float) -> None:
+        self._queue_wait.observe(ms)
+        wait = self._user_waits.get(user)
+        if wait is None:
+            wait = self._user_waits[user] = _UserWait()
+        wait.observe(ms)
+
+    async def acquire(self, user_id: Optional[str], pinned: bool = False) -> None:
+        """
+        等待该用户的执行名额（按公平顺序）
+
+        Args:
+            pinned: 在会话已固定的容器上执行，不需要容器名额
+        """
+        user = user_id or ANONYMOUS_USER
+        # 有名额时不会有可执行的等待者（release 时已经分配），直接放行
+        if self._admissible(user, pinned):
+            self._grant(user, pinned)
+            self._observe_wait(user, 0.0)
+            return
+
+        if pinned or self._has_capacity():
+            self._throttled += 1
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        entry = (next(self._seq), waiter, pinned)
+        self._queues.setdefault(user, deque()).append(entry)
+        start = time.monotonic()
+        try:
+            # _dispatch() 分配名额后才唤醒
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(user_id, pinned)
+            else:
+                self._cancelled += 1
+                self._discard(user, entry)
+            raise
+        self._observe_wait(user, (time.monotonic() - start) * 1000)
+
+    def _discard(self, user: str, entry: tuple[int, asyncio.Future[None], bool]) -> None:
+        queue = self._queues.get(user)
+        if queue is None:
+            return
+        try:
+            queue.remove(entry)
+        except ValueError:
+            pass
+        if not queue:
+            del self._queues[user]
+
+    def release(self, user_id: Optional[str], pinned: bool = False) -> None:
+        """归还名额（与 acquire() 的 pinned 一致），并分配给排队中执行数最少的用户"""
+        user = user_id or ANONYMOUS_USER
+        if not pinned:
+            self._active -= 1
+        running = self._running.get(user, 0) - 1
+        if running > 0:
+            self._running[user] = running
+        else:
+            self._running.pop(user, None)
+        self._dispatch()
+
+    def reserve(self) -> None:
+        """会话固定了一个容器：在会话结束前不再把这个容器名额分配给其他执行"""
+        self._reserved += 1
+
+    def unreserve(self) -> None:
+        """会话结束，容器归还到池中"""
+        self._reserved -= 1
+        self._dispatch()
+
+    def repin(self, pinned: bool) -> None:
+        """
+        已取得名额的执行改为（pinned=True）或不再（False）使用会话固定的容器
+
+        如新建会话的执行：先按普通执行占用容器名额，容器被会话固定后改由保留名额计数。
+        """
+        if pinned:
+            self._active -= 1
+            self._dispatch()
+        else:
+            self._active += 1
+
+    def _dispatch(self) -> None:
+        while True:
+            candidates = [
+                (self._running.get(user, 0), queue[0][0], user)
+                for user, queue in self._queues.items()
+                if self._admissible(user, queue[0][2])
+            ]
+            if not candidates:
+                return
+            _, _, user = min(candidates)
+            queue = self._queues[user]
+            _, waiter, pinned = queue.popleft()
+            if not queue:
+                del self._queues[user]
+            if waiter.done():
+                continue  # 已取消
+            self._grant(user, pinned)
+            waiter.set_result(None)
+
+    @property
+    def stats(self) -> dict:
+        """返回名额占用和排队统计"""
+        users = {}
+        for user in set(self._running) | set(self._queues):
+            users[user] = {
+                "running": self._running.get(user, 0),
+                "waiting": sum(1 for _, w, _ in self._queues.get(user, ()) if not w.done()),
+            }
+        return {
+            "capacity": self.capacity,
+            "per_user_limit": self.per_user_limit,
+            "running": sum(self._running.values()),
+            "reserved": self._reserved,
+            "waiting": sum(u["waiting"] for u in users.values()),
+            "users": users,
+            "admitted": self._admitted,
+            "throttled": self._throttled,
+            "cancelled": self._cancelled,
+            "queue_wait": self._queue_wait.snapshot(),
+            "queue_wait_by_user": {
+                user: {
+                    "count": wait.count,
+                    "avg_ms": round(wait.total_ms / wait.count, 2),
+                    "max_ms": round(wait.max_ms, 2),
+                }
+                for user, wait in self._user_waits.items()
+            },
+        }
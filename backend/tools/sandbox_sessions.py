@@ -0,0 +1,339 @@
+"""
+沙箱会话 - 按对话线程固定容器，多次执行之间保留解释器状态
+
+开启 SANDBOX_SESSIONS 后，同一 thread_id 的 execute_python 调用会在
+同一个容器的同一个会话进程中执行（见 dockerfiles/sandbox/worker.py），
+上一步加载的 DataFrame 等变量下一步可以直接使用，无需重新解析输入文件。
+
+- 会话空闲超过 idle_ttl 后结束，容器重置后归还到池中
+- 本进程最多同时保持 max_sessions 个会话，达到上限时结束最久未使用的
+  空闲会话；所有会话都在执行中时退化为无状态执行
+- 会话只使用默认规格的容器池，指定其他资源规格的执行是无状态的
+- 每次执行先从该容器池的 FairScheduler 取得用户的执行名额；会话固定的容器
+  在会话结束前占用调度器的保留名额，空闲时也不会被当作可用容器分配出去
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .container_pool import ContainerPool, PooledContainer, get_pool
+from .docker_executor import docker_call
+from .sandbox_scheduler import FairScheduler
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_ENABLED = os.environ.get("SANDBOX_SESSIONS", "0") == "1"  # 默认关闭
+SESSION_MAX = int(os.environ.get("SANDBOX_SESSION_MAX", "4"))  # 本进程同时保持的会话数上限
+SESSION_IDLE_TTL = float(os.environ.get("SANDBOX_SESSION_IDLE_TTL", "600"))  # 会话空闲超过此秒数后结束
+SESSION_MAINTENANCE_INTERVAL = 30.0  # 空闲会话检查间隔（秒）
+
+# 容器内常驻解释器的客户端
+WORKER_CLIENT = "/opt/sandbox/client.py"
+RESET_COMMAND = ["python", "-S", WORKER_CLIENT, "--reset"]
+
+
+@dataclass
+class SandboxSession:
+    """固定在一个容器上的会话"""
+
+    thread_id: str
+    pooled: Optional[PooledContainer] = None  # 容器获取完成前为 None
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    last_used_at: float = field(default_factory=time.monotonic)
+    executions: int = 0
+    reserved: bool = False  # 容器已计入调度器的保留名额
+
+
+@dataclass
+class SandboxLease:
+    """一次执行占用的容器，执行结束后交给 SessionManager.release()"""
+
+    pooled: PooledContainer
+    session: Optional[SandboxSession] = None  # None 表示无状态执行
+    pool: Optional[ContainerPool] = None  # 无状态执行所用的其他规格的池，None 为会话管理器的池
+    failed: bool = False  # Docker 无法在容器中执行命令，归还时替换容器
+    user_id: Optional[str] = None
+    scheduler: Optional[FairScheduler] = None  # 持有其执行名额的调度器
+
+    @property
+    def container(self):
+        return self.pooled.container
+
+    @property
+    def session_id(self) -> Optional[str]:
+        return self.session.thread_id if self.session is not None else None
+
+    @property
+    def first_run(self) -> bool:
+        """无状态执行或会话的第一次执行：容器中可能留有其他执行的输出文件"""
+        return self.session is None or self.session.executions == 0
+
+
+class SessionManager:
+    """
+    沙箱会话管理器
+
+    会话持有从 ContainerPool 获取的容器，直到空闲过期或被淘汰；
+    结束时通知容器内的解释器清理会话，清理失败则销毁容器。
+    """
+
+    def __init__(
+        self,
+        pool: ContainerPool,
+        max_sessions: int = SESSION_MAX,
+        idle_ttl: float = SESSION_IDLE_TTL,
+        maintenance_interval: float = SESSION_MAINTENANCE_INTERVAL,
+    ):
+        self.pool = pool
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.maintenance_interval = maintenance_interval
+
+        self._sessions: dict[str, SandboxSession] = {}
+        self._schedulers: dict[ContainerPool, FairScheduler] = {}
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._created = 0
+        self._expired = 0
+        self._evicted = 0
+        self._fallbacks = 0
+        self._failed = 0
+
+    def start(self) -> None:
+        if self._maintenance_task is None:
+            self._maintenance_task = asyncio.create_task(self._maintain())
+
+    def _scheduler(self, pool: ContainerPool) -> FairScheduler:
+        """容器池对应的调度器，总名额为池的容量（含临时容器）"""
+        scheduler = self._schedulers.get(pool)
+        if scheduler is None:
+            scheduler = self._schedulers[pool] = FairScheduler(pool.max_size + pool.max_overflow)
+        return scheduler
+
+    async def acquire(
+        self,
+        thread_id: Optional[str],
+        pool: Optional[ContainerPool] = None,
+        user_id: Optional[str] = None,
+    ) -> SandboxLease:
+        """
+        获取执行用的容器
+
+        先按用户公平地取得执行名额，再获取容器：
+        有 thread_id 时使用（必要时创建）该线程的会话，同一会话的执行依次进行；
+        否则或会话数已满且都在执行中时，从池中获取无状态容器。
+        pool 为其他规格的容器池时，从该池获取无状态容器。
+
+        Raises:
+            PoolExhaustedError: 池中没有可用容器
+        """
+        scheduler = self._scheduler(pool or self.pool)
+        # 已有会话的执行使用会话固定的容器，不需要容器名额
+        pinned = (pool is None or pool is self.pool) and thread_id in self._sessions
+        await scheduler.acquire(user_id, pinned=pinned)
+        try:
+            lease = await self._acquire(thread_id, pool)
+        except BaseException:
+            scheduler.release(user_id, pinned=pinned)
+            raise
+        session = lease.session
+        if session is not None and not session.reserved:
+            # 新建的会话：容器在会话结束前一直固定，改由保留名额计数
+            scheduler.reserve()
+            session.reserved = True
+        if pinned != (session is not None):
+            # 等待名额期间会话被创建或结束
+            scheduler.repin(session is not None)
+        lease.user_id = user_id
+        lease.scheduler = scheduler
+        return lease
+
+    async def _acquire(self, thread_id: Optional[str], pool: Optional[ContainerPool]) -> SandboxLease:
+        if pool is not None and pool is not self.pool:
+            return SandboxLease(pooled=await pool.acquire(), pool=pool)
+
+        while thread_id is not None:
+            session = self._sessions.get(thread_id)
+            if session is None:
+                if len(self._sessions) >= self.max_sessions and not await self._evict_lru():
+                    self._fallbacks += 1
+                    break
+                return await self._open(thread_id)
+
+            await session.lock.acquire()
+            # 等待期间会话可能已结束或创建失败，重新查找
+            if self._sessions.get(thread_id) is not session:
+                session.lock.release()
+                continue
+            session.pooled.use_count += 1
+            return SandboxLease(pooled=session.pooled, session=session)
+
+        return SandboxLease(pooled=await self.pool.acquire())
+
+    async def release(self, lease: SandboxLease) -> None:
+        """
+        执行结束：无状态容器归还到池中，会话容器继续保留，然后归还执行名额
+
+        执行失败（lease.failed）时容器交给池替换，会话随之结束。
+        """
+        try:
+            await self._release(lease)
+        finally:
+            if lease.scheduler is not None:
+                lease.scheduler.release(lease.user_id, pinned=lease.session is not None)
+
+    async def _release(self, lease: SandboxLease) -> None:
+        session = lease.session
+        if session is None:
+            await (lease.pool or self.pool).release(lease.pooled, exec_failed=lease.failed)
+            return
+        session.executions += 1
+        session.last_used_at = time.monotonic()
+        if lease.failed and self._sessions.get(session.thread_id) is session:
+            del self._sessions[session.thread_id]
+            self._failed += 1
+            logger.warning(f"Sandbox session for thread {session.thread_id} ended after exec failure")
+            try:
+                await self.pool.release(session.pooled, exec_failed=True)
+            finally:
+                self._unreserve(session)
+        session.lock.release()
+
+    async def _open(self, thread_id: str) -> SandboxLease:
+        """创建会话（获取容器前先登记，同一线程的并发调用会等待）"""
+        session = SandboxSession(thread_id=thread_id)
+        await session.lock.acquire()
+        self._sessions[thread_id] = session
+        try:
+            session.pooled = await self.pool.acquire()
+        except BaseException:
+            del self._sessions[thread_id]
+            session.lock.release()
+            raise
+        self._created += 1
+        logger.info(f"Opened sandbox session for thread {thread_id}")
+        return SandboxLease(pooled=session.pooled, session=session)
+
+    async def _evict_lru(self) -> bool:
+        """结束最久未使用的空闲会话，没有空闲会话时返回 False"""
+        idle = [s for s in self._sessions.values() if not s.lock.locked()]
+        if not idle:
+            return False
+        session = min(idle, key=lambda s: s.last_used_at)
+        self._evicted += 1
+        await self._close(session)
+        return True
+
+    async def end(self, thread_id: str) -> None:
+        """结束指定线程的会话（等待正在进行的执行完成）"""
+        session = self._sessions.get(thread_id)
+        if session is None:
+            return
+        async with session.lock:
+            if self._sessions.get(thread_id) is session:
+                await self._close(session)
+
+    async def _close(self, session: SandboxSession) -> None:
+        """结束会话：重置容器内的会话进程后归还容器"""
+        del self._sessions[session.thread_id]
+        pooled = session.pooled
+        discard = False
+        try:
+            result = await docker_call("exec", lambda: pooled.container.exec_run(RESET_COMMAND))
+            discard = result.exit_code != 0
+        except Exception as e:
+            logger.warning(f"Failed to reset sandbox session {session.thread_id}: {e}")
+            discard = True
+        logger.info(
+            f"Closed sandbox session for thread {session.thread_id} "
+            f"after {session.executions} executions"
+        )
+        try:
+            await self.pool.release(pooled, discard=discard)
+        finally:
+            self._unreserve(session)
+
+    def _unreserve(self, session: SandboxSession) -> None:
+        """会话的容器归还到池中，释放它占用的保留名额"""
+        if session.reserved:
+            session.reserved = False
+            self._scheduler(self.pool).unreserve()
+
+    async def _maintain(self) -> None:
+        """定期结束空闲过久的会话"""
+        while True:
+            await asyncio.sleep(self.maintenance_interval)
+            try:
+                await self._expire_idle()
+            except Exception as e:
+                logger.warning(f"Sandbox session maintenance failed: {e}")
+
+    async def _expire_idle(self) -> None:
+        """结束空闲超过 idle_ttl 的会话"""
+        cutoff = time.monotonic() - self.idle_ttl
+        for session in list(self._sessions.values()):
+            if (
+                self._sessions.get(session.thread_id) is session
+                and not session.lock.locked()
+                and session.last_used_at < cutoff
+            ):
+                self._expired += 1
+                await self._close(session)
+
+    async def shutdown(self) -> None:
+        """结束所有会话"""
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            try:
+                await self._maintenance_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._maintenance_task = None
+        for session in list(self._sessions.values()):
+            if session.pooled is not None and self._sessions.get(session.thread_id) is session:
+                await self._close(session)
+
+    def scheduler_stats(self) -> dict[str, dict]:
+        """返回各规格容器池的执行名额调度统计"""
+        return {pool.name: scheduler.stats for pool, scheduler in self._schedulers.items()}
+
+    @property
+    def stats(self) -> dict:
+        """返回会话统计"""
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "busy": sum(1 for s in self._sessions.values() if s.lock.locked()),
+            "created": self._created,
+            "expired": self._expired,
+            "evicted": self._evicted,
+            "fallbacks": self._fallbacks,
+            "failed": self._failed,
+        }
+
+
+# ============================================
+# 全局单例
+# ============================================
+_manager: Optional[SessionManager] = None
+
+
+async def get_session_manager() -> SessionManager:
+    """获取全局会话管理器单例"""
+    global _manager
+    if _manager is None:
+        _manager = SessionManager(await get_pool())
+        _manager.start()
+    return _manager
+
+
+async def shutdown_sessions() -> None:
+    """结束所有会话（在关闭容器池之前调用）"""
+    global _manager
+    if _manager is not None:
+        await _manager.shutdown()
+        _manager = None
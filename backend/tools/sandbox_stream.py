@@ -0,0 +1,186 @@
+"""
+沙箱流式执行 - 执行过程中把输出以 tool_call_progress 事件推送给前端
+
+docker exec 以流式方式读取输出，经有界队列交给事件循环：
+前端或事件循环跟不上时读取线程阻塞，压力一直传回容器内的脚本。
+推送的输出按时间间隔合并，并限制每次执行推送的总字节数，
+避免输出密集的脚本刷屏；完整输出仍作为工具结果返回。
+"""
+from __future__ import annotations
+
+import asyncio
+import codecs
+import concurrent.futures
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from .docker_executor import docker_call
+
+PROGRESS_INTERVAL_MS = float(os.environ.get("SANDBOX_PROGRESS_INTERVAL_MS", "250"))  # 推送间隔
+PROGRESS_MAX_BYTES = int(os.environ.get("SANDBOX_PROGRESS_MAX_BYTES", "65536"))  # 每次执行推送的输出上限
+STREAM_QUEUE_SIZE = 64  # 读取线程与事件循环之间缓冲的输出块数
+
+# 标记输出流结束
+_END_OF_OUTPUT = object()
+
+
+@dataclass
+class ExecOutput:
+    """流式执行的完整输出"""
+
+    exit_code: int
+    stdout: bytes = b""
+    stderr: bytes = b""
+
+
+@dataclass
+class ProgressForwarder:
+    """合并执行输出，按总量上限写出 tool_call_progress 事件"""
+
+    write: Callable[[dict[str, Any]], None]
+    tool_call_id: str
+    max_bytes: int = PROGRESS_MAX_BYTES
+    sent_bytes: int = 0
+    truncated: bool = False  # 已达到上限，后续输出不再推送
+    _notified: bool = False
+    _pending: dict[str, list[str]] = field(default_factory=dict)
+    _decoders: dict[str, codecs.IncrementalDecoder] = field(default_factory=dict)
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._pending) or (self.truncated and not self._notified)
+
+    def feed(self, stream: str, data: Optional[bytes]) -> None:
+        """缓存一块输出，超过上限的部分丢弃"""
+        if self.truncated or not data:
+            return
+        remaining = self.max_bytes - self.sent_bytes
+        if len(data) > remaining:
+            data = data[:remaining]
+            self.truncated = True
+        self.sent_bytes += len(data)
+        decoder = self._decoders.get(stream)
+        if decoder is None:
+            decoder = self._decoders[stream] = codecs.getincrementaldecoder("utf-8")("replace")
+        text = decoder.decode(data)
+        if text:
+            self._pending.setdefault(stream, []).append(text)
+
+    def flush(self) -> None:
+        """写出缓存的输出，每个流一个事件；达到上限时追加一次截断提示"""
+        for stream, parts in self._pending.items():
+            self.write({
+                "type": "tool_call_progress",
+                "id": self.tool_call_id,
+                "stream": stream,
+                "text": "".join(parts),
+            })
+        self._pending.clear()
+        if self.truncated and not self._notified:
+            self._notified = True
+            self.write({
+                "type": "tool_call_progress",
+                "id": self.tool_call_id,
+                "stream": "stderr",
+                "text": f"\n[输出超过 {self.max_bytes} 字节，后续输出不再实时显示]\n",
+                "truncated": True,
+            })
+
+
+class _Stopped(Exception):
+    """事件循环一侧已放弃读取输出"""
+
+
+def _exec_stream(container, cmd: list[str], put: Callable[[object], None]) -> int:
+    """在线程中流式执行命令，把 (stdout, stderr) 块交给 put，返回退出码"""
+    api = container.client.api
+    exec_id = api.exec_create(container.id, cmd, stdout=True, stderr=True)["Id"]
+    for chunk in api.exec_start(exec_id, stream=True, demux=True):
+        put(chunk)
+    info = api.exec_inspect(exec_id)
+    # 输出流结束与进程退出之间可能有短暂间隔
+    while info["Running"]:
+        time.sleep(0.01)
+        info = api.exec_inspect(exec_id)
+    return info["ExitCode"]
+
+
+async def exec_with_progress(
+    container,
+    cmd: list[str],
+    forwarder: ProgressForwarder,
+    interval_ms: float = PROGRESS_INTERVAL_MS,
+) -> ExecOutput:
+    """
+    流式执行命令，执行过程中通过 forwarder 推送输出
+
+    Returns:
+        ExecOutput，包含退出码和完整的 stdout/stderr
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    stopped = threading.Event()
+
+    def put(item: object) -> None:
+        # 队列满时阻塞读取线程（背压），事件循环一侧退出后停止读取
+        if stopped.is_set():
+            raise _Stopped()
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                return future.result(timeout=1)
+            except concurrent.futures.TimeoutError:
+                if stopped.is_set():
+                    future.cancel()
+                    raise _Stopped()
+
+    def run() -> int:
+        try:
+            return _exec_stream(container, cmd, put)
+        finally:
+            if not stopped.is_set():
+                put(_END_OF_OUTPUT)
+
+    exec_task = asyncio.ensure_future(docker_call("exec", run))
+    stdout: list[bytes] = []
+    stderr: list[bytes] = []
+    interval = interval_ms / 1000
+    deadline: Optional[float] = None
+
+    try:
+        while True:
+            if deadline is not None:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    forwarder.flush()
+                    deadline = None
+                    continue
+            else:
+                item = await queue.get()
+            if item is _END_OF_OUTPUT:
+                break
+
+            out, err = item
+            if out:
+                stdout.append(out)
+            if err:
+                stderr.append(err)
+            forwarder.feed("stdout", out)
+            forwarder.feed("stderr", err)
+            if deadline is None and forwarder.has_pending:
+                deadline = loop.time() + interval
+
+        forwarder.flush()
+        exit_code = await exec_task
+    finally:
+        stopped.set()
+        # 调用方被取消或推送出错时，取消并等待执行任务，不遗留未取回异常的 future；
+        # 读取线程在下一次 put 时退出，释放 Docker 执行器的并发名额
+        if not exec_task.done():
+            exec_task.cancel()
+        await asyncio.gather(exec_task, return_exceptions=True)
+    return ExecOutput(exit_code=exit_code, stdout=b"".join(stdout), stderr=b"".join(stderr))
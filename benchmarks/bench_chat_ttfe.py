@@ -0,0 +1,121 @@
+"""Benchmark: /api/chat time-to-first-event, conversation bookkeeping phase.
+
+Compares the previous chat prologue (``get_conversation_by_thread`` then
+``touch_conversation`` or ``create_conversation``) with the single
+``touch_or_create_conversation`` upsert, measuring the time until the first
+SSE event of a stub agent is produced.
+
+By default database calls are simulated with a fixed round-trip time. Pass
+``--database-url`` to run against a real PostgreSQL instance instead (a
+temporary user and its conversations are created and removed).
+
+Run:
+    python -m benchmarks.bench_chat_ttfe --rtt-ms 2
+    python -m benchmarks.bench_chat_ttfe --database-url postgresql://...
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import datetime, timezone
+
+from langchain_core.messages import AIMessageChunk
+
+from backend.conversations import database as conv_db
+from backend.stream_handler import stream_agent_response
+
+
+class _FirstTokenAgent:
+    """Stub graph whose astream() yields a single text token immediately."""
+
+    async def astream(self, *args, **kwargs):
+        yield ((), "messages", (AIMessageChunk(content="Hi"), {}))
+
+
+async def _before(user_id, thread_id: str, title: str) -> None:
+    existing = await conv_db.get_conversation_by_thread(thread_id, user_id)
+    if existing:
+        await conv_db.touch_conversation(thread_id, user_id)
+    else:
+        await conv_db.create_conversation(user_id, thread_id, title)
+
+
+async def _after(user_id, thread_id: str, title: str) -> None:
+    await conv_db.touch_or_create_conversation(user_id, thread_id, title)
+
+
+async def _ttfe(prologue, user_id, thread_id: str) -> float:
+    start = time.perf_counter()
+    await prologue(user_id, thread_id, "benchmark")
+    async for _ in stream_agent_response(_FirstTokenAgent(), thread_id, "hi"):
+        break
+    return (time.perf_counter() - start) * 1000
+
+
+def _simulate_db(rtt_ms: float) -> None:
+    """Replace the conversation module's DB helpers with fixed-RTT fakes."""
+    now = datetime.now(timezone.utc)
+
+    async def fetchrow(query, *args):
+        await asyncio.sleep(rtt_ms / 1000)
+        return {"id": uuid.uuid4(), "thread_id": "t", "title": "benchmark",
+                "created_at": now, "updated_at": now}
+
+    async def execute(query, *args):
+        await asyncio.sleep(rtt_ms / 1000)
+        return "UPDATE 1"
+
+    conv_db.fetchrow = fetchrow
+    conv_db.execute = execute
+
+
+async def _run(args) -> None:
+    user_id = uuid.uuid4()
+    if args.database_url:
+        import os
+
+        from backend import db
+
+        os.environ["DATABASE_URL"] = args.database_url
+        await db.init_pool()
+        await db.init_tables()
+        user_id = await db.fetchval(
+            "INSERT INTO users (username, password_hash) VALUES ($1, 'x') RETURNING id",
+            f"bench{uuid.uuid4().hex[:12]}",
+        )
+    else:
+        _simulate_db(args.rtt_ms)
+
+    try:
+        print(f"{'scenario':<22} {'before ms':>10} {'after ms':>10}")
+        for scenario in ("existing thread", "new thread"):
+            results = {}
+            for name, prologue in (("before", _before), ("after", _after)):
+                samples = []
+                for _ in range(args.iterations):
+                    thread_id = uuid.uuid4().hex[:8]
+                    if scenario == "existing thread":
+                        await conv_db.create_conversation(user_id, thread_id, "benchmark")
+                    samples.append(await _ttfe(prologue, user_id, thread_id))
+                results[name] = statistics.median(samples)
+            print(f"{scenario:<22} {results['before']:>10.2f} {results['after']:>10.2f}")
+    finally:
+        if args.database_url:
+            from backend import db
+
+            await db.execute("DELETE FROM users WHERE id = $1", user_id)
+            await db.close_pool()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="Simulated DB round trip")
+    parser.add_argument("--database-url", help="Benchmark against a real PostgreSQL")
+    parser.add_argument("--iterations", type=int, default=50)
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Benchmark: event-loop lag during concurrent PDF reads.
+
+A simulated SSE stream emits a token every ``--token-interval-ms`` on the
+event loop while ``--reads`` concurrent reads parse distinct ``--pages``-page
+PDFs. The gap between consecutive tokens is reported for three strategies:
+
+* ``inline``: parsing called directly on the event loop.
+* ``thread``: parsing in the default thread pool (how a sync ``@tool`` runs
+  under ``ainvoke``); the loop still competes with pypdf for the GIL.
+* ``process``: ``IngestionManager.aload`` on the bounded parser process pool.
+
+Run:
+    python -m benchmarks.bench_document_reads --reads 8 --pages 100
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from backend.tools import document_cache
+from backend.tools.document_cache import DocumentCache, get_document_cache
+from backend.tools.document_ingest import IngestionManager
+from backend.tools.document_parsers import extract_document
+from backend.tools.file_tools import render_document
+
+
+def _write_pdf(path: Path, pages: int, seed: int) -> None:
+    """Write a PDF whose pages each hold 50 lines of extractable text."""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for number in range(pages):
+        page = writer.add_blank_page(612, 792)
+        lines = b" ".join(
+            f"(doc {seed} page {number} line {line} quarterly revenue by region) '".encode()
+            for line in range(50)
+        )
+        stream = DecodedStreamObject()
+        stream.set_data(b"BT /F1 10 Tf 40 770 Td 14 TL " + lines + b" ET")
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+async def _stream(stop: asyncio.Event, interval: float, gaps: list[float]) -> None:
+    """Emit tokens at a fixed interval, recording the actual gaps."""
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        gaps.append((now - last) * 1000)
+        last = now
+
+
+def _parse_and_render(path: Path) -> str:
+    return render_document(get_document_cache().put(path.stem, extract_document(str(path))))
+
+
+async def _read_inline(path: Path, manager) -> str:
+    return _parse_and_render(path)
+
+
+async def _read_thread(path: Path, manager) -> str:
+    return await asyncio.get_running_loop().run_in_executor(None, _parse_and_render, path)
+
+
+async def _read_process(path: Path, manager) -> str:
+    return render_document(await manager.aload(path))
+
+
+async def _storm(read, files: list[Path], manager, args) -> tuple[list[float], float]:
+    stop = asyncio.Event()
+    gaps: list[float] = []
+    stream = asyncio.create_task(_stream(stop, args.token_interval_ms / 1000, gaps))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await asyncio.gather(*(read(path, manager) for path in files))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await stream
+    return gaps, elapsed
+
+
+async def _run(args, root: Path) -> None:
+    files = []
+    for i in range(args.reads + 1):
+        path = root / f"doc-{i}.pdf"
+        _write_pdf(path, args.pages, i)
+        files.append(path)
+    warmup, files = files[0], files[1:]
+
+    manager = IngestionManager(workers=args.workers)
+    # Spawn the parser processes before measuring
+    await manager.aload(warmup)
+
+    print(f"{args.reads} concurrent reads of {args.pages}-page PDFs, parser workers={args.workers}")
+    print(f"{'strategy':<10} {'reads s':>9} {'gap p50 ms':>11} {'gap p99 ms':>11} {'gap max ms':>11}")
+    try:
+        for name, read in (("inline", _read_inline), ("thread", _read_thread), ("process", _read_process)):
+            # A fresh cache per strategy, so every read parses
+            cache = DocumentCache(root / f".parsed-{name}")
+            with patch.object(document_cache, "_cache", cache):
+                gaps, elapsed = await _storm(read, files, manager, args)
+            gaps.sort()
+            p99 = gaps[min(len(gaps) - 1, int(len(gaps) * 0.99))]
+            print(f"{name:<10} {elapsed:>9.2f} {statistics.median(gaps):>11.1f} "
+                  f"{p99:>11.1f} {gaps[-1]:>11.1f}")
+    finally:
+        manager.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reads", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--token-interval-ms", type=float, default=10.0)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_run(args, Path(tmp)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark: chat-stream latency during a login storm.
+
+A simulated SSE stream emits a token every ``--token-interval-ms`` on the
+event loop while ``--logins`` concurrent logins verify a bcrypt password.
+The gap between consecutive tokens is reported for two strategies:
+
+* ``inline``: ``verify_password`` called directly on the event loop
+  (the previous login handler).
+* ``pooled``: ``verify_password_async`` on the dedicated hashing pool.
+
+Run:
+    python -m benchmarks.bench_login_storm --logins 20 --rounds 12
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from backend.auth import security
+
+
+async def _stream(stop: asyncio.Event, interval: float, gaps: list[float]) -> None:
+    """Emit tokens at a fixed interval, recording the actual gaps."""
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        gaps.append((now - last) * 1000)
+        last = now
+
+
+async def _login_inline(hashed: str) -> bool:
+    return security.verify_password("benchmark-password", hashed)
+
+
+async def _login_pooled(hashed: str) -> bool:
+    return await security.verify_password_async("benchmark-password", hashed)
+
+
+async def _storm(login, hashed: str, args) -> tuple[list[float], float]:
+    stop = asyncio.Event()
+    gaps: list[float] = []
+    stream = asyncio.create_task(_stream(stop, args.token_interval_ms / 1000, gaps))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await asyncio.gather(*(login(hashed) for _ in range(args.logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await stream
+    return gaps, elapsed
+
+
+async def _run(args) -> None:
+    security.BCRYPT_ROUNDS = args.rounds
+    hashed = security.hash_password("benchmark-password")
+
+    print(f"{args.logins} logins, bcrypt rounds={args.rounds}, "
+          f"hash workers={security.get_password_hash_pool().workers}")
+    print(f"{'strategy':<10} {'storm s':>9} {'gap p50 ms':>11} {'gap p99 ms':>11} {'gap max ms':>11}")
+    for name, login in (("inline", _login_inline), ("pooled", _login_pooled)):
+        gaps, elapsed = await _storm(login, hashed, args)
+        gaps.sort()
+        p99 = gaps[min(len(gaps) - 1, int(len(gaps) * 0.99))]
+        print(f"{name:<10} {elapsed:>9.2f} {statistics.median(gaps):>11.1f} "
+              f"{p99:>11.1f} {gaps[-1]:>11.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=security.BCRYPT_ROUNDS)
+    parser.add_argument("--token-interval-ms", type=float, default=10.0)
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
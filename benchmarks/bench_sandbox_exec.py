@@ -0,0 +1,110 @@
+"""Benchmark: per-call latency of the sandbox execution strategies.
+
+Each snippet is executed ``--runs`` times with three strategies:
+
+* ``cold``: ``python -c`` per call (the original ``execute_python``).
+* ``inline``: ``client.py`` against a worker in ``inline`` mode
+  (persistent interpreter, state shared between calls).
+* ``fork``: ``client.py`` against a worker in ``fork`` mode
+  (fork server, a fresh copy-on-write child per call).
+
+The workers are started locally with the current interpreter, so run this
+where the sandbox requirements are installed (e.g. inside the sandbox
+image: ``docker run --rm -v $PWD:/src -w /src sunnyagent-sandbox ...``).
+
+Run:
+    python -m benchmarks.bench_sandbox_exec --runs 20
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SANDBOX_DIR = Path(__file__).resolve().parents[1] / "dockerfiles" / "sandbox"
+
+SNIPPETS = {
+    "print": "print('hello')",
+    "pandas": (
+        "import pandas as pd\n"
+        "df = pd.DataFrame({'a': range(1000), 'b': range(1000)})\n"
+        "print(df.describe().loc['mean'].sum())"
+    ),
+    "pptx": (
+        "import io\n"
+        "from pptx import Presentation\n"
+        "prs = Presentation()\n"
+        "slide = prs.slides.add_slide(prs.slide_layouts[1])\n"
+        "slide.shapes.title.text = 'Report'\n"
+        "buf = io.BytesIO()\n"
+        "prs.save(buf)\n"
+        "print(len(buf.getvalue()) > 0)"
+    ),
+}
+
+
+def _start_worker(mode: str, workdir: str) -> tuple[subprocess.Popen, dict]:
+    socket_path = os.path.join(workdir, f"{mode}.sock")
+    env = {
+        **os.environ,
+        "SANDBOX_WORKER_SOCKET": socket_path,
+        "SANDBOX_WORKER_WORKDIR": workdir,
+        "SANDBOX_WORKER_MODE": mode,
+    }
+    proc = subprocess.Popen(
+        [sys.executable, str(SANDBOX_DIR / "worker.py")],
+        env=env,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 120
+    while not os.path.exists(socket_path):
+        if proc.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError(f"{mode} worker did not start")
+        time.sleep(0.05)
+    return proc, env
+
+
+def _time_calls(cmd: list[str], env: dict, runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(cmd, env=env, capture_output=True, text=True)
+        timings.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--snippets", default=",".join(SNIPPETS))
+    args = parser.parse_args()
+    names = [n for n in args.snippets.split(",") if n]
+
+    client = [sys.executable, "-S", str(SANDBOX_DIR / "client.py")]
+    with tempfile.TemporaryDirectory() as workdir:
+        workers = {mode: _start_worker(mode, workdir) for mode in ("inline", "fork")}
+        try:
+            print(f"{'snippet':<8} {'strategy':<8} {'p50 ms':>8} {'p90 ms':>8} {'max ms':>8}")
+            for name in names:
+                code = SNIPPETS[name]
+                strategies = [("cold", [sys.executable, "-c", code], dict(os.environ))]
+                strategies += [(mode, client + [code], env) for mode, (_, env) in workers.items()]
+                for strategy, cmd, env in strategies:
+                    timings = sorted(_time_calls(cmd, env, args.runs))
+                    p90 = timings[min(len(timings) - 1, int(len(timings) * 0.9))]
+                    print(f"{name:<8} {strategy:<8} {statistics.median(timings):>8.1f} "
+                          f"{p90:>8.1f} {timings[-1]:>8.1f}")
+        finally:
+            for proc, _ in workers.values():
+                proc.kill()
+                proc.wait()
+
+
+if __name__ == "__main__":
+    main()
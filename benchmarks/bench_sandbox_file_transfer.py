@@ -0,0 +1,106 @@
+"""Benchmark: peak RSS when copying a generated file out of a sandbox.
+
+A tar stream like the one ``container.get_archive`` returns is generated
+lazily in ``--chunk-kb`` chunks and written to a temporary directory with
+two strategies, each in a fresh subprocess so peak RSS is measured in
+isolation:
+
+* ``buffered``: ``b"".join(bits)`` + ``BytesIO`` + ``tarfile.extractall``
+  (the previous ``execute_python_with_file``).
+* ``streaming``: ``extract_archive_file`` writing the member directly.
+
+Run:
+    python -m benchmarks.bench_sandbox_file_transfer --size-mb 50
+"""
+
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+
+def _archive_chunks(size: int, chunk_size: int):
+    """Yield a tar archive holding one ``size``-byte file, chunk by chunk."""
+    info = tarfile.TarInfo("output.bin")
+    info.size = size
+    yield info.tobuf(format=tarfile.PAX_FORMAT)
+    block = os.urandom(chunk_size)
+    remaining = size
+    while remaining:
+        n = min(remaining, chunk_size)
+        yield block[:n]
+        remaining -= n
+    padding = -size % tarfile.BLOCKSIZE
+    yield b"\0" * (padding + 2 * tarfile.BLOCKSIZE)
+
+
+def _buffered(chunks, dest_dir: str) -> None:
+    tar_data = b"".join(chunks)
+    tar = tarfile.open(fileobj=io.BytesIO(tar_data))
+    tar.extractall(dest_dir)
+    tar.close()
+
+
+def _streaming(chunks, dest_dir: str) -> None:
+    from backend.tools.sandbox import extract_archive_file
+
+    extract_archive_file(chunks, os.path.join(dest_dir, "output.bin"))
+
+
+def _child(strategy: str, size: int, chunk_size: int) -> None:
+    """Run one strategy and print its timings and peak RSS as JSON."""
+    run = {"buffered": _buffered, "streaming": _streaming}[strategy]
+    if strategy == "streaming":
+        # Import outside the measured section
+        from backend.tools import sandbox  # noqa: F401
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory() as dest_dir:
+        start = time.perf_counter()
+        run(_archive_chunks(size, chunk_size), dest_dir)
+        elapsed = time.perf_counter() - start
+        written = os.path.getsize(os.path.join(dest_dir, "output.bin"))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "ms": elapsed * 1000,
+        "peak_mb": peak / 1024,
+        "growth_mb": (peak - baseline) / 1024,
+        "written": written,
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=50)
+    parser.add_argument("--chunk-kb", type=int, default=2048)  # docker-py default chunk size
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    size = int(args.size_mb * 1024 * 1024)
+    chunk_size = args.chunk_kb * 1024
+
+    if args.child:
+        _child(args.child, size, chunk_size)
+        return
+
+    print(f"{args.size_mb:g} MB file, {args.chunk_kb} KB chunks")
+    print(f"{'strategy':<10} {'ms':>8} {'peak RSS MB':>12} {'RSS growth MB':>14}")
+    for strategy in ("buffered", "streaming"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_sandbox_file_transfer",
+             "--size-mb", str(args.size_mb), "--chunk-kb", str(args.chunk_kb),
+             "--child", strategy],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        assert result["written"] == size
+        print(f"{strategy:<10} {result['ms']:>8.1f} {result['peak_mb']:>12.1f} "
+              f"{result['growth_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
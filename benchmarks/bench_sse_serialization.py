@@ -0,0 +1,95 @@
+"""Benchmark: per-event SSE payload serialization cost.
+
+Measures ``_format_sse`` for each event type emitted by
+``stream_agent_response`` under every available JSON backend (stdlib
+``json`` and, when installed, ``orjson``).
+
+Run:
+    python -m benchmarks.bench_sse_serialization
+"""
+
+import argparse
+import time
+
+from backend import serialization
+from backend.stream_handler import EventCounter, _format_sse
+
+_CODE = "\n".join(
+    f'slide{i}.shapes.title.text = "第 {i} 页：季度收入分析"' for i in range(120)
+)
+
+SAMPLE_EVENTS: dict[str, dict] = {
+    "text_delta": {"text": "根据查询结果，"},
+    "thinking": {"content": "Routing to sql: 统计每个国家的客户数量", "type": "routing"},
+    "tool_call_start": {
+        "id": "toolu_01ABCDEF",
+        "name": "execute_python_with_file",
+        "args": {"code": _CODE, "output_filename": "report.pptx"},
+        "task_id": "toolu_01TASK",
+    },
+    "tool_call_result": {
+        "id": "toolu_01ABCDEF",
+        "name": "sql_db_query",
+        "status": "success",
+        "output": ("('USA', 13), ('Canada', 8), ('Brazil', 5), ('法国', 5) " * 40)[:2000],
+        "task_id": "toolu_01TASK",
+    },
+    "todos_updated": {
+        "todos": [
+            {"content": f"步骤 {i}: analyse the quarterly sales data", "status": "pending"}
+            for i in range(12)
+        ],
+        "timestamp": "2026-01-01T00:00:00Z",
+    },
+    "task_spawned": {
+        "task_id": "toolu_01TASK",
+        "subagent_type": "research",
+        "description": "Research the latest developments in battery technology",
+    },
+    "done": {},
+}
+
+
+def _bench(event: str, data: dict, iterations: int) -> float:
+    """Return the best-of-3 mean cost per event in microseconds."""
+    counter = EventCounter()
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            _format_sse(event, data, counter)
+        best = min(best, (time.perf_counter() - start) / iterations)
+    return best * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    backends = list(serialization.SERIALIZERS)
+    original = serialization.get_serializer_name()
+    results: dict[str, dict[str, float]] = {}
+    try:
+        for backend in backends:
+            serialization.set_serializer(backend)
+            results[backend] = {
+                event: _bench(event, data, args.iterations)
+                for event, data in SAMPLE_EVENTS.items()
+            }
+    finally:
+        serialization.set_serializer(original)
+
+    header = f"{'event':<18}" + "".join(f"{b + ' us':>12}" for b in backends)
+    if len(backends) > 1:
+        header += f"{'speedup':>10}"
+    print(header)
+    for event in SAMPLE_EVENTS:
+        row = f"{event:<18}" + "".join(f"{results[b][event]:>12.3f}" for b in backends)
+        if len(backends) > 1:
+            row += f"{results['json'][event] / results[backends[-1]][event]:>9.1f}x"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark: streamed tool-call argument parsing.
+
+Replays a chunk sequence shaped like an ``execute_python_with_file`` call
+streamed by an LLM provider (a multi-KB ``code`` string split into small
+token-sized fragments) through:
+
+- ``rejoin``: the previous approach, ``"".join(parts)`` + ``json.loads`` on
+  every fragment (quadratic in argument size).
+- ``incremental``: ``IncrementalJSONParser.feed`` per fragment (linear).
+
+Run:
+    python -m benchmarks.bench_tool_call_args
+"""
+
+import argparse
+import json
+import random
+import time
+
+from backend.json_stream import IncrementalJSONParser
+
+_CODE_LINES = [
+    "from pptx import Presentation",
+    "from pptx.util import Inches, Pt",
+    "prs = Presentation()",
+    "slide = prs.slides.add_slide(prs.slide_layouts[1])",
+    'slide.shapes.title.text = "季度销售分析 Q{n}"',
+    "body = slide.placeholders[1].text_frame",
+    'body.text = "Revenue grew {n}% year over year\\n\\tdetails: \\"see appendix\\""',
+    "for i in range({n}):",
+    "    p = body.add_paragraph()",
+    '    p.text = f"Item {{i}}: value={{i * 3.14:.2f}}"',
+    "    p.font.size = Pt(14)",
+]
+
+
+def build_chunks(arg_bytes: int, seed: int = 42) -> list[str]:
+    """Build a recorded-style fragment sequence for ~``arg_bytes`` of arguments."""
+    rng = random.Random(seed)
+    lines: list[str] = []
+    size = 0
+    n = 0
+    while size < arg_bytes:
+        line = _CODE_LINES[n % len(_CODE_LINES)].format(n=n)
+        lines.append(line)
+        size += len(line) + 1
+        n += 1
+    payload = json.dumps(
+        {"code": "\n".join(lines), "output_filename": "report.pptx"},
+        ensure_ascii=False,
+    )
+
+    # Providers stream a few characters (roughly one token) per fragment.
+    chunks: list[str] = []
+    pos = 0
+    while pos < len(payload):
+        step = rng.randint(2, 12)
+        chunks.append(payload[pos:pos + step])
+        pos += step
+    return chunks
+
+
+def run_rejoin(chunks: list[str]) -> dict:
+    """Previous behaviour: re-join and re-parse on every fragment."""
+    parts: list[str] = []
+    result = None
+    for fragment in chunks:
+        parts.append(fragment)
+        try:
+            result = json.loads("".join(parts))
+        except json.JSONDecodeError:
+            continue
+    assert isinstance(result, dict)
+    return result
+
+
+def run_incremental(chunks: list[str]) -> dict:
+    """Incremental scanner: each fragment is consumed once."""
+    parser = IncrementalJSONParser()
+    for fragment in chunks:
+        parser.feed(fragment)
+    assert parser.complete
+    return parser.value
+
+
+def _time(fn, chunks: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(chunks)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default="5,10,25,50",
+        help="Comma-separated argument sizes in KB (default: 5,10,25,50)",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    print(f"{'size':>6} {'chunks':>7} {'rejoin ms':>10} {'incr ms':>9} {'incr ns/B':>10} {'speedup':>8}")
+    for kb in sizes:
+        chunks = build_chunks(kb * 1024)
+        assert run_rejoin(chunks) == run_incremental(chunks)
+        total = sum(len(c) for c in chunks)
+        t_old = _time(run_rejoin, chunks, args.repeat)
+        t_new = _time(run_incremental, chunks, args.repeat)
+        print(
+            f"{kb:>4}KB {len(chunks):>7} {t_old * 1000:>10.2f} {t_new * 1000:>9.3f} "
+            f"{t_new * 1e9 / total:>10.1f} {t_old / t_new:>7.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
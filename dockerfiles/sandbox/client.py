@@ -0,0 +1,80 @@
+"""
+沙箱执行客户端 - 把代码交给常驻解释器执行
+
+用法: python -S client.py [--clean-output] [--session ID] CODE
+      python -S client.py --reset
+
+输出和退出码与 `python -c CODE` 一致，输出在执行过程中实时写出。常驻解释器不可用时
+（容器刚启动仍在预加载，或解释器已退出）直接退化为 `python -c`，
+此时会话状态不会保留。--reset 结束容器内所有会话。
+--clean-output 在执行前清空输出目录中上一次执行留下的文件。
+"""
+import json
+import os
+import shutil
+import socket
+import sys
+
+SOCKET_PATH = os.environ.get("SANDBOX_WORKER_SOCKET", "/tmp/sandbox-worker.sock")
+OUTPUT_DIR = os.environ.get("SANDBOX_OUTPUT_DIR", "/output")
+
+
+def _parse_request(args: list[str]) -> tuple[dict, bool]:
+    """返回 (发给解释器的请求, 是否清空输出目录)"""
+    if args == ["--reset"]:
+        return {"reset": True}, False
+    clean_output = args[0] == "--clean-output"
+    if clean_output:
+        args = args[1:]
+    if len(args) == 3 and args[0] == "--session":
+        return {"session": args[1], "code": args[2]}, clean_output
+    return {"code": args[0]}, clean_output
+
+
+def _clean_output() -> None:
+    """删除输出目录中的所有文件和子目录（保留目录本身）"""
+    try:
+        entries = list(os.scandir(OUTPUT_DIR))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def main() -> int:
+    request, clean_output = _parse_request(sys.argv[1:])
+    if clean_output:
+        _clean_output()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(SOCKET_PATH)
+    except OSError:
+        sock.close()
+        if "code" not in request:
+            return 0
+        os.execv(sys.executable, [sys.executable, "-c", request["code"]])
+
+    with sock:
+        # 把本进程的 stdout/stderr 交给解释器，代码的输出直接写入，实时可见
+        payload = json.dumps(request).encode("utf-8") + b"\n"
+        sent = socket.send_fds(sock, [payload], [1, 2])
+        if sent < len(payload):
+            sock.sendall(payload[sent:])
+        with sock.makefile("rb") as rfile:
+            line = rfile.readline()
+
+    if not line:
+        sys.stderr.write("sandbox worker exited while running the code\n")
+        return 1
+
+    return json.loads(line)["exit_code"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+"""
+沙箱常驻解释器 - 预加载常用包，通过 Unix socket 接收并执行代码
+
+每个连接发送一行 JSON 请求 {"code": "..."}，并通过 SCM_RIGHTS 附带
+客户端的 stdout/stderr 文件描述符；返回一行 JSON 响应 {"exit_code": 0}。
+
+代码在全新的命名空间中执行，stdout/stderr 直接写入客户端的文件描述符，
+输出实时可见，子进程和 C 扩展的输出也包括在内，行为与 `python -c` 一致。
+
+执行模式（SANDBOX_WORKER_MODE）：
+- fork（默认）：fork server。父进程只负责预加载和接收请求，每次执行
+  fork 一个子进程，写时复制共享已导入的包，进程状态互不影响，
+  `os._exit`、段错误等也只会结束子进程。
+- inline：在常驻进程内直接执行，省去 fork 开销，但模块级修改、
+  后台线程等状态会遗留到后续执行。
+
+会话：请求带 "session" 时，代码在该会话专属的子进程中执行，变量和
+已加载的数据在同一会话的多次执行之间保留，父进程不受影响。
+请求 {"reset": true} 结束所有会话。会话进程意外退出时（如 `os._exit`）
+状态丢失，下次执行自动开启新会话。
+"""
+import builtins
+import importlib
+import json
+import os
+import random
+import signal
+import socket
+import sys
+import traceback
+
+SOCKET_PATH = os.environ.get("SANDBOX_WORKER_SOCKET", "/tmp/sandbox-worker.sock")
+WORKDIR = os.environ.get("SANDBOX_WORKER_WORKDIR", "/workspace")
+MODE = os.environ.get("SANDBOX_WORKER_MODE", "fork")
+# 与 requirements.txt 对应的预加载模块
+PRELOAD = os.environ.get(
+    "SANDBOX_WORKER_PRELOAD",
+    "numpy,pandas,matplotlib,matplotlib.pyplot,pptx,docx,openpyxl,"
+    "PIL.Image,pypdf,pdfplumber,reportlab.pdfgen.canvas",
+)
+
+
+def preload() -> None:
+    """导入常用包，之后每次执行都无需再付导入成本"""
+    for name in filter(None, (n.strip() for n in PRELOAD.split(","))):
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"[worker] preload {name} failed: {e}", file=sys.stderr)
+
+
+def _new_namespace() -> dict:
+    return {"__name__": "__main__", "__builtins__": builtins}
+
+
+def run_code(code: str, namespace: dict | None = None) -> int:
+    """在 namespace（默认全新的 __main__ 命名空间）中执行代码，返回退出码"""
+    if namespace is None:
+        namespace = _new_namespace()
+    try:
+        exec(compile(code, "<string>", "exec"), namespace)
+        return 0
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException as e:
+        # 去掉本函数的栈帧，输出与 python -c 相同的 traceback
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        return 1
+
+
+def _reset_state(cwd: str, close_figures: bool = True) -> None:
+    """清理上一次执行可能遗留的进程级状态"""
+    try:
+        os.chdir(cwd)
+    except OSError:
+        pass
+    pyplot = sys.modules.get("matplotlib.pyplot")
+    if pyplot is not None and close_figures:
+        pyplot.close("all")
+
+
+def _recv_request(sock: socket.socket) -> tuple[dict | None, list[int]]:
+    """读取一行 JSON 请求及随附的文件描述符，连接已关闭时返回 (None, [])"""
+    data, fds, _, _ = socket.recv_fds(sock, 65536, 2)
+    chunks = [data]
+    while data and not data.endswith(b"\n"):
+        data = sock.recv(65536)
+        chunks.append(data)
+    line = b"".join(chunks)
+    if not line.strip():
+        for fd in fds:
+            os.close(fd)
+        return None, []
+    return json.loads(line), fds
+
+
+def _exit_status(status: int) -> int:
+    """waitpid 状态转换为 shell 风格的退出码"""
+    if os.WIFSIGNALED(status):
+        return 128 + os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _reseed() -> None:
+    """子进程共享父进程的随机数状态，需要重新播种"""
+    random.seed()
+    numpy = sys.modules.get("numpy")
+    if numpy is not None:
+        numpy.random.seed()
+
+
+def _run_child(code: str, fds: list[int], inherited: list[socket.socket]) -> None:
+    """fork 出的子进程：执行代码后直接退出，不返回"""
+    exit_code = 1
+    try:
+        for sock in inherited:
+            sock.close()
+        _reseed()
+        os.dup2(fds[0], 1)
+        os.dup2(fds[1], 2)
+        exit_code = run_code(code)
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        os._exit(exit_code & 0xFF)
+
+
+def execute_forked(code: str, fds: list[int], inherited: list[socket.socket]) -> int:
+    """在 fork 出的子进程中执行代码，输出写入 fds，返回退出码"""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        _run_child(code, fds, inherited)
+    _, status = os.waitpid(pid, 0)
+    return _exit_status(status)
+
+
+def execute(code: str, fds: list[int], namespace: dict | None = None) -> int:
+    """在当前进程中执行代码，stdout/stderr 重定向到 fds，返回退出码"""
+    cwd = os.getcwd()
+    saved_streams = sys.stdout, sys.stderr
+    for stream in saved_streams:
+        stream.flush()
+    saved_fds = os.dup(1), os.dup(2)
+    os.dup2(fds[0], 1)
+    os.dup2(fds[1], 2)
+    try:
+        return run_code(code, namespace)
+    finally:
+        for stream in (sys.stdout, sys.stderr, *saved_streams):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        sys.stdout, sys.stderr = saved_streams
+        os.dup2(saved_fds[0], 1)
+        os.dup2(saved_fds[1], 2)
+        os.close(saved_fds[0])
+        os.close(saved_fds[1])
+        # 会话中的图表与变量一样保留到下一次执行
+        _reset_state(cwd, close_figures=namespace is None)
+
+
+class Session:
+    """会话子进程：持有一个跨执行保留的命名空间，通过 socketpair 收发请求"""
+
+    def __init__(self, inherited: list[socket.socket], fds: list[int]):
+        channel, child_channel = socket.socketpair()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        self.pid = os.fork()
+        if self.pid == 0:
+            channel.close()
+            for fd in fds:
+                os.close(fd)
+            _serve_session(child_channel, inherited)
+        child_channel.close()
+        self.channel = channel
+        self.rfile = channel.makefile("rb")
+
+    def execute(self, code: str, fds: list[int]) -> int | None:
+        """转发给会话进程执行，会话进程已退出时返回 None"""
+        payload = json.dumps({"code": code}).encode("utf-8") + b"\n"
+        try:
+            sent = socket.send_fds(self.channel, [payload], fds)
+            if sent < len(payload):
+                self.channel.sendall(payload[sent:])
+            line = self.rfile.readline()
+        except OSError:
+            return None
+        return json.loads(line)["exit_code"] if line else None
+
+    def close(self) -> None:
+        self.rfile.close()
+        self.channel.close()
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        os.waitpid(self.pid, 0)
+
+
+def _serve_session(channel: socket.socket, inherited: list[socket.socket]) -> None:
+    """会话子进程：依次执行请求，直到父进程关闭 channel，不返回"""
+    try:
+        for sock in inherited:
+            sock.close()
+        _reseed()
+        namespace = _new_namespace()
+        while True:
+            request, fds = _recv_request(channel)
+            if request is None:
+                break
+            try:
+                exit_code = execute(request["code"], fds, namespace)
+            finally:
+                for fd in fds:
+                    os.close(fd)
+            channel.sendall(json.dumps({"exit_code": exit_code}).encode("utf-8") + b"\n")
+    finally:
+        os._exit(0)
+
+
+_sessions: dict[str, Session] = {}
+
+
+def _end_sessions() -> None:
+    while _sessions:
+        _, session = _sessions.popitem()
+        session.close()
+
+
+def execute_in_session(
+    session_id: str, code: str, fds: list[int], inherited: list[socket.socket]
+) -> int:
+    """在会话进程中执行代码，需要时先启动会话"""
+    session = _sessions.get(session_id)
+    if session is None:
+        session = _sessions[session_id] = Session(inherited, fds)
+    exit_code = session.execute(code, fds)
+    if exit_code is None:
+        del _sessions[session_id]
+        session.close()
+        os.write(fds[1], b"sandbox session exited while running the code; its state was lost\n")
+        exit_code = 1
+    return exit_code
+
+
+def handle(conn: socket.socket, server: socket.socket) -> None:
+    """处理一个连接：读取请求、执行、返回退出码"""
+    request, fds = _recv_request(conn)
+    if request is None:
+        return
+    # 子进程需要关闭的继承 socket
+    inherited = [conn, server, *(s.channel for s in _sessions.values())]
+    try:
+        if request.get("reset"):
+            _end_sessions()
+            exit_code = 0
+        elif len(fds) != 2:
+            raise ValueError("request must carry the client's stdout and stderr")
+        elif request.get("session"):
+            exit_code = execute_in_session(request["session"], request["code"], fds, inherited)
+        elif MODE == "fork":
+            exit_code = execute_forked(request["code"], fds, inherited)
+        else:
+            exit_code = execute(request["code"], fds)
+    finally:
+        # 客户端的输出管道只能由执行代码的进程持有，否则 docker exec 无法结束
+        for fd in fds:
+            os.close(fd)
+    conn.sendall(json.dumps({"exit_code": exit_code}).encode("utf-8") + b"\n")
+
+
+def serve() -> None:
+    preload()
+    if os.path.isdir(WORKDIR):
+        os.chdir(WORKDIR)
+
+    # 先在临时路径监听再改名，客户端看到 socket 时即可连接
+    tmp_path = f"{SOCKET_PATH}.{os.getpid()}"
+    for path in (tmp_path, SOCKET_PATH):
+        if os.path.exists(path):
+            os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(tmp_path)
+    server.listen(16)
+    os.rename(tmp_path, SOCKET_PATH)
+    print(f"[worker] listening on {SOCKET_PATH} ({MODE} mode)", file=sys.stderr)
+
+    while True:
+        conn, _ = server.accept()
+        with conn:
+            try:
+                handle(conn, server)
+            except Exception as e:
+                print(f"[worker] request failed: {e}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    serve()
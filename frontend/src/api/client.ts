@@ -1,5 +1,46 @@
 import type { Agent, Skill, SSEEvent, UploadedFile } from "../types";
 
+/** An SSE event with the ID used to resume the stream after a disconnect. */
+export type StreamEvent = SSEEvent & { id?: string };
+
+/** Parse an SSE response body into events. */
+async function* readSSE(response: Response): AsyncGenerator<StreamEvent> {
+  const reader = response.body!.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let currentEvent = "";
+  let currentId: string | undefined;
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split("\n");
+    // Keep the last (potentially incomplete) line in the buffer
+    buffer = lines.pop() ?? "";
+
+    for (const line of lines) {
+      if (line.startsWith("event: ")) {
+        currentEvent = line.slice(7).trim();
+      } else if (line.startsWith("id: ")) {
+        currentId = line.slice(4).trim();
+      } else if (line.startsWith("data: ") && currentEvent) {
+        try {
+          const data = JSON.parse(line.slice(6));
+          console.log(`[SSE_EVENT] event=${currentEvent}, data=`, data);
+          yield { event: currentEvent, data, id: currentId } as StreamEvent;
+        } catch {
+          // Skip malformed JSON
+        }
+        currentEvent = "";
+        currentId = undefined;
+      }
+      // Skip empty lines and comments (: keepalive)
+    }
+  }
+}
+
 /**
  * Stream chat responses from the backend via SSE.
  *
@@ -13,7 +54,7 @@ export async function* streamChat(
   agent?: string,
   skill?: string,
   fileIds?: string[],
-): AsyncGenerator<SSEEvent> {
+): AsyncGenerator<StreamEvent> {
   const body: Record<string, unknown> = { thread_id: threadId, message };
   if (agent) body.agent = agent;
   if (skill) body.skill = skill;
@@ -30,36 +71,35 @@ export async function* streamChat(
     throw new Error(`Chat request failed: ${response.status}`);
   }
 
-  const reader = response.body!.getReader();
-  const decoder = new TextDecoder();
-  let buffer = "";
-  let currentEvent = "";
+  yield* readSSE(response);
+}
 
-  while (true) {
-    const { done, value } = await reader.read();
-    if (done) break;
+/**
+ * Reattach to a thread's running agent after the stream dropped.
+ *
+ * The run keeps going on the server; events after `lastEventId` are
+ * replayed, then the live tail follows.
+ */
+export async function* resumeStream(
+  threadId: string,
+  lastEventId: string | undefined,
+  signal: AbortSignal,
+): AsyncGenerator<StreamEvent> {
+  const headers: Record<string, string> = {};
+  if (lastEventId) headers["Last-Event-ID"] = lastEventId;
 
-    buffer += decoder.decode(value, { stream: true });
-    const lines = buffer.split("\n");
-    // Keep the last (potentially incomplete) line in the buffer
-    buffer = lines.pop() ?? "";
+  const response = await fetch(`/api/threads/${threadId}/stream`, { headers, signal });
 
-    for (const line of lines) {
-      if (line.startsWith("event: ")) {
-        currentEvent = line.slice(7).trim();
-      } else if (line.startsWith("data: ") && currentEvent) {
-        try {
-          const data = JSON.parse(line.slice(6));
-          console.log(`[SSE_EVENT] event=${currentEvent}, data=`, data);
-          yield { event: currentEvent, data } as SSEEvent;
-        } catch {
-          // Skip malformed JSON
-        }
-        currentEvent = "";
-      }
-      // Skip empty lines and comments (: keepalive)
-    }
+  if (!response.ok) {
+    throw new Error(`Stream resume failed: ${response.status}`);
   }
+
+  yield* readSSE(response);
+}
+
+/** Stop the thread's running agent on the server. */
+export async function cancelRun(threadId: string): Promise<void> {
+  await fetch(`/api/threads/${threadId}/cancel`, { method: "POST" });
 }
 
 /** Create a new thread and return its ID. */
@@ -81,20 +121,32 @@ export async function getSkills(): Promise<Skill[]> {
   return response.json();
 }
 
-/** Upload a file with progress tracking. */
-export function uploadFile(
-  file: File,
-  onProgress?: (progress: number) => void
-): Promise<UploadedFile> {
-  const formData = new FormData();
-  formData.append("file", file);
+/** Files larger than this use the resumable chunked upload API (the server's single-request limit). */
+const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+/** Attempts per chunk before a chunked upload gives up. */
+const CHUNK_RETRIES = 3;
+
+interface UploadSession {
+  upload_id: string;
+  offset: number;
+  size: number;
+  chunk_size: number;
+  file?: UploadedFile | null;
+}
 
+/** Send a request with XHR so upload progress is reported. */
+function sendWithProgress<T>(
+  method: string,
+  url: string,
+  body: XMLHttpRequestBodyInit,
+  onProgress?: (loaded: number) => void
+): Promise<T> {
   return new Promise((resolve, reject) => {
     const xhr = new XMLHttpRequest();
 
     xhr.upload.onprogress = (e) => {
-      if (e.lengthComputable && onProgress) {
-        onProgress(Math.round((e.loaded / e.total) * 100));
+      if (onProgress) {
+        onProgress(e.loaded);
       }
     };
 
@@ -104,7 +156,8 @@ export function uploadFile(
       } else {
         try {
           const error = JSON.parse(xhr.responseText);
-          reject(new Error(error.detail || "Upload failed"));
+          const detail = error.detail?.message ?? error.detail;
+          reject(new Error(detail || "Upload failed"));
         } catch {
           reject(new Error("Upload failed"));
         }
@@ -115,11 +168,75 @@ export function uploadFile(
       reject(new Error("Network error"));
     };
 
-    xhr.open("POST", "/api/files/upload");
-    xhr.send(formData);
+    xhr.open(method, url);
+    xhr.send(body);
   });
 }
 
+/** Upload a large file in chunks, resuming from the server's offset after a failure. */
+async function uploadFileChunked(
+  file: File,
+  onProgress?: (progress: number) => void
+): Promise<UploadedFile> {
+  const response = await fetch("/api/files/uploads", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    credentials: "include",
+    body: JSON.stringify({ filename: file.name, size: file.size, content_type: file.type || null }),
+  });
+  if (!response.ok) {
+    const error = await response.json().catch(() => ({}));
+    throw new Error(error.detail || "Upload failed");
+  }
+  let session: UploadSession = await response.json();
+  const url = `/api/files/uploads/${session.upload_id}`;
+
+  let failures = 0;
+  while (!session.file) {
+    const end = Math.min(session.offset + session.chunk_size, file.size);
+    const offset = session.offset;
+    try {
+      session = await sendWithProgress<UploadSession>(
+        "PUT",
+        `${url}?offset=${offset}`,
+        file.slice(offset, end),
+        (loaded) => onProgress?.(Math.min(100, Math.round(((offset + loaded) / file.size) * 100)))
+      );
+      failures = 0;
+    } catch (err) {
+      if (++failures >= CHUNK_RETRIES) {
+        throw err;
+      }
+      // Continue from whatever the server kept of the failed chunk
+      const status = await fetch(url, { credentials: "include" });
+      if (!status.ok) {
+        throw err;
+      }
+      session = await status.json();
+    }
+  }
+  return session.file as UploadedFile;
+}
+
+/** Upload a file with progress tracking. */
+export function uploadFile(
+  file: File,
+  onProgress?: (progress: number) => void
+): Promise<UploadedFile> {
+  if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+    return uploadFileChunked(file, onProgress);
+  }
+
+  const formData = new FormData();
+  formData.append("file", file);
+  return sendWithProgress<UploadedFile>(
+    "POST",
+    "/api/files/upload",
+    formData,
+    (loaded) => onProgress?.(Math.min(100, Math.round((loaded / Math.max(file.size, 1)) * 100)))
+  );
+}
+
 /** Fetch file content for preview. */
 export async function getFileContent(fileId: string): Promise<{ content: string; filename: string }> {
   const response = await fetch(`/api/files/${fileId}/content`);
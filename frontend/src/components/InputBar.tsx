@@ -23,7 +23,7 @@ const ALLOWED_EXTENSIONS = [
   ".ppt", ".pptx",                  // PowerPoint
   ".xls", ".xlsx",                  // Excel
 ];
-const MAX_FILE_SIZE = 10 * 1024 * 1024; // 10MB
+const MAX_FILE_SIZE = 200 * 1024 * 1024; // 200MB, matches MAX_UPLOAD_MB on the server
 
 function formatSize(bytes: number): string {
   if (bytes < 1024) return `${bytes} B`;
@@ -81,7 +81,7 @@ export default function InputBar({ onSend, onCancel, isStreaming, agents, skills
 
       // Validate size
       if (file.size > MAX_FILE_SIZE) {
-        alert(`文件过大: ${file.name}。最大支持: 10MB`);
+        alert(`文件过大: ${file.name}。最大支持: 200MB`);
         continue;
       }
 
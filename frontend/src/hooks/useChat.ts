@@ -1,7 +1,13 @@
 import { useCallback, useRef, useState } from "react";
-import { createThread, streamChat, getThreadHistory } from "../api/client";
+import { cancelRun, createThread, resumeStream, streamChat, getThreadHistory } from "../api/client";
+import type { StreamEvent } from "../api/client";
 import type { Message, ThinkingState, ToolCall, UploadedFile, DisplayScenario, SpawnedTask } from "../types";
 
+/** Reconnect attempts after the stream drops before giving up. */
+const MAX_RESUME_ATTEMPTS = 5;
+/** Base delay between reconnect attempts (grows linearly). */
+const RESUME_DELAY_MS = 1000;
+
 let msgCounter = 0;
 function nextId() {
   return `msg-${++msgCounter}`;
@@ -30,6 +36,7 @@ export function useChat(options: UseChatOptions = {}) {
   const [isStreaming, setIsStreaming] = useState(false);
   const [threadId, setThreadId] = useState<string | null>(options.initialThreadId ?? null);
   const abortRef = useRef<AbortController | null>(null);
+  const streamThreadRef = useRef<string | null>(null);
 
   const sendMessage = useCallback(
     async (text: string, agent?: string, uploadedFiles?: UploadedFile[]) => {
@@ -88,19 +95,49 @@ export function useChat(options: UseChatOptions = {}) {
 
       const controller = new AbortController();
       abortRef.current = controller;
+      const streamThreadId: string = currentThreadId;
+      streamThreadRef.current = streamThreadId;
 
       // Collect file IDs to send
       const fileIds = uploadedFiles?.map(f => f.file_id);
 
-      try {
-        for await (const event of streamChat(
-          currentThreadId,
+      // The agent keeps running on the server when the connection drops, so
+      // reattach and replay the events missed after the last received ID
+      async function* runEvents(): AsyncGenerator<StreamEvent> {
+        let lastEventId: string | undefined;
+        let attempts = 0;
+        let stream = streamChat(
+          streamThreadId,
           skill ? parsedMessage : actualMessage,
           controller.signal,
           agent,
           skill ?? undefined,
           fileIds,
-        )) {
+        );
+        while (true) {
+          try {
+            for await (const event of stream) {
+              lastEventId = event.id ?? lastEventId;
+              attempts = 0;
+              yield event;
+              if (event.event === "done") return;
+            }
+          } catch (err) {
+            // Before any event only a network failure means the run may exist
+            const resumable = lastEventId !== undefined || err instanceof TypeError;
+            if (controller.signal.aborted || !resumable) throw err;
+          }
+          if (++attempts > MAX_RESUME_ATTEMPTS) {
+            throw new Error("Connection lost");
+          }
+          console.log(`[CHAT_RESUME] attempt=${attempts}, last_event_id=${lastEventId}`);
+          await new Promise((resolve) => setTimeout(resolve, RESUME_DELAY_MS * attempts));
+          stream = resumeStream(streamThreadId, lastEventId, controller.signal);
+        }
+      }
+
+      try {
+        for await (const event of runEvents()) {
           console.log(`[CHAT_EVENT] event=${event.event}`, event.data);
           switch (event.event) {
             case "text_delta":
@@ -184,6 +221,32 @@ export function useChat(options: UseChatOptions = {}) {
               break;
             }
 
+            case "tool_call_progress": {
+              // Append live output to the running tool card; tool_call_result replaces it
+              const appendOutput = (tc: ToolCall): ToolCall =>
+                tc.id === event.data.id && tc.status === "running"
+                  ? { ...tc, output: (tc.output ?? "") + event.data.text }
+                  : tc;
+              setMessages((prev) =>
+                prev.map((m) => {
+                  if (m.id !== assistantId) return m;
+                  const taskId = event.data.task_id;
+                  if (taskId && m.spawnedTasks) {
+                    return {
+                      ...m,
+                      spawnedTasks: m.spawnedTasks.map((task) =>
+                        task.task_id === taskId
+                          ? { ...task, toolCalls: task.toolCalls.map(appendOutput) }
+                          : task
+                      ),
+                    };
+                  }
+                  return { ...m, toolCalls: (m.toolCalls ?? []).map(appendOutput) };
+                }),
+              );
+              break;
+            }
+
             case "thinking":
               setMessages((prev) =>
                 prev.map((m) =>
@@ -336,12 +399,18 @@ export function useChat(options: UseChatOptions = {}) {
       } finally {
         setIsStreaming(false);
         abortRef.current = null;
+        streamThreadRef.current = null;
       }
     },
     [isStreaming, threadId],
   );
 
   const cancel = useCallback(() => {
+    // Aborting the fetch only detaches this client; stop the run on the server too
+    const runThreadId = streamThreadRef.current;
+    if (runThreadId) {
+      cancelRun(runThreadId).catch((err) => console.error("Failed to cancel run:", err));
+    }
     abortRef.current?.abort();
   }, []);
 
@@ -48,8 +48,12 @@ export type SSEEvent =
       event: "tool_call_result";
       data: { id: string; task_id?: string; name: string; status: string; output: string };
     }
+  | {
+      event: "tool_call_progress";
+      data: { id: string; task_id?: string; stream: "stdout" | "stderr"; text: string; truncated?: boolean };
+    }
   | { event: "thinking"; data: { type?: "planning" | "replanning" | "routing"; content: string } }
-  | { event: "error"; data: { message: string } }
+  | { event: "error"; data: { message: string; cancelled?: boolean } }
   | { event: "done"; data: Record<string, never> }
   | { event: "todos_updated"; data: { todos: Todo[]; timestamp: string } }
   | { event: "task_spawned"; data: { task_id: string; subagent_type: string; description: string } }
@@ -113,6 +113,27 @@ export interface ToolCallResultEvent {
   };
 }
 
+/**
+ * Incremental output from a running tool (sandbox stdout/stderr)
+ *
+ * Sent while the tool runs; tool_call_result still carries the final output
+ */
+export interface ToolCallProgressEvent {
+  event: "tool_call_progress";
+  data: {
+    /** Tool call ID (matches tool_call_start) */
+    id: string;
+    /** Parent task ID (optional for backward compatibility) */
+    task_id?: string;
+    /** Output stream the text was written to */
+    stream: "stdout" | "stderr";
+    /** New output since the previous progress event */
+    text: string;
+    /** Set on the final notice once the live output cap is reached */
+    truncated?: boolean;
+  };
+}
+
 // =============================================================================
 // New Events
 // =============================================================================
@@ -180,6 +201,7 @@ export type SSEEvent =
   | ThinkingEvent
   | ToolCallStartEvent
   | ToolCallResultEvent
+  | ToolCallProgressEvent
   | TodosUpdatedEvent
   | TaskSpawnedEvent
   | TaskCompletedEvent;
@@ -204,6 +226,10 @@ export function isToolCallResultEvent(event: SSEEvent): event is ToolCallResultE
   return event.event === "tool_call_result";
 }
 
+export function isToolCallProgressEvent(event: SSEEvent): event is ToolCallProgressEvent {
+  return event.event === "tool_call_progress";
+}
+
 export function isTodosUpdatedEvent(event: SSEEvent): event is TodosUpdatedEvent {
   return event.event === "todos_updated";
 }
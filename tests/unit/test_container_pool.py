@@ -0,0 +1,463 @@
+"""Unit tests for the elastic sandbox container pool."""
+
+import asyncio
+import itertools
+import threading
+from unittest.mock import patch
+
+import docker
+import pytest
+
+from backend.tools import container_pool
+from backend.tools.container_pool import ContainerPool, PoolExhaustedError
+
+
+class _FakeContainer:
+    _ids = itertools.count(1)
+
+    def __init__(self, name: str, labels=None):
+        self.id = f"c{next(self._ids)}"
+        self.name = name
+        self.labels = labels or {}
+        self.removed = False
+        self.commands: list = []
+        self.attrs = {"State": {"Running": True, "OOMKilled": False}}
+
+    def exec_run(self, cmd, **kwargs):
+        self.commands.append(cmd)
+        return None
+
+    def reload(self):
+        if self.removed:
+            raise docker.errors.NotFound(self.name)
+
+    def stop(self, timeout=None):
+        pass
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+class _FakeContainers:
+    def __init__(self, on_run=None):
+        self.created: list[_FakeContainer] = []
+        self.on_run = on_run
+
+    def get(self, name):
+        raise docker.errors.NotFound(name)
+
+    def run(self, image, name=None, labels=None, **kwargs):
+        if self.on_run is not None:
+            self.on_run()
+        container = _FakeContainer(name, labels)
+        container.run_kwargs = kwargs
+        self.created.append(container)
+        return container
+
+    def list(self, all=False, filters=None):
+        wanted = dict(label.split("=", 1) for label in (filters or {}).get("label", []))
+        return [
+            c for c in self.created
+            if not c.removed and wanted.items() <= c.labels.items()
+        ]
+
+
+class _FakeDockerClient:
+    def __init__(self, on_run=None):
+        self.containers = _FakeContainers(on_run)
+
+
+def _pool(on_run=None, **kwargs) -> ContainerPool:
+    kwargs.setdefault("maintenance_interval", 3600)
+    return ContainerPool(client=_FakeDockerClient(on_run), **kwargs)
+
+
+async def _settle(pool: ContainerPool) -> None:
+    """Let background pre-warming finish."""
+    for _ in range(20):
+        await asyncio.sleep(0)
+    if pool._prewarm_task is not None:
+        await pool._prewarm_task
+
+
+class TestContainerPool:
+    """Tests for ContainerPool sizing, overflow and shrinking."""
+
+    def test_initialize_warms_min_size(self):
+        """Test that startup creates exactly min_size containers."""
+
+        async def scenario():
+            pool = _pool(min_size=2, max_size=4, low_watermark=0, min_ready=2)
+            await pool.initialize()
+            stats = pool.stats
+            await pool.shutdown()
+            return stats
+
+        stats = asyncio.run(scenario())
+        assert stats["size"] == 2
+        assert stats["available"] == 2
+
+    def test_prewarms_below_watermark(self):
+        """Test that acquiring below the watermark pre-warms in the background."""
+
+        async def scenario():
+            pool = _pool(min_size=1, max_size=4, low_watermark=1)
+            await pool.initialize()
+            held = await pool.acquire()
+            await _settle(pool)
+            stats = pool.stats
+            await pool.release(held)
+            await pool.shutdown()
+            return stats
+
+        stats = asyncio.run(scenario())
+        assert stats["in_use"] == 1
+        assert stats["available"] == 1
+        assert stats["prewarmed"] == 1
+
+    def test_grows_to_max_then_overflows_then_rejects(self):
+        """Test the acquire path: pool growth, bounded overflow, exhaustion."""
+
+        async def scenario():
+            pool = _pool(min_size=1, max_size=2, low_watermark=0, max_overflow=1)
+            await pool.initialize()
+            held = [await pool.acquire() for _ in range(3)]
+            with pytest.raises(PoolExhaustedError):
+                await pool.acquire(timeout=0.01)
+            stats = pool.stats
+            for pooled in held:
+                await pool.release(pooled)
+            after = pool.stats
+            await pool.shutdown()
+            return held, stats, after
+
+        held, stats, after = asyncio.run(scenario())
+        assert [p.overflow for p in held] == [False, False, True]
+        assert stats["size"] == 2
+        assert stats["overflow_in_use"] == 1
+        assert stats["exhausted"] == 1
+        # Overflow containers are destroyed on release, pooled ones are kept
+        assert held[2].container.removed
+        assert after["available"] == 2
+        assert after["overflow_in_use"] == 0
+
+    def test_release_hands_container_to_waiter(self):
+        """Test that a waiting acquire receives the released container."""
+
+        async def scenario():
+            pool = _pool(min_size=1, max_size=1, low_watermark=0, max_overflow=0)
+            await pool.initialize()
+            held = await pool.acquire()
+            waiter = asyncio.create_task(pool.acquire(timeout=5))
+            await asyncio.sleep(0)
+            await pool.release(held)
+            received = await waiter
+            await pool.shutdown()
+            return held, received
+
+        held, received = asyncio.run(scenario())
+        assert received is held
+
+    def test_release_discard_replaces_container(self):
+        """Test that a discarded container is destroyed in the background and replaced."""
+
+        async def scenario():
+            pool = _pool(min_size=1, max_size=1, low_watermark=0)
+            await pool.initialize()
+            held = await pool.acquire()
+            await pool.release(held, discard=True)
+            on_release = pool.stats
+            replacement = await pool.acquire()
+            await asyncio.gather(*pool._retiring)
+            stats = pool.stats
+            await pool.release(replacement)
+            await pool.shutdown()
+            return held, replacement, on_release, stats
+
+        held, replacement, on_release, stats = asyncio.run(scenario())
+        assert on_release["retiring"] == 1
+        assert on_release["recycled"] == 1
+        assert held.container.removed
+        assert replacement is not held
+        assert stats["size"] == 1
+        assert stats["total_destroyed"] == 1
+        assert stats["retiring"] == 0
+
+    def test_release_makes_no_docker_calls(self):
+        """Test that returning a container does not run a cleanup exec."""
+
+        async def scenario():
+            pool = _pool(min_size=1, max_size=1, low_watermark=0)
+            await pool.initialize()
+            held = await pool.acquire()
+            await pool.release(held)
+            stats = pool.stats
+            await pool.shutdown()
+            return held, stats
+
+        held, stats = asyncio.run(scenario())
+        assert held.container.commands == []
+        assert stats["available"] == 1
+
+    def test_worn_out_container_is_replaced_by_prewarm(self):
+        """Test that a container at max uses is retired and the pool refills to min_size."""
+
+        async def scenario():
+            pool = _pool(min_size=1, max_size=2, low_watermark=0, max_uses_per_container=1)
+            await pool.initialize()
+            held = await pool.acquire()
+            await pool.release(held)
+            await _settle(pool)
+            await asyncio.gather(*pool._retiring)
+            stats = pool.stats
+            await pool.shutdown()
+            return held, stats
+
+        held, stats = asyncio.run(scenario())
+        assert held.container.removed
+        assert stats["size"] == 1
+        assert stats["available"] == 1
+        assert stats["prewarmed"] == 1
+
+    def test_acquire_replaces_dead_idle_container(self):
+        """Test that an OOM-killed idle container is skipped and replaced."""
+
+        async def scenario():
+            pool = _pool(min_size=2, max_size=2, low_watermark=0, min_ready=2)
+            await pool.initialize()
+            dead = pool._idle[-1]
+            dead.container.attrs["State"] = {"Running": False, "OOMKilled": True}
+            pooled = await pool.acquire()
+            await _settle(pool)
+            await asyncio.gather(*pool._retiring)
+            stats = pool.stats
+            await pool.release(pooled)
+            await pool.shutdown()
+            return dead, pooled, stats
+
+        dead, pooled, stats = asyncio.run(scenario())
+        assert pooled is not dead
+        assert dead.container.removed
+        assert stats["health"]["unhealthy"] == 1
+        assert stats["health"]["oom_killed"] == 1
+        assert stats["health"]["replaced"] == 1
+        assert stats["size"] == 2
+        assert stats["in_use"] == 1
+
+    def test_probe_replaces_exited_idle_containers(self):
+        """Test that the periodic probe removes containers that no longer exist."""
+
+        async def scenario():
+            pool = _pool(min_size=2, max_size=2, low_watermark=0, min_ready=2)
+            await pool.initialize()
+            gone = pool._idle[0]
+            gone.container.removed = True
+            await pool._probe_idle()
+            await _settle(pool)
+            stats = pool.stats
+            await pool.shutdown()
+            return gone, stats, pool
+
+        gone, stats, pool = asyncio.run(scenario())
+        assert stats["health"]["checks"] == 2
+        assert stats["health"]["unhealthy"] == 1
+        assert stats["health"]["oom_killed"] == 0
+        assert stats["available"] == 2
+        assert stats["prewarmed"] == 1
+
+    def test_exec_failure_replaces_container(self):
+        """Test that a container Docker failed to exec in is not reused."""
+
+        async def scenario():
+            pool = _pool(min_size=1, max_size=1, low_watermark=0)
+            await pool.initialize()
+            held = await pool.acquire()
+            await pool.release(held, exec_failed=True)
+            await _settle(pool)
+            await asyncio.gather(*pool._retiring)
+            stats = pool.stats
+            await pool.shutdown()
+            return held, stats
+
+        held, stats = asyncio.run(scenario())
+        assert held.container.removed
+        assert stats["health"]["exec_failures"] == 1
+        assert stats["health"]["replaced"] == 1
+        assert stats["available"] == 1
+
+    def test_idle_containers_shrink_to_min(self):
+        """Test that containers idle past the TTL are destroyed down to min_size."""
+
+        async def scenario():
+            pool = _pool(min_size=1, max_size=3, low_watermark=0, idle_ttl=60)
+            await pool.initialize()
+            held = [await pool.acquire() for _ in range(3)]
+            for pooled in held:
+                await pool.release(pooled)
+            with patch(
+                "backend.tools.container_pool.time.monotonic",
+                return_value=held[-1].last_used_at + 61,
+            ):
+                await pool._shrink_idle()
+            stats = pool.stats
+            await pool.shutdown()
+            return stats
+
+        stats = asyncio.run(scenario())
+        assert stats["size"] == 1
+        assert stats["available"] == 1
+        assert stats["shrunk"] == 2
+
+    def test_warm_up_is_concurrent_and_returns_at_min_ready(self):
+        """Test that startup returns once min_ready containers exist."""
+        gate = threading.Event()
+        lock = threading.Lock()
+        state = {"calls": 0, "active": 0, "peak": 0}
+
+        def on_run():
+            with lock:
+                state["calls"] += 1
+                first = state["calls"] == 1
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            if not first:
+                gate.wait(5)
+            with lock:
+                state["active"] -= 1
+
+        async def scenario():
+            pool = _pool(
+                on_run, min_size=4, max_size=4, low_watermark=0,
+                min_ready=1, warmup_concurrency=4,
+            )
+            await pool.initialize()
+            at_ready = pool.stats
+            # Let the other three creations reach on_run before releasing them
+            for _ in range(500):
+                if state["calls"] == 4:
+                    break
+                await asyncio.sleep(0.01)
+            gate.set()
+            await pool._warmup_task
+            at_done = pool.stats
+            await pool.shutdown()
+            return at_ready, at_done
+
+        at_ready, at_done = asyncio.run(scenario())
+        assert at_ready["available"] == 1
+        assert at_ready["creating"] == 3
+        assert at_ready["warmup"]["ready_ms"] is not None
+        assert at_done["available"] == 4
+        assert at_done["warmup"]["total_ms"] is not None
+        assert state["peak"] >= 3
+
+    def test_warm_up_fails_when_min_ready_cannot_be_met(self):
+        """Test that startup raises if no container can be created."""
+
+        def on_run():
+            raise docker.errors.APIError("daemon unavailable")
+
+        async def scenario():
+            pool = _pool(on_run, min_size=2, max_size=2, min_ready=1)
+            with pytest.raises(RuntimeError):
+                await pool.initialize()
+            return pool.stats
+
+        stats = asyncio.run(scenario())
+        assert stats["size"] == 0
+        assert stats["warmup"]["failed"] == 2
+
+
+class TestResourceClassPools:
+    """Tests for one pool per resource class."""
+
+    def test_pools_only_clean_up_their_own_class(self):
+        """Test that shutting down one class leaves other classes' containers running."""
+
+        async def scenario():
+            client = _FakeDockerClient()
+            standard = ContainerPool(client=client, name="standard", min_size=1, max_size=1)
+            large = ContainerPool(client=client, name="large", min_size=1, max_size=1)
+            await standard.initialize()
+            await large.initialize()
+            await standard.shutdown()
+            remaining = client.containers.list(all=True)
+            await large.shutdown()
+            return client, remaining
+
+        client, remaining = asyncio.run(scenario())
+        assert [c.labels[container_pool.CLASS_LABEL] for c in remaining] == ["large"]
+        assert sorted(c.name for c in client.containers.created) == [
+            "sunnyagent-sandbox-large-1",
+            "sunnyagent-sandbox-standard-1",
+        ]
+
+    def test_get_pool_creates_one_pool_per_class(self):
+        """Test that each class gets its own lazily created pool and limits."""
+
+        async def scenario():
+            client = _FakeDockerClient()
+            with patch("backend.tools.container_pool.docker.from_env", return_value=client):
+                standard = await container_pool.get_pool()
+                large = await container_pool.get_pool("large")
+                again = await container_pool.get_pool("large")
+                with pytest.raises(KeyError):
+                    await container_pool.get_pool("unknown")
+                held = await large.acquire()
+                stats = container_pool.get_pool_stats()
+                await large.release(held)
+                await container_pool.shutdown_pool()
+            return standard, large, again, held, stats
+
+        standard, large, again, held, stats = asyncio.run(scenario())
+        assert large is again
+        assert standard is not large
+        assert held.container.run_kwargs["mem_limit"] == container_pool.LARGE_MEM_LIMIT
+        assert set(stats) == {"standard", "large"}
+        assert stats["large"]["min_size"] == 0
+        assert stats["large"]["acquire_wait"]["count"] == 1
+        assert stats["standard"]["acquire_wait"]["count"] == 0
+        assert container_pool.get_pool_stats() == {}
+
+    def test_concurrent_first_use_waits_for_initialization(self):
+        """Test that concurrent first callers share one pool and only get it initialized."""
+
+        async def scenario():
+            client = _FakeDockerClient()
+
+            async def get():
+                pool = await container_pool.get_pool("large")
+                return pool, pool.stats["initialized"]
+
+            with patch("backend.tools.container_pool.docker.from_env", return_value=client):
+                results = await asyncio.gather(get(), get(), get())
+                await container_pool.shutdown_pool()
+            return results
+
+        results = asyncio.run(scenario())
+        assert len({id(pool) for pool, _ in results}) == 1
+        assert all(initialized for _, initialized in results)
+
+    def test_failed_initialization_is_retried(self):
+        """Test that a pool whose initialization fails is not registered and is retried."""
+        state = {"fail": True}
+
+        def on_run():
+            if state["fail"]:
+                raise docker.errors.APIError("daemon unavailable")
+
+        async def scenario():
+            client = _FakeDockerClient(on_run)
+            with patch("backend.tools.container_pool.docker.from_env", return_value=client):
+                with pytest.raises(RuntimeError):
+                    await container_pool.get_pool()
+                stats_after_failure = container_pool.get_pool_stats()
+                state["fail"] = False
+                pool = await container_pool.get_pool()
+                initialized = pool.stats["initialized"]
+                await container_pool.shutdown_pool()
+            return stats_after_failure, initialized
+
+        stats_after_failure, initialized = asyncio.run(scenario())
+        assert stats_after_failure == {}
+        assert initialized
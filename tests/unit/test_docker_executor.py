@@ -0,0 +1,145 @@
+"""Unit tests for the dedicated Docker SDK executor."""
+
+import asyncio
+import threading
+
+import pytest
+
+from backend.tools.docker_executor import DockerExecutor
+from backend.tools.metrics import LatencyHistogram
+
+
+def _blocking(state: dict, lock: threading.Lock, gate: threading.Event):
+    def call():
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        gate.wait(5)
+        with lock:
+            state["active"] -= 1
+        return "ok"
+
+    return call
+
+
+class TestDockerExecutor:
+    """Tests for per-operation concurrency caps and statistics."""
+
+    def test_caps_concurrency_per_operation(self):
+        """Test that calls beyond an operation's limit wait without taking a thread."""
+        gate = threading.Event()
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+
+        async def scenario():
+            executor = DockerExecutor(op_limits={"exec": 2, "run": 1}, workers=8)
+            call = _blocking(state, lock, gate)
+            tasks = [asyncio.create_task(executor.run("exec", call)) for _ in range(5)]
+            await asyncio.sleep(0.1)
+            during = executor.stats["ops"]["exec"]
+            # Other operations are not blocked by a saturated one
+            other = await executor.run("run", lambda: "created")
+            gate.set()
+            results = await asyncio.gather(*tasks)
+            await asyncio.sleep(0.01)
+            after = executor.stats["ops"]["exec"]
+            executor.shutdown()
+            return during, other, results, after
+
+        during, other, results, after = asyncio.run(scenario())
+        assert state["peak"] == 2
+        assert during["in_flight"] == 2
+        assert during["waiting"] == 3
+        assert other == "created"
+        assert results == ["ok"] * 5
+        assert after["in_flight"] == 0
+        assert after["count"] == 5
+
+    def test_slot_held_until_cancelled_call_finishes(self):
+        """Test that cancelling the caller does not free the slot of a running call."""
+        gate = threading.Event()
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+
+        async def scenario():
+            executor = DockerExecutor(op_limits={"exec": 1}, workers=4)
+            call = _blocking(state, lock, gate)
+            first = asyncio.create_task(executor.run("exec", call))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            second = asyncio.create_task(executor.run("exec", call))
+            await asyncio.sleep(0.05)
+            waiting = executor.stats["ops"]["exec"]["waiting"]
+            gate.set()
+            result = await second
+            executor.shutdown()
+            return waiting, result
+
+        waiting, result = asyncio.run(scenario())
+        assert waiting == 1
+        assert result == "ok"
+        assert state["peak"] == 1
+
+    def test_cancelled_waiter_does_not_leak_slot(self):
+        """Test that a caller cancelled while queued gives up its place."""
+        gate = threading.Event()
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+
+        async def scenario():
+            executor = DockerExecutor(op_limits={"exec": 1}, workers=4)
+            running = asyncio.create_task(executor.run("exec", _blocking(state, lock, gate)))
+            await asyncio.sleep(0.05)
+            queued = asyncio.create_task(executor.run("exec", lambda: "never"))
+            await asyncio.sleep(0)
+            queued.cancel()
+            gate.set()
+            await running
+            result = await executor.run("exec", lambda: "next")
+            await asyncio.sleep(0.01)
+            stats = executor.stats["ops"]["exec"]
+            executor.shutdown()
+            return result, stats
+
+        result, stats = asyncio.run(scenario())
+        assert result == "next"
+        assert stats["in_flight"] == 0
+        assert stats["count"] == 2
+
+    def test_records_errors_and_rejects_unknown_operations(self):
+        """Test that failed calls are counted and unknown operations raise."""
+
+        def fail():
+            raise RuntimeError("daemon unavailable")
+
+        async def scenario():
+            executor = DockerExecutor(op_limits={"remove": 1}, workers=1)
+            with pytest.raises(RuntimeError):
+                await executor.run("remove", fail)
+            with pytest.raises(ValueError):
+                await executor.run("unknown", fail)
+            await asyncio.sleep(0.01)
+            stats = executor.stats["ops"]["remove"]
+            executor.shutdown()
+            return stats
+
+        stats = asyncio.run(scenario())
+        assert stats["errors"] == 1
+        assert stats["count"] == 1
+        assert stats["in_flight"] == 0
+
+
+class TestLatencyHistogram:
+    """Tests for the bucketed latency histogram."""
+
+    def test_buckets_and_quantiles(self):
+        """Test that observations land in the right buckets."""
+        histogram = LatencyHistogram(buckets=(10, 100, 1000))
+        for ms in (1, 5, 50, 500, 5000):
+            histogram.observe(ms)
+        snapshot = histogram.snapshot()
+        assert snapshot["buckets"] == {"<=10": 2, "<=100": 1, "<=1000": 1, "+Inf": 1}
+        assert snapshot["count"] == 5
+        assert snapshot["max_ms"] == 5000
+        assert histogram.quantile(0.5) == 100
+        assert histogram.quantile(0.99) == 5000
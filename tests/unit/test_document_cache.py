@@ -0,0 +1,105 @@
+"""Unit tests for the parsed-document cache."""
+
+from unittest.mock import patch
+
+from backend.tools import document_cache
+from backend.tools.document_cache import ROW_BLOCK, TEXT_CHUNK_CHARS, DocumentCache
+from backend.tools.document_parsers import extract_document
+
+
+def _document(text: str = "", pages=(), rows=()) -> dict:
+    return {
+        "kind": "docx",
+        "pages": list(pages),
+        "text": text,
+        "tables": [{"name": "Sheet1", "rows": [list(r) for r in rows]}] if rows else [],
+        "metadata": {},
+    }
+
+
+class TestDocumentCache:
+    """Tests for the in-memory index and on-disk data tiers."""
+
+    def test_disk_tier_survives_new_instance(self, tmp_path):
+        """Test that a fresh cache (e.g. after a restart) reads entries from disk."""
+        DocumentCache(tmp_path).put("abc", _document("parsed text", pages=["p1", "p2"]))
+        cache = DocumentCache(tmp_path)
+        assert cache.contains("abc")
+        stored = cache.get("abc")
+        assert stored.text(0, 100) == "parsed text"
+        assert stored.pages(0, 2) == ["p1", "p2"]
+        assert cache.get("abc") is stored
+        stats = cache.stats
+        assert stats["disk_hits"] == 1
+        assert stats["memory_hits"] == 1
+
+    def test_memory_tier_evicts_least_recently_used(self, tmp_path):
+        """Test that the memory tier stays under its byte budget."""
+        probe = DocumentCache(tmp_path / "probe")
+        probe.put("x", _document("x"))
+        size = probe.stats["memory_bytes"]
+        cache = DocumentCache(tmp_path, max_bytes=size * 2)
+        cache.put("a", _document("a"))
+        cache.put("b", _document("b"))
+        cache.get("a")
+        cache.put("c", _document("c"))
+        assert cache.stats["entries"] == 2
+        assert cache.stats["memory_bytes"] <= cache.max_bytes
+        # "b" was evicted from memory but is still on disk
+        assert cache.get("b").text(0, 10) == "b"
+        assert cache.stats["disk_hits"] == 1
+
+    def test_parser_version_invalidates_entries(self, tmp_path):
+        """Test that bumping the parser version ignores older results."""
+        DocumentCache(tmp_path).put("abc", _document("old format"))
+        with patch.object(document_cache, "PARSER_VERSION", document_cache.PARSER_VERSION + 1):
+            cache = DocumentCache(tmp_path)
+            assert not cache.contains("abc")
+            assert cache.get("abc") is None
+
+
+class TestStoredDocument:
+    """Tests for ranged reads through the index."""
+
+    def test_row_windows_seek_to_blocks(self, tmp_path):
+        """Test that row windows anywhere in a large table come back intact."""
+        rows = [[str(i), f"名称 {i}\twith tab", "line\nbreak"] for i in range(ROW_BLOCK * 3 + 7)]
+        stored = DocumentCache(tmp_path).put("abc", _document(rows=rows))
+        assert stored.tables == [{"name": "Sheet1", "rows": len(rows)}]
+        assert stored.rows(0, 0, 3) == rows[:3]
+        assert stored.rows(0, ROW_BLOCK - 2, ROW_BLOCK + 2) == rows[ROW_BLOCK - 2:ROW_BLOCK + 2]
+        assert stored.rows(0, ROW_BLOCK * 3 + 5, ROW_BLOCK * 4) == rows[-2:]
+        assert stored.rows(0, len(rows), len(rows) + 10) == []
+
+    def test_text_offsets_span_chunks(self, tmp_path):
+        """Test that character windows crossing chunk boundaries are exact."""
+        body = "".join(chr(0x4E00 + i % 500) for i in range(TEXT_CHUNK_CHARS * 2 + 100))
+        stored = DocumentCache(tmp_path).put("abc", _document(body))
+        assert stored.text_chars == len(body)
+        start = TEXT_CHUNK_CHARS - 10
+        assert stored.text(start, 30) == body[start:start + 30]
+        assert stored.text(len(body) - 5, 100) == body[-5:]
+        assert stored.text(len(body), 10) == ""
+
+    def test_sheet_rows_stream_into_cache(self, tmp_path):
+        """Test that xlsx rows are read lazily and written as they arrive."""
+        from openpyxl import Workbook
+
+        wb = Workbook()
+        wb.active.title = "Data"
+        for i in range(ROW_BLOCK + 5):
+            wb.active.append([i, f"row {i}"])
+        wb.active.append([None, None])  # Empty rows are skipped
+        wb.create_sheet("Notes").append(["note"])
+        path = tmp_path / "book.xlsx"
+        wb.save(path)
+
+        document = extract_document(str(path))
+        assert not isinstance(document["tables"], list)
+        stored = DocumentCache(tmp_path / ".parsed").put("abc", document)
+        assert stored.tables == [{"name": "Data", "rows": ROW_BLOCK + 5}, {"name": "Notes", "rows": 1}]
+        assert stored.rows(0, ROW_BLOCK, ROW_BLOCK + 2) == [
+            [str(i), f"row {i}"] for i in (ROW_BLOCK, ROW_BLOCK + 1)
+        ]
+        assert stored.rows(1, 0, 1) == [["note"]]
+        assert stored.metadata == {"sheets": ["Data", "Notes"]}
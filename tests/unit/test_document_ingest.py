@@ -0,0 +1,318 @@
+"""Unit tests for background document ingestion and read_uploaded_file."""
+
+import asyncio
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from backend.tools import document_cache, document_ingest
+from backend.tools.document_cache import DocumentCache, StoredDocument
+from backend.tools.document_ingest import (
+    IngestionManager,
+    ParserBusyError,
+    ParserPool,
+    ParseTimeoutError,
+)
+from backend.tools.file_tools import MAX_TEXT_SIZE, read_uploaded_file, render_document
+
+
+def _sleepy_parse(path: str, *cache_args) -> dict:
+    """Parser stand-in (runs in the spawned worker): files named slow* never finish in time."""
+    if Path(path).name.startswith("slow"):
+        time.sleep(60)
+    return {"kind": "docx", "pages": [Path(path).name], "tables": [], "metadata": {}}
+
+
+def _read(args: dict) -> str:
+    return asyncio.run(read_uploaded_file.ainvoke(args))
+
+
+def _wait_until(predicate, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.02)
+
+
+@pytest.fixture(scope="module")
+def manager():
+    """A single-worker ingestion pool shared by the tests in this module."""
+    manager = IngestionManager(workers=1)
+    yield manager
+    manager.shutdown()
+
+
+@pytest.fixture(scope="module")
+def pool():
+    """A single-worker parser pool running the stand-in parser."""
+    pool = ParserPool(workers=1, timeout=30, max_queue=1, fn=_sleepy_parse)
+    # Spawn the worker before timing anything
+    assert pool.submit("warm.docx").result(60)["pages"] == ["warm.docx"]
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture
+def uploads(tmp_path, manager):
+    """Point uploads, the document cache and the ingestion pool at test instances."""
+    cache = DocumentCache(tmp_path / ".parsed")
+    with patch("backend.tools.file_tools.UPLOAD_DIR", tmp_path), \
+            patch.object(document_cache, "_cache", cache), \
+            patch.object(document_ingest, "_manager", manager):
+        yield tmp_path
+
+
+def _upload_docx(root, file_id: str, paragraphs: list[str], table=None):
+    from docx import Document
+
+    (root / file_id).mkdir()
+    doc = Document()
+    for text in paragraphs:
+        doc.add_paragraph(text)
+    if table:
+        grid = doc.add_table(rows=len(table), cols=len(table[0]))
+        for r, row in enumerate(table):
+            for c, value in enumerate(row):
+                grid.cell(r, c).text = value
+    path = root / file_id / "report.docx"
+    doc.save(str(path))
+    return path
+
+
+class TestIngestionManager:
+    """Tests for submitting uploads to the parsing process pool."""
+
+    def test_upload_is_parsed_once(self, uploads, manager):
+        """Test that ingestion results are reused by later submits and reads."""
+        path = _upload_docx(uploads, "abc123", ["Quarterly report"], table=[["Region", "Sales"], ["East", "10"]])
+        submitted = manager.stats["submitted"]
+
+        assert manager.submit(path) == {"status": "pending"}
+        document = manager.load(path)
+        assert manager.submit(path) == {"status": "ready"}
+
+        assert document.kind == "docx"
+        assert document.tables == [{"name": "Table 1", "rows": 2}]
+        assert document.rows(0, 0, 2) == [["Region", "Sales"], ["East", "10"]]
+        assert _read({"file_id": "abc123"}) == (
+            "Quarterly report\n\n=== Table 1 ===\n\nRegion\tSales\nEast\t10"
+        )
+        assert manager.stats["submitted"] == submitted + 1
+
+    def test_parser_process_writes_cache(self, uploads, manager):
+        """Test that the parser process writes the cache and only sends back the index."""
+        path = _upload_docx(uploads, "abc123", ["Body"], table=[["Region", "Sales"], ["East", "10"]])
+        cache = document_cache.get_document_cache()
+        index = manager._parser.submit(str(path), "digest1", str(cache.directory)).result(60)
+
+        assert index["tables"] == [{"name": "Table 1", "rows": 2, "blocks": [index["tables"][0]["blocks"][0]]}]
+        assert "Region" not in repr(index)
+        assert cache.contains("digest1")
+        assert cache.get("digest1").rows(0, 1, 2) == [["East", "10"]]
+
+    def test_identical_content_shares_job(self, uploads, manager):
+        """Test that re-uploading the same bytes does not parse again."""
+        path = _upload_docx(uploads, "abc123", ["Shared"])
+        (uploads / "def456").mkdir()
+        (uploads / "def456" / "copy.docx").write_bytes(path.read_bytes())
+        submitted = manager.stats["submitted"]
+
+        manager.submit(path)
+        assert manager.submit(uploads / "def456" / "copy.docx")["status"] in ("pending", "ready")
+        assert _read({"file_id": "def456"}) == "Shared"
+        assert manager.stats["submitted"] == submitted + 1
+
+    def test_failures_are_recorded(self, uploads, manager):
+        """Test that a broken document reports its error without being re-parsed."""
+        (uploads / "abc123").mkdir()
+        path = uploads / "abc123" / "broken.docx"
+        path.write_bytes(b"not a zip file")
+        submitted = manager.stats["submitted"]
+
+        first = _read({"file_id": "abc123"})
+        second = _read({"file_id": "abc123"})
+        status = manager.submit(path)
+
+        assert first.startswith("读取 Word 文件失败：")
+        assert second == first
+        assert status["status"] == "failed"
+        assert status["error"]
+        assert manager.stats["submitted"] == submitted + 1
+
+    def test_text_files_are_not_parsed(self, uploads, manager):
+        """Test that plain text uploads skip the process pool."""
+        (uploads / "abc123").mkdir()
+        path = uploads / "abc123" / "notes.md"
+        path.write_text("# Notes", encoding="utf-8")
+        assert manager.submit(path) == {"status": "not_required"}
+        assert _read({"file_id": "abc123"}) == "# Notes"
+
+
+class TestParserPool:
+    """Tests for per-file timeouts, cancellation and the queue bound."""
+
+    def test_timeout_kills_worker(self, pool):
+        """Test that an overdue parse fails and the next file gets a fresh worker."""
+        spawned = pool.stats["spawned"]
+        pool.timeout = 0.5
+        try:
+            with pytest.raises(ParseTimeoutError):
+                pool.submit("slow.pdf").result(30)
+        finally:
+            pool.timeout = 30
+        assert pool.submit("next.pdf").result(60)["pages"] == ["next.pdf"]
+        assert pool.stats["timeouts"] == 1
+        assert pool.stats["spawned"] == spawned + 1
+
+    def test_cancel_running_parse(self, pool):
+        """Test that cancelling a running parse frees the worker slot."""
+        cancelled = pool.stats["cancelled"]
+        future = pool.submit("slow.pdf")
+        _wait_until(lambda: pool.stats["running"] == 1)
+        assert future.cancel()
+        assert pool.submit("after.pdf").result(60)["pages"] == ["after.pdf"]
+        assert pool.stats["cancelled"] == cancelled + 1
+
+    def test_queue_is_bounded(self, pool):
+        """Test that submissions beyond max_queue are rejected."""
+        running = pool.submit("slow-1.pdf")
+        _wait_until(lambda: pool.stats["running"] == 1)
+        queued = pool.submit("slow-2.pdf")
+        with pytest.raises(ParserBusyError):
+            pool.submit("slow-3.pdf")
+        queued.cancel()
+        running.cancel()
+        assert pool.submit("after.pdf").result(60)["pages"] == ["after.pdf"]
+
+
+class TestAsyncLoad:
+    """Tests for cancelling async reads."""
+
+    @pytest.fixture
+    def sleepy(self, uploads):
+        manager = IngestionManager(workers=1)
+        manager._parser = ParserPool(workers=1, fn=_sleepy_parse)
+        (uploads / "abc123").mkdir()
+        path = uploads / "abc123" / "slow.pdf"
+        path.write_bytes(b"%PDF-1.4 stand-in")
+        yield manager, path
+        manager.shutdown()
+
+    def _cancel_read(self, manager, path):
+        async def scenario():
+            task = asyncio.create_task(manager.aload(path))
+            await asyncio.to_thread(_wait_until, lambda: manager.stats["parser"]["running"] == 1, 60)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(scenario())
+
+    def test_abandoned_read_cancels_parse(self, sleepy):
+        """Test that the parse stops once its only reader is cancelled."""
+        manager, path = sleepy
+        self._cancel_read(manager, path)
+        _wait_until(lambda: manager.stats["parser"]["cancelled"] == 1)
+        assert manager.stats["abandoned"] == 1
+        assert manager.stats["in_flight"] == 0
+
+    def test_upload_parse_survives_cancelled_read(self, sleepy):
+        """Test that a parse submitted at upload keeps running without readers."""
+        manager, path = sleepy
+        assert manager.submit(path) == {"status": "pending"}
+        self._cancel_read(manager, path)
+        assert manager.stats["abandoned"] == 0
+        assert manager.submit(path) == {"status": "pending"}
+
+
+def _stored(tmp_path, **document) -> StoredDocument:
+    document = {"pages": [], "text": "", "tables": [], "metadata": {}, **document}
+    return DocumentCache(tmp_path).put("abc", document)
+
+
+class TestRenderDocument:
+    """Tests for rendering stored documents into tool output, by range."""
+
+    def test_pdf_pages_are_paged(self, tmp_path):
+        """Test that PDFs show MAX_PDF_PAGES pages per call and point to the next range."""
+        document = _stored(tmp_path, kind="pdf", pages=[f"text {i}" for i in range(1, 46)])
+        first = render_document(document)
+        assert first.startswith("[Page 1]\ntext 1\n\n[Page 2]\ntext 2")
+        assert "[Page 21]" not in first
+        assert first.endswith('[... 仅显示第 1-20 页，原文件共 45 页；使用 pages="21-40" 继续读取 ...]')
+
+        last = render_document(document, pages="41-60")
+        assert last.startswith("[Page 41]\ntext 41")
+        assert last.endswith("[Page 45]\ntext 45")
+        assert render_document(document, pages="7") == "[Page 7]\ntext 7\n\n" + (
+            '[... 仅显示第 7-7 页，原文件共 45 页；使用 pages="8-27" 继续读取 ...]'
+        )
+        with pytest.raises(ValueError):
+            render_document(document, pages="50-60")
+        with pytest.raises(ValueError):
+            render_document(document, pages="abc")
+
+    def test_sheet_rows_are_windowed(self, tmp_path):
+        """Test that sheets show MAX_EXCEL_ROWS rows from start_row onwards."""
+        rows = [[str(i), "x"] for i in range(1, 1201)]
+        document = _stored(tmp_path, kind="xlsx", tables=[{"name": "Data", "rows": rows}, {"name": "Notes", "rows": [["n"]]}])
+        first = render_document(document)
+        assert first.startswith("=== Sheet: Data ===\n\n1\tx\n")
+        assert "500\tx\n\n[... 仅显示第 1-500 行，共 1200 行；" in first
+        assert first.endswith("=== Sheet: Notes ===\n\nn")
+
+        window = render_document(document, sheet="Data", start_row=1001)
+        assert window.startswith("=== Sheet: Data ===\n\n1001\tx\n")
+        assert window.endswith("1200\tx")
+        assert "Notes" not in window
+        with pytest.raises(ValueError):
+            render_document(document, sheet="Missing")
+        with pytest.raises(ValueError):
+            render_document(document, sheet="Data", start_row=5000)
+
+    def test_docx_body_offsets_then_tables(self, tmp_path):
+        """Test that the Word body is read by character offset before its tables."""
+        body = "段落" * 30000
+        document = _stored(tmp_path, kind="docx", text=body, tables=[{"name": "Table 1", "rows": [["a", "b"]]}])
+        first = render_document(document)
+        assert first.startswith(body[:MAX_TEXT_SIZE])
+        assert first.endswith(f"正文共 {len(body)} 字符；使用 offset={MAX_TEXT_SIZE} 继续读取 ...]")
+        assert "Table 1" not in first
+
+        rest = render_document(document, offset=MAX_TEXT_SIZE)
+        assert rest == body[MAX_TEXT_SIZE:] + "\n\n=== Table 1 ===\n\na\tb"
+        assert render_document(document, sheet="Table 1") == "=== Table 1 ===\n\na\tb"
+
+    def test_slides_are_labelled(self, tmp_path):
+        """Test that slides keep their [Slide N] labels, including empty ones."""
+        document = _stored(tmp_path, kind="pptx", pages=["Title\nSubtitle", ""])
+        assert render_document(document) == "[Slide 1]\nTitle\nSubtitle\n\n[Slide 2]"
+
+
+class TestTextOffsets:
+    """Tests for byte-offset reads of plain text uploads."""
+
+    def test_pages_through_multibyte_text(self, uploads):
+        """Test that following the offset hints reassembles the file exactly."""
+        text = "".join(f"第{i}行，数据\n" for i in range(12000))
+        (uploads / "abc123").mkdir()
+        (uploads / "abc123" / "log.txt").write_text(text, encoding="utf-8")
+
+        chunks, offset = [], 0
+        while True:
+            result = _read({"file_id": "abc123", "offset": offset})
+            content, marker, hint = result.partition("\n\n[... 仅显示第 ")
+            chunks.append(content)
+            if not marker:
+                break
+            offset = int(hint.split("使用 offset=")[1].split(" ")[0])
+        assert len(chunks) > 1
+        assert "".join(chunks) == text
+
+    def test_offset_inside_character_is_realigned(self, uploads):
+        """Test that an offset in the middle of a UTF-8 character skips to the next one."""
+        (uploads / "abc123").mkdir()
+        (uploads / "abc123" / "notes.txt").write_text("中文abc", encoding="utf-8")
+        assert _read({"file_id": "abc123", "offset": 1}) == "文abc"
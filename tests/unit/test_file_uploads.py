@@ -0,0 +1,201 @@
+"""Unit tests for streamed and resumable file uploads."""
+
+import asyncio
+import hashlib
+import io
+import os
+import time
+
+import pytest
+from fastapi import UploadFile
+
+from backend.files.uploads import (
+    UploadOffsetError,
+    UploadSessionManager,
+    UploadSessionNotFoundError,
+    UploadTooLargeError,
+    limit_stream,
+    save_upload,
+)
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    """Point the upload directory at a temporary path."""
+    monkeypatch.setattr("backend.files.uploads.UPLOAD_DIR", tmp_path)
+    return tmp_path
+
+
+async def _chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+def _upload(content: bytes, filename: str) -> UploadFile:
+    return UploadFile(io.BytesIO(content), filename=filename)
+
+
+async def _broken(*parts: bytes):
+    """A request body whose connection drops after ``parts``."""
+    for part in parts:
+        yield part
+    raise ConnectionResetError("client went away")
+
+
+class TestSaveUpload:
+    """Tests for single-request uploads."""
+
+    def test_streams_file_and_digest(self, uploads):
+        """Test that the file lands under a new file ID with its SHA-256."""
+        content = os.urandom(3 * 1024 * 1024 + 17)
+        upload = UploadFile(io.BytesIO(content), filename="../../report.pdf")
+        stored = asyncio.run(save_upload(upload, "u1"))
+        assert stored.path == uploads / stored.file_id / "report.pdf"
+        assert stored.path.read_bytes() == content
+        assert stored.size == len(content)
+        assert stored.sha256 == hashlib.sha256(content).hexdigest()
+        assert not stored.deduplicated
+
+    def test_identical_content_is_stored_once(self, uploads):
+        """Test that a repeated upload gets its own file ID but shares storage."""
+        first = asyncio.run(save_upload(_upload(b"same bytes", "a.txt"), "u1"))
+        second = asyncio.run(save_upload(_upload(b"same bytes", "b.txt"), "u1"))
+        other = asyncio.run(save_upload(_upload(b"other bytes", "c.txt"), "u1"))
+        assert second.deduplicated and not other.deduplicated
+        assert first.file_id != second.file_id
+        assert second.path.read_bytes() == b"same bytes"
+        assert first.path.stat().st_ino == second.path.stat().st_ino
+        assert other.path.stat().st_ino != first.path.stat().st_ino
+
+    def test_dedup_is_per_owner(self, uploads):
+        """Test that the same content uploaded by another user is stored separately."""
+        mine = asyncio.run(save_upload(_upload(b"secret", "a.txt"), "u1"))
+        theirs = asyncio.run(save_upload(_upload(b"secret", "b.txt"), "u2"))
+        assert not theirs.deduplicated
+        assert mine.path.stat().st_ino != theirs.path.stat().st_ino
+
+    def test_unreferenced_blobs_are_removed(self, uploads):
+        """Test that a blob is deleted once no upload links to it."""
+        stored = asyncio.run(save_upload(_upload(b"old content", "a.txt"), "u1"))
+        blob = uploads / ".blobs" / "u1" / stored.sha256
+        assert blob.stat().st_nlink == 2
+        stored.path.unlink()
+        asyncio.run(save_upload(_upload(b"new content", "b.txt"), "u1"))
+        assert not blob.exists()
+
+    def test_oversized_file_is_discarded(self, uploads):
+        """Test that a file over the limit is rejected and nothing is left behind."""
+        upload = UploadFile(io.BytesIO(b"x" * 3 * 1024 * 1024), filename="big.txt")
+        with pytest.raises(UploadTooLargeError):
+            asyncio.run(save_upload(upload, "u1", max_bytes=2 * 1024 * 1024))
+        assert list(uploads.iterdir()) == []
+
+    def test_request_stream_is_capped(self):
+        """Test that a body without Content-Length is cut off once it passes the limit."""
+
+        async def run():
+            received = []
+            with pytest.raises(UploadTooLargeError):
+                async for chunk in limit_stream(_chunks(b"a" * 600, b"b" * 600), 1000):
+                    received.append(chunk)
+            return received
+
+        assert asyncio.run(run()) == [b"a" * 600]
+
+
+class TestUploadSessions:
+    """Tests for resumable chunked uploads."""
+
+    def test_chunks_assemble_into_file(self, uploads):
+        """Test that the upload completes on the last chunk with the full digest."""
+        content = os.urandom(10_000)
+        manager = UploadSessionManager(uploads / ".partial")
+
+        async def run():
+            session = await manager.create("u1", "data.csv", len(content), "text/csv")
+            assert await manager.append(session, 0, _chunks(content[:4000])) is None
+            assert session.to_dict()["offset"] == 4000
+            return await manager.append(session, 4000, _chunks(content[4000:7000], content[7000:]))
+
+        stored = asyncio.run(run())
+        assert stored.path == uploads / stored.file_id / "data.csv"
+        assert stored.path.read_bytes() == content
+        assert stored.sha256 == hashlib.sha256(content).hexdigest()
+        assert list((uploads / ".partial").iterdir()) == []
+
+    def test_dropped_connection_resumes_from_received_offset(self, uploads):
+        """Test that bytes received before a disconnect are kept for the retry."""
+        content = os.urandom(9_000)
+        manager = UploadSessionManager(uploads / ".partial")
+
+        async def run():
+            session = await manager.create("u1", "data.txt", len(content))
+            with pytest.raises(ConnectionResetError):
+                await manager.append(session, 0, _broken(content[:3000], content[3000:5000]))
+            offset = (await manager.get(session.upload_id, "u1")).received
+            assert offset == 5000
+            # Retrying the lost chunk from its original offset is refused
+            with pytest.raises(UploadOffsetError) as excinfo:
+                await manager.append(session, 0, _chunks(content))
+            assert excinfo.value.expected == 5000
+            return await manager.append(session, offset, _chunks(content[offset:]))
+
+        stored = asyncio.run(run())
+        assert stored.path.read_bytes() == content
+        assert stored.sha256 == hashlib.sha256(content).hexdigest()
+
+    def test_session_survives_restart(self, uploads):
+        """Test that a new manager (e.g. after a restart) restores and rehashes the partial file."""
+        content = os.urandom(6_000)
+
+        async def start():
+            manager = UploadSessionManager(uploads / ".partial")
+            session = await manager.create("u1", "deck.pptx", len(content))
+            await manager.append(session, 0, _chunks(content[:2500]))
+            return session.upload_id
+
+        upload_id = asyncio.run(start())
+
+        async def resume():
+            manager = UploadSessionManager(uploads / ".partial")
+            with pytest.raises(UploadSessionNotFoundError):
+                await manager.get(upload_id, "someone-else")
+            session = await manager.get(upload_id, "u1")
+            assert session.received == 2500
+            return await manager.append(session, 2500, _chunks(content[2500:]))
+
+        stored = asyncio.run(resume())
+        assert stored.path.name == "deck.pptx"
+        assert stored.path.stat().st_nlink == 2  # Registered as a blob for dedup
+        assert stored.sha256 == hashlib.sha256(content).hexdigest()
+
+    def test_size_limits(self, uploads):
+        """Test that oversized uploads are refused up front and past the declared size."""
+        manager = UploadSessionManager(uploads / ".partial", max_bytes=1000)
+
+        async def run():
+            with pytest.raises(UploadTooLargeError):
+                await manager.create("u1", "big.pdf", 1001)
+            session = await manager.create("u1", "small.pdf", 100)
+            with pytest.raises(UploadTooLargeError):
+                await manager.append(session, 0, _chunks(b"a" * 60, b"b" * 60))
+            # The chunk that fit was written; the one past the declared size was not
+            assert session.received == 60
+
+        asyncio.run(run())
+
+    def test_idle_sessions_expire(self, uploads):
+        """Test that partial uploads idle past the TTL are swept."""
+        manager = UploadSessionManager(uploads / ".partial", ttl=60)
+
+        async def run():
+            stale = await manager.create("u1", "old.txt", 10)
+            old = time.time() - 120
+            for path in (uploads / ".partial").glob(f"{stale.upload_id}.*"):
+                os.utime(path, (old, old))
+            await manager.create("u1", "new.txt", 10)
+            with pytest.raises(UploadSessionNotFoundError):
+                await manager.get(stale.upload_id, "u1")
+
+        asyncio.run(run())
+        assert len(list((uploads / ".partial").glob("*.json"))) == 1
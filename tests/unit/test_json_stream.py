@@ -0,0 +1,63 @@
+"""Unit tests for the incremental tool-call argument parser."""
+
+import json
+
+from backend.json_stream import IncrementalJSONParser
+
+
+def _feed_all(fragments: list[str]) -> IncrementalJSONParser:
+    parser = IncrementalJSONParser()
+    for fragment in fragments:
+        parser.feed(fragment)
+    return parser
+
+
+class TestIncrementalJSONParser:
+    """Tests for IncrementalJSONParser."""
+
+    def test_completes_only_on_final_fragment(self):
+        """Test that completion is signalled exactly when the object closes."""
+        text = json.dumps({"code": "print('{[}]')", "n": [1, {"a": 2}]})
+        parser = IncrementalJSONParser()
+        results = [parser.feed(ch) for ch in text]
+        assert results[-1] is True
+        assert not any(results[:-1])
+        assert parser.value == json.loads(text)
+
+    def test_escape_split_across_fragments(self):
+        """Test that an escaped quote split over two fragments is handled."""
+        parser = _feed_all(['{"code": "say \\', '"hi\\', '"', '"}'])
+        assert parser.complete
+        assert parser.value == {"code": 'say "hi"'}
+
+    def test_unicode_and_whitespace_prefix(self):
+        """Test leading whitespace and non-ASCII content."""
+        parser = _feed_all(["  \n", '{"标题": "季度', '报告"}'])
+        assert parser.complete
+        assert parser.value == {"标题": "季度报告"}
+
+    def test_incomplete_document(self):
+        """Test that a partial document is not reported complete."""
+        parser = _feed_all(['{"code": "x = 1', '"'])
+        assert not parser.complete
+        assert parser.value is None
+
+    def test_invalid_closed_document_fails(self):
+        """Test that a closed but invalid document is marked failed."""
+        parser = _feed_all(['{"a": 1,', "}"])
+        assert parser.failed
+        assert not parser.complete
+        # Further input is ignored
+        assert parser.feed('{"a": 1}') is False
+
+    def test_scalar_falls_back_to_decode(self):
+        """Test that bare scalars are decoded when they parse."""
+        parser = _feed_all(["tr", "ue"])
+        assert parser.complete
+        assert parser.value is True
+
+    def test_ignores_fragments_after_completion(self):
+        """Test that trailing fragments do not change the value."""
+        parser = _feed_all(['{"a": 1}', ' {"b": 2}'])
+        assert parser.value == {"a": 1}
+        assert parser.text == '{"a": 1}'
@@ -0,0 +1,95 @@
+"""Unit tests for offloaded password hashing."""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException, Response
+
+from backend.auth import router, security
+from backend.auth.models import LoginRequest, UserCreate, UserRole
+from backend.auth.security import PasswordHasherBusyError, PasswordHashPool
+
+
+class TestPasswordHashPool:
+    """Tests for PasswordHashPool and the async hashing helpers."""
+
+    def test_hash_and_verify_round_trip(self):
+        """Test that async hashing and verification agree with bcrypt."""
+
+        async def scenario():
+            hashed = await security.hash_password_async("s3cret")
+            return (
+                await security.verify_password_async("s3cret", hashed),
+                await security.verify_password_async("wrong", hashed),
+            )
+
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(security, "BCRYPT_ROUNDS", 4)
+            assert asyncio.run(scenario()) == (True, False)
+
+    def test_work_runs_off_the_event_loop_thread(self):
+        """Test that jobs execute on a pool thread."""
+
+        async def scenario():
+            pool = PasswordHashPool(workers=1, max_queue=1)
+            return await pool.run(threading.get_ident), threading.get_ident()
+
+        worker_thread, loop_thread = asyncio.run(scenario())
+        assert worker_thread != loop_thread
+
+    def test_rejects_when_queue_is_full(self):
+        """Test that jobs beyond workers + max_queue are rejected."""
+
+        async def scenario():
+            pool = PasswordHashPool(workers=1, max_queue=1)
+            release = threading.Event()
+            jobs = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+            await asyncio.sleep(0)
+            with pytest.raises(PasswordHasherBusyError):
+                await pool.run(release.wait)
+            stats = pool.stats
+            release.set()
+            await asyncio.gather(*jobs)
+            return stats, pool.stats
+
+        busy, idle = asyncio.run(scenario())
+        assert busy["in_flight"] == 1
+        assert busy["queued"] == 1
+        assert busy["rejected"] == 1
+        assert idle["completed"] == 2
+        assert idle["queued"] == 0
+
+
+class TestHasherBusyResponses:
+    """Tests for the 503 returned by endpoints that hash passwords."""
+
+    @staticmethod
+    async def _busy(*args, **kwargs):
+        raise PasswordHasherBusyError("Password hashing queue is full")
+
+    @staticmethod
+    async def _value(value):
+        return value
+
+    def test_login_returns_503_with_retry_after(self, monkeypatch):
+        """Test that login maps a full hashing queue to 503 + Retry-After."""
+        monkeypatch.setattr(
+            router, "get_user_by_username",
+            lambda username: self._value({"password_hash": "x"}),
+        )
+        monkeypatch.setattr(router, "verify_password_async", self._busy)
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(router.login(LoginRequest(username="alice", password="pw"), Response()))
+        assert excinfo.value.status_code == 503
+        assert excinfo.value.headers == {"Retry-After": str(router.HASHER_RETRY_AFTER)}
+
+    def test_create_user_returns_503_with_retry_after(self, monkeypatch):
+        """Test that admin user creation maps a full hashing queue to 503 + Retry-After."""
+        monkeypatch.setattr(router, "user_exists", lambda username: self._value(False))
+        monkeypatch.setattr(router, "create_user", self._busy)
+        user = UserCreate(username="bob", password="secret123", role=UserRole.USER)
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(router.create_new_user(user, admin=None))
+        assert excinfo.value.status_code == 503
+        assert excinfo.value.headers == {"Retry-After": str(router.HASHER_RETRY_AFTER)}
@@ -0,0 +1,82 @@
+"""Unit tests for streaming files out of sandbox containers."""
+
+import asyncio
+import io
+import tarfile
+from unittest.mock import patch
+
+import pytest
+
+from backend.tools.sandbox import execute_python_with_file, extract_archive_file, output_path
+
+
+def _archive(members: dict[str, bytes], directories: tuple[str, ...] = ()) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        for name in directories:
+            info = tarfile.TarInfo(name)
+            info.type = tarfile.DIRTYPE
+            tar.addfile(info)
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+def _chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+class TestExtractArchiveFile:
+    """Tests for extract_archive_file."""
+
+    def test_writes_file_from_small_chunks(self, tmp_path):
+        """Test that a file split across many chunks is reassembled on disk."""
+        content = bytes(range(256)) * 1000
+        dest = tmp_path / "report.pptx"
+        assert extract_archive_file(_chunks(_archive({"report.pptx": content}), 777), str(dest))
+        assert dest.read_bytes() == content
+
+    def test_ignores_member_paths(self, tmp_path):
+        """Test that member names cannot write outside the destination."""
+        dest = tmp_path / "out" / "file.txt"
+        dest.parent.mkdir()
+        archive = _archive({"../escape.txt": b"data"}, directories=("dir",))
+        assert extract_archive_file([archive], str(dest))
+        assert dest.read_bytes() == b"data"
+        assert not (tmp_path / "escape.txt").exists()
+
+    def test_reports_archive_without_files(self, tmp_path):
+        """Test that an archive holding only a directory extracts nothing."""
+        dest = tmp_path / "file.txt"
+        assert not extract_archive_file([_archive({}, directories=("output",))], str(dest))
+        assert not dest.exists()
+
+
+class TestOutputPath:
+    """Tests for validating the model-supplied output filename."""
+
+    def test_plain_name_stays_in_output_dir(self, tmp_path):
+        """Test that a bare filename resolves inside the output directory."""
+        assert output_path(str(tmp_path), "report.pptx") == str(tmp_path.resolve() / "report.pptx")
+
+    @pytest.mark.parametrize(
+        "name", ["", ".", "..", "../../../etc/x", "sub/report.pptx", "/etc/passwd"]
+    )
+    def test_rejects_traversal_and_directories(self, tmp_path, name):
+        """Test that empty, dot and path-like names are refused."""
+        with pytest.raises(ValueError):
+            output_path(str(tmp_path), name)
+
+    def test_tool_rejects_traversal_before_acquiring(self, tmp_path):
+        """Test that a traversal filename never reaches the container or the host disk."""
+        with patch("backend.tools.sandbox.TEMP_DIR", str(tmp_path)), \
+                patch("backend.tools.sandbox._acquire") as acquire:
+            result = asyncio.run(execute_python_with_file.ainvoke(
+                {"code": "pass", "output_filename": "../../../etc/x"}
+            ))
+        assert "无效的输出文件名" in result
+        acquire.assert_not_called()
+        assert list(tmp_path.iterdir()) == []
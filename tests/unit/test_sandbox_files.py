@@ -0,0 +1,97 @@
+"""Unit tests for copying uploaded files into sandbox containers."""
+
+import asyncio
+import tarfile
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from backend.tools.container_pool import PooledContainer
+from backend.tools.sandbox_files import UploadNotFoundError, inject_uploads
+
+
+class _FakeContainer:
+    id = "c" * 64
+
+    def __init__(self):
+        self.archives: list[dict[str, bytes]] = []
+        self.on_disk: list[bool] = []
+        self.commands: list[list[str]] = []
+
+    def put_archive(self, path, data):
+        assert path == "/"
+        # The archive arrives as a file object, not an in-memory bytes blob
+        self.on_disk.append(data._rolled)
+        with tarfile.open(fileobj=data) as tar:
+            self.archives.append({
+                m.name: tar.extractfile(m).read() for m in tar.getmembers() if m.isfile()
+            })
+        return True
+
+    def exec_run(self, cmd, **kwargs):
+        self.commands.append(cmd)
+        return SimpleNamespace(exit_code=0, output=b"")
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    """Point the upload directory at a temporary path."""
+    with patch("backend.tools.sandbox_files.UPLOAD_DIR", tmp_path):
+        yield tmp_path
+
+
+def _upload(root, file_id: str, name: str, data: bytes):
+    (root / file_id).mkdir(exist_ok=True)
+    (root / file_id / name).write_bytes(data)
+
+
+def _inject(pooled, file_ids, owner="u1"):
+    return asyncio.run(inject_uploads(pooled, file_ids, owner))
+
+
+class TestInjectUploads:
+    """Tests for inject_uploads."""
+
+    def test_copies_files_to_input(self, uploads):
+        """Test that uploads land at /input/{file_id}/{name}."""
+        _upload(uploads, "abc123", "sales.csv", b"a,b\n1,2\n")
+        pooled = PooledContainer(container=_FakeContainer())
+        paths = _inject(pooled, ["abc123"])
+        assert paths == {"abc123": "/input/abc123/sales.csv"}
+        assert pooled.container.archives == [{"input/abc123/sales.csv": b"a,b\n1,2\n"}]
+
+    def test_skips_files_already_in_container(self, uploads):
+        """Test that unchanged files are not copied again."""
+        _upload(uploads, "abc123", "sales.csv", b"v1")
+        pooled = PooledContainer(container=_FakeContainer())
+        _inject(pooled, ["abc123"])
+        _inject(pooled, ["abc123", "abc123"])
+        assert len(pooled.container.archives) == 1
+
+    def test_clears_other_users_files(self, uploads):
+        """Test that a container reused by another user drops earlier inputs."""
+        _upload(uploads, "abc123", "sales.csv", b"v1")
+        pooled = PooledContainer(container=_FakeContainer())
+        _inject(pooled, ["abc123"], owner="u1")
+        assert _inject(pooled, None, owner="u2") == {}
+        assert pooled.container.commands == [["rm", "-rf", "/input"]]
+        assert pooled.files == {}
+
+    def test_rejects_unknown_or_unsafe_ids(self, uploads):
+        """Test that missing ids and path-like ids raise UploadNotFoundError."""
+        pooled = PooledContainer(container=_FakeContainer())
+        for file_id in ("missing1", "../etc"):
+            with pytest.raises(UploadNotFoundError):
+                _inject(pooled, [file_id])
+
+    def test_large_archives_spool_to_disk(self, uploads):
+        """Test that archives over the spool threshold are not kept in memory."""
+        _upload(uploads, "small1", "a.csv", b"a" * 100)
+        _upload(uploads, "large1", "b.csv", b"b" * 64 * 1024)
+        pooled = PooledContainer(container=_FakeContainer())
+        with patch("backend.tools.sandbox_files.ARCHIVE_SPOOL_BYTES", 32 * 1024):
+            _inject(pooled, ["small1"])
+            _inject(pooled, ["large1"])
+        assert pooled.container.on_disk == [False, True]
+        assert pooled.container.archives[1] == {"input/large1/b.csv": b"b" * 64 * 1024}
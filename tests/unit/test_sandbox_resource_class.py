@@ -0,0 +1,45 @@
+"""Unit tests for choosing a sandbox resource class."""
+
+from unittest.mock import patch
+
+import pytest
+
+from backend.tools.sandbox import _resource_class
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    """Point the upload directory at a temporary path."""
+    with patch("backend.tools.sandbox_files.UPLOAD_DIR", tmp_path):
+        yield tmp_path
+
+
+def _upload(root, file_id: str, size: int) -> None:
+    (root / file_id).mkdir()
+    (root / file_id / "data.csv").write_bytes(b"x" * size)
+
+
+class TestResourceClass:
+    """Tests for the resource class argument and the input-size heuristic."""
+
+    def test_defaults_to_standard(self, uploads):
+        """Test that small or no inputs use the standard class."""
+        _upload(uploads, "small1", 10)
+        assert _resource_class(None, None) == "standard"
+        assert _resource_class(None, ["small1"]) == "standard"
+
+    def test_large_inputs_select_large(self, uploads):
+        """Test that inputs totalling the threshold select the large class."""
+        _upload(uploads, "half1", 600)
+        _upload(uploads, "half2", 600)
+        with patch("backend.tools.sandbox.LARGE_INPUT_BYTES", 1000):
+            assert _resource_class(None, ["half1"]) == "standard"
+            assert _resource_class(None, ["half1", "half2", "missing1"]) == "large"
+
+    def test_explicit_class_wins(self, uploads):
+        """Test that a requested class overrides the heuristic and is validated."""
+        _upload(uploads, "big1", 2000)
+        with patch("backend.tools.sandbox.LARGE_INPUT_BYTES", 1000):
+            assert _resource_class("standard", ["big1"]) == "standard"
+        with pytest.raises(ValueError):
+            _resource_class("gpu", None)
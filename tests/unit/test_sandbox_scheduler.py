@@ -0,0 +1,124 @@
+"""Unit tests for fair scheduling of sandbox executions across users."""
+
+import asyncio
+
+from backend.tools.sandbox_scheduler import FairScheduler
+
+
+class TestFairScheduler:
+    """Tests for per-user caps and fair slot hand-off."""
+
+    def test_per_user_limit_queues_extra_executions(self):
+        """Test that a user over the cap waits even while capacity is free."""
+
+        async def scenario():
+            scheduler = FairScheduler(capacity=10, per_user_limit=2)
+            await scheduler.acquire("a")
+            await scheduler.acquire("a")
+            third = asyncio.create_task(scheduler.acquire("a"))
+            await scheduler.acquire("b")
+            await asyncio.sleep(0)
+            waiting = not third.done()
+            during = scheduler.stats
+            scheduler.release("a")
+            await third
+            return waiting, during, scheduler.stats
+
+        waiting, during, after = asyncio.run(scenario())
+        assert waiting
+        assert during["throttled"] == 1
+        assert during["users"]["a"] == {"running": 2, "waiting": 1}
+        assert during["users"]["b"] == {"running": 1, "waiting": 0}
+        assert after["users"]["a"] == {"running": 2, "waiting": 0}
+        assert after["queue_wait_by_user"]["a"]["count"] == 3
+
+    def test_freed_slot_goes_to_user_with_fewest_running(self):
+        """Test that a busy user's earlier requests do not starve another user."""
+
+        async def scenario():
+            scheduler = FairScheduler(capacity=2, per_user_limit=10)
+            await scheduler.acquire("a")
+            await scheduler.acquire("a")
+            order = []
+
+            async def run(user):
+                await scheduler.acquire(user)
+                order.append(user)
+
+            tasks = [asyncio.create_task(run("a")) for _ in range(3)]
+            await asyncio.sleep(0)
+            tasks.append(asyncio.create_task(run("b")))
+            await asyncio.sleep(0)
+            scheduler.release("a")
+            await asyncio.sleep(0)
+            scheduler.release("a")
+            await asyncio.sleep(0)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            return order
+
+        assert asyncio.run(scenario()) == ["b", "a"]
+
+    def test_cancelled_waiter_gives_up_its_place(self):
+        """Test that a cancelled request neither blocks others nor leaks a slot."""
+
+        async def scenario():
+            scheduler = FairScheduler(capacity=1, per_user_limit=1)
+            await scheduler.acquire("a")
+            cancelled = asyncio.create_task(scheduler.acquire("b"))
+            queued = asyncio.create_task(scheduler.acquire("c"))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.gather(cancelled, return_exceptions=True)
+            scheduler.release("a")
+            await queued
+            scheduler.release("c")
+            return scheduler.stats
+
+        stats = asyncio.run(scenario())
+        assert stats["running"] == 0
+        assert stats["waiting"] == 0
+        assert stats["cancelled"] == 1
+        assert stats["admitted"] == 2
+
+    def test_requests_without_user_share_one_group(self):
+        """Test that executions without a user id are capped together."""
+
+        async def scenario():
+            scheduler = FairScheduler(capacity=10, per_user_limit=1)
+            await scheduler.acquire(None)
+            second = asyncio.create_task(scheduler.acquire(None))
+            await asyncio.sleep(0)
+            stats = scheduler.stats
+            second.cancel()
+            await asyncio.gather(second, return_exceptions=True)
+            return stats
+
+        stats = asyncio.run(scenario())
+        assert stats["users"]["anonymous"] == {"running": 1, "waiting": 1}
+
+    def test_reserved_containers_are_not_handed_out(self):
+        """Test that containers pinned by sessions shrink capacity but pinned runs still proceed."""
+
+        async def scenario():
+            scheduler = FairScheduler(capacity=2, per_user_limit=10)
+            scheduler.reserve()
+            await scheduler.acquire("a")
+            blocked = asyncio.create_task(scheduler.acquire("b"))
+            await scheduler.acquire("c", pinned=True)  # Runs on the reserved container
+            await asyncio.sleep(0)
+            during = (blocked.done(), scheduler.stats)
+            scheduler.release("c", pinned=True)
+            await asyncio.sleep(0)
+            still_blocked = not blocked.done()
+            scheduler.unreserve()
+            await blocked
+            return during, still_blocked, scheduler.stats
+
+        (done, during), still_blocked, after = asyncio.run(scenario())
+        assert not done and still_blocked
+        assert during["running"] == 2
+        assert during["reserved"] == 1
+        assert after["reserved"] == 0
+        assert after["users"]["b"] == {"running": 1, "waiting": 0}
@@ -0,0 +1,247 @@
+"""Unit tests for per-thread sticky sandbox sessions."""
+
+import asyncio
+import itertools
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from backend.tools.sandbox_sessions import RESET_COMMAND, SessionManager
+
+
+class _FakeContainer:
+    _ids = itertools.count(1)
+
+    def __init__(self, reset_exit_code: int = 0):
+        self.id = f"c{next(self._ids)}"
+        self.reset_exit_code = reset_exit_code
+        self.commands: list[list[str]] = []
+
+    def exec_run(self, cmd, **kwargs):
+        self.commands.append(cmd)
+        return SimpleNamespace(exit_code=self.reset_exit_code, output=b"")
+
+
+class _FakePool:
+    name = "standard"
+    max_size = 4
+    max_overflow = 0
+
+    def __init__(self, reset_exit_code: int = 0):
+        self.reset_exit_code = reset_exit_code
+        self.acquired = 0
+        self.released: list[tuple[_FakeContainer, bool]] = []
+        self.failed: list[_FakeContainer] = []
+
+    async def acquire(self, timeout=None):
+        self.acquired += 1
+        return SimpleNamespace(container=_FakeContainer(self.reset_exit_code), use_count=1)
+
+    async def release(self, pooled, discard=False, exec_failed=False):
+        if exec_failed:
+            self.failed.append(pooled.container)
+            return
+        self.released.append((pooled.container, discard))
+
+
+def _manager(pool: _FakePool, **kwargs) -> SessionManager:
+    kwargs.setdefault("maintenance_interval", 3600)
+    return SessionManager(pool, **kwargs)
+
+
+class TestSessionManager:
+    """Tests for SessionManager pinning, eviction and fallback."""
+
+    def test_same_thread_reuses_container(self):
+        """Test that a thread keeps its container while other threads get their own."""
+
+        async def scenario():
+            pool = _FakePool()
+            manager = _manager(pool)
+            leases = []
+            for thread_id in ("t1", "t1", "t2"):
+                lease = await manager.acquire(thread_id)
+                leases.append(lease)
+                await manager.release(lease)
+            return pool, manager.stats, leases
+
+        pool, stats, leases = asyncio.run(scenario())
+        assert leases[0].container is leases[1].container
+        assert leases[2].container is not leases[0].container
+        assert leases[0].session_id == "t1"
+        assert pool.acquired == 2
+        assert pool.released == []
+        assert stats["sessions"] == 2
+
+    def test_calls_on_one_thread_run_one_at_a_time(self):
+        """Test that concurrent calls for the same thread share one session serially."""
+
+        async def scenario():
+            pool = _FakePool()
+            manager = _manager(pool)
+            first = await manager.acquire("t1")
+            second = asyncio.create_task(manager.acquire("t1"))
+            await asyncio.sleep(0)
+            waiting = not second.done()
+            await manager.release(first)
+            lease = await second
+            await manager.release(lease)
+            return pool, waiting, first, lease
+
+        pool, waiting, first, lease = asyncio.run(scenario())
+        assert waiting
+        assert lease.container is first.container
+        assert pool.acquired == 1
+
+    def test_evicts_least_recently_used_session_when_full(self):
+        """Test that a new thread closes the oldest idle session at the cap."""
+
+        async def scenario():
+            pool = _FakePool()
+            manager = _manager(pool, max_sessions=2)
+            leases = {}
+            for thread_id in ("t1", "t2", "t1", "t3"):
+                leases[thread_id] = await manager.acquire(thread_id)
+                await manager.release(leases[thread_id])
+            return pool, manager.stats, leases
+
+        pool, stats, leases = asyncio.run(scenario())
+        assert pool.released == [(leases["t2"].container, False)]
+        assert leases["t2"].container.commands == [RESET_COMMAND]
+        assert stats["sessions"] == 2
+        assert stats["evicted"] == 1
+
+    def test_falls_back_to_stateless_when_all_sessions_busy(self):
+        """Test that a full, busy manager hands out a pooled container instead."""
+
+        async def scenario():
+            pool = _FakePool()
+            manager = _manager(pool, max_sessions=1)
+            held = await manager.acquire("t1")
+            lease = await manager.acquire("t2")
+            await manager.release(lease)
+            await manager.release(held)
+            return pool, manager.stats, lease
+
+        pool, stats, lease = asyncio.run(scenario())
+        assert lease.session_id is None
+        assert pool.released == [(lease.container, False)]
+        assert stats["fallbacks"] == 1
+
+    def test_idle_sessions_expire(self):
+        """Test that sessions idle past the TTL return their container to the pool."""
+
+        async def scenario():
+            pool = _FakePool()
+            manager = _manager(pool, idle_ttl=60)
+            lease = await manager.acquire("t1")
+            await manager.release(lease)
+            with patch(
+                "backend.tools.sandbox_sessions.time.monotonic",
+                return_value=lease.session.last_used_at + 61,
+            ):
+                await manager._expire_idle()
+            return pool, manager.stats, lease
+
+        pool, stats, lease = asyncio.run(scenario())
+        assert pool.released == [(lease.container, False)]
+        assert stats["sessions"] == 0
+        assert stats["expired"] == 1
+
+    def test_failed_reset_discards_container(self):
+        """Test that a container whose session cannot be reset is not reused."""
+
+        async def scenario():
+            pool = _FakePool(reset_exit_code=1)
+            manager = _manager(pool)
+            lease = await manager.acquire("t1")
+            await manager.release(lease)
+            await manager.shutdown()
+            return pool, lease
+
+        pool, lease = asyncio.run(scenario())
+        assert pool.released == [(lease.container, True)]
+
+    def test_exec_failure_ends_session(self):
+        """Test that a failed execution hands the container back for replacement."""
+
+        async def scenario():
+            pool = _FakePool()
+            manager = _manager(pool)
+            lease = await manager.acquire("t1")
+            lease.failed = True
+            await manager.release(lease)
+            retry = await manager.acquire("t1")
+            first_run = retry.first_run
+            await manager.release(retry)
+            return pool, manager.stats, lease, retry, first_run
+
+        pool, stats, lease, retry, first_run = asyncio.run(scenario())
+        assert pool.failed == [lease.container]
+        assert retry.container is not lease.container
+        assert first_run
+        assert stats["failed"] == 1
+        assert stats["sessions"] == 1
+
+    def test_other_resource_class_runs_stateless(self):
+        """Test that a lease from another class's pool bypasses sessions."""
+
+        async def scenario():
+            pool = _FakePool()
+            large = _FakePool()
+            manager = _manager(pool)
+            lease = await manager.acquire("t1", large)
+            await manager.release(lease)
+            return pool, large, manager.stats, lease
+
+        pool, large, stats, lease = asyncio.run(scenario())
+        assert lease.session_id is None
+        assert pool.acquired == 0
+        assert large.released == [(lease.container, False)]
+        assert stats["sessions"] == 0
+
+    def test_executions_hold_a_scheduler_slot(self):
+        """Test that each lease holds its user's slot until released."""
+
+        async def scenario():
+            pool = _FakePool()
+            manager = _manager(pool)
+            lease = await manager.acquire("t1", user_id="u1")
+            during = manager.scheduler_stats()["standard"]
+            await manager.release(lease)
+            after = manager.scheduler_stats()["standard"]
+            return during, after
+
+        during, after = asyncio.run(scenario())
+        assert during["running"] == 1
+        assert during["users"] == {"u1": {"running": 1, "waiting": 0}}
+        assert after["running"] == 0
+        assert after["users"] == {}
+
+    def test_idle_session_containers_are_not_scheduled(self):
+        """Test that an idle session's container is withheld from other users until it ends."""
+
+        async def scenario():
+            pool = _FakePool()
+            pool.max_size = 2
+            manager = _manager(pool)
+            opened = await manager.acquire("t1", user_id="u1")
+            await manager.release(opened)  # Idle, but still pins its container
+            other = await manager.acquire(None, user_id="u2")
+            blocked = asyncio.create_task(manager.acquire(None, user_id="u3"))
+            await asyncio.sleep(0)
+            resumed = await manager.acquire("t1", user_id="u1")  # Reuses the pinned container
+            during = (blocked.done(), pool.acquired, manager.scheduler_stats()["standard"])
+            await manager.release(resumed)
+            await manager.end("t1")
+            third = await blocked
+            for lease in (other, third):
+                await manager.release(lease)
+            return during, manager.scheduler_stats()["standard"]
+
+        (done, acquired, during), after = asyncio.run(scenario())
+        assert not done
+        assert acquired == 2
+        assert during["reserved"] == 1
+        assert during["users"]["u3"] == {"running": 0, "waiting": 1}
+        assert after["running"] == 0
+        assert after["reserved"] == 0
@@ -0,0 +1,102 @@
+"""Unit tests for streaming sandbox output as tool_call_progress events."""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from backend.tools.sandbox_stream import ProgressForwarder, exec_with_progress
+
+
+class _FakeAPI:
+    def __init__(self, chunks, delay=0.0, exit_code=0):
+        self.chunks = chunks
+        self.delay = delay
+        self.exit_code = exit_code
+        self.started = False
+
+    def exec_create(self, container_id, cmd, **kwargs):
+        return {"Id": "e1"}
+
+    def exec_start(self, exec_id, stream=False, demux=False):
+        assert stream and demux
+        self.started = True
+        for chunk in self.chunks:
+            if self.delay:
+                time.sleep(self.delay)
+            yield chunk
+
+    def exec_inspect(self, exec_id):
+        return {"Running": False, "ExitCode": self.exit_code}
+
+
+def _container(api: _FakeAPI):
+    return SimpleNamespace(id="c1", client=SimpleNamespace(api=api))
+
+
+def _run(api: _FakeAPI, max_bytes=1024, interval_ms=1000):
+    events = []
+    forwarder = ProgressForwarder(events.append, "call-1", max_bytes=max_bytes)
+
+    async def scenario():
+        return await exec_with_progress(_container(api), ["python"], forwarder, interval_ms)
+
+    return asyncio.run(scenario()), events
+
+
+class TestExecWithProgress:
+    """Tests for exec_with_progress and ProgressForwarder."""
+
+    def test_collects_full_output_and_exit_code(self):
+        """Test that the complete output and exit status are returned."""
+        api = _FakeAPI([(b"a\n", None), (None, b"oops\n"), (b"b\n", None)], exit_code=3)
+        result, events = _run(api)
+        assert result.exit_code == 3
+        assert result.stdout == b"a\nb\n"
+        assert result.stderr == b"oops\n"
+        assert [(e["stream"], e["text"]) for e in events] == [("stdout", "a\nb\n"), ("stderr", "oops\n")]
+        assert all(e["type"] == "tool_call_progress" and e["id"] == "call-1" for e in events)
+
+    def test_flushes_on_interval_while_running(self):
+        """Test that output is forwarded before the execution finishes."""
+        api = _FakeAPI([(b"1\n", None), (b"2\n", None)], delay=0.1)
+        _, events = _run(api, interval_ms=10)
+        assert [e["text"] for e in events] == ["1\n", "2\n"]
+
+    def test_caps_forwarded_output(self):
+        """Test that live output stops at max_bytes with a single notice."""
+        api = _FakeAPI([(b"x" * 6, None)] * 3)
+        result, events = _run(api, max_bytes=10)
+        assert result.stdout == b"x" * 18
+        assert events[0]["text"] == "x" * 10
+        assert [e.get("truncated") for e in events] == [None, True]
+
+    def test_keeps_multibyte_characters_split_across_chunks(self):
+        """Test that UTF-8 sequences split between chunks decode correctly."""
+        data = "数据".encode("utf-8")
+        api = _FakeAPI([(data[:2], None), (data[2:], None)])
+        _, events = _run(api)
+        assert events[0]["text"] == "数据"
+
+    def test_failed_forwarder_cancels_exec(self):
+        """Test that an error while forwarding cancels and reaps the exec task."""
+        api = _FakeAPI([(b"1\n", None), (b"2\n", None)], delay=0.2)
+
+        def broken(event):
+            raise RuntimeError("client went away")
+
+        forwarder = ProgressForwarder(broken, "call-1", max_bytes=1024)
+        leaked = []
+
+        async def scenario():
+            asyncio.get_running_loop().set_exception_handler(lambda loop, ctx: leaked.append(ctx))
+            try:
+                await exec_with_progress(_container(api), ["python"], forwarder, 0)
+            except RuntimeError as e:
+                error = e
+            pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            return error, pending
+
+        error, pending = asyncio.run(scenario())
+        assert str(error) == "client went away"
+        assert pending == []
+        assert leaked == []
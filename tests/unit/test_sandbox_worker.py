@@ -0,0 +1,157 @@
+"""Unit tests for the in-container sandbox worker and its client."""
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+SANDBOX_DIR = Path(__file__).resolve().parents[2] / "dockerfiles" / "sandbox"
+
+
+@pytest.fixture(params=["fork", "inline"])
+def worker_env(request, tmp_path):
+    """Start a worker on a temporary socket and return the client env."""
+    env = {
+        **os.environ,
+        "SANDBOX_WORKER_SOCKET": str(tmp_path / "worker.sock"),
+        "SANDBOX_WORKER_WORKDIR": str(tmp_path),
+        "SANDBOX_WORKER_PRELOAD": "json",
+        "SANDBOX_WORKER_MODE": request.param,
+    }
+    proc = subprocess.Popen(
+        [sys.executable, str(SANDBOX_DIR / "worker.py")],
+        env=env,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10
+    while not (tmp_path / "worker.sock").exists():
+        assert time.monotonic() < deadline, "worker did not start"
+        time.sleep(0.01)
+    yield env
+    proc.kill()
+    proc.wait()
+
+
+def _run(code: str, env: dict, *options: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-S", str(SANDBOX_DIR / "client.py"), *options, code],
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+
+
+class TestSandboxWorker:
+    """Tests for worker.py executed through client.py."""
+
+    def test_stdout_and_exit_code(self, worker_env):
+        """Test that output and exit status match python -c."""
+        result = _run("import os, sys\nprint('hi')\nos.system('echo sub')\nsys.exit(3)", worker_env)
+        assert result.stdout == "hi\nsub\n"
+        assert result.returncode == 3
+
+    def test_exception_traceback(self, worker_env):
+        """Test that uncaught exceptions exit 1 with a python -c style traceback."""
+        result = _run("raise ValueError('boom')", worker_env)
+        assert result.returncode == 1
+        assert 'File "<string>", line 1' in result.stderr
+        assert "ValueError: boom" in result.stderr
+        assert "worker.py" not in result.stderr
+
+    def test_each_call_gets_fresh_namespace(self, worker_env):
+        """Test that variables do not leak between executions."""
+        assert _run("x = 1", worker_env).returncode == 0
+        result = _run("print(x)", worker_env)
+        assert result.returncode == 1
+        assert "NameError" in result.stderr
+
+    def test_fork_mode_isolates_process_state(self, worker_env):
+        """Test that a forked child cannot change state seen by later calls."""
+        if worker_env["SANDBOX_WORKER_MODE"] != "fork":
+            pytest.skip("state isolation is only guaranteed in fork mode")
+        _run("import json; json.leaked = True", worker_env)
+        result = _run("import json; print(hasattr(json, 'leaked'))", worker_env)
+        assert result.stdout == "False\n"
+
+    def test_fork_mode_survives_hard_exit(self, worker_env):
+        """Test that os._exit only ends the child."""
+        if worker_env["SANDBOX_WORKER_MODE"] != "fork":
+            pytest.skip("a hard exit ends the inline worker")
+        result = _run("import os; print('bye', flush=True); os._exit(5)", worker_env)
+        assert result.stdout == "bye\n"
+        assert result.returncode == 5
+        assert _run("print('still here')", worker_env).stdout == "still here\n"
+
+    def test_output_is_streamed_while_running(self, worker_env):
+        """Test that output reaches the client before the code finishes."""
+        proc = subprocess.Popen(
+            [
+                sys.executable, "-S", str(SANDBOX_DIR / "client.py"),
+                "import time\nprint('started', flush=True)\ntime.sleep(1)\nprint('done')",
+            ],
+            env=worker_env,
+            stdout=subprocess.PIPE,
+        )
+        try:
+            assert proc.stdout.readline() == b"started\n"
+            assert proc.poll() is None
+            assert proc.stdout.read() == b"done\n"
+            assert proc.wait(timeout=30) == 0
+        finally:
+            proc.kill()
+            proc.wait()
+            proc.stdout.close()
+
+    def test_session_keeps_state_between_calls(self, worker_env):
+        """Test that a session keeps variables while stateless calls stay fresh."""
+        assert _run("x = 41", worker_env, "--session", "t1").returncode == 0
+        assert _run("print(x + 1)", worker_env, "--session", "t1").stdout == "42\n"
+        assert "NameError" in _run("print(x)", worker_env, "--session", "t2").stderr
+        assert "NameError" in _run("print(x)", worker_env).stderr
+
+    def test_reset_ends_sessions(self, worker_env):
+        """Test that --reset drops all session state."""
+        _run("x = 1", worker_env, "--session", "t1")
+        reset = subprocess.run(
+            [sys.executable, "-S", str(SANDBOX_DIR / "client.py"), "--reset"],
+            env=worker_env, capture_output=True, timeout=30,
+        )
+        assert reset.returncode == 0
+        assert "NameError" in _run("print(x)", worker_env, "--session", "t1").stderr
+
+    def test_session_restarts_after_hard_exit(self, worker_env):
+        """Test that a crashed session reports lost state and starts over."""
+        _run("x = 1", worker_env, "--session", "t1")
+        result = _run("import os; os._exit(0)", worker_env, "--session", "t1")
+        assert result.returncode == 1
+        assert "state was lost" in result.stderr
+        assert _run("print('x' in dir())", worker_env, "--session", "t1").stdout == "False\n"
+
+    def test_falls_back_to_python_c_without_worker(self, tmp_path):
+        """Test that the client runs the code itself when no worker is listening."""
+        env = {**os.environ, "SANDBOX_WORKER_SOCKET": str(tmp_path / "missing.sock")}
+        result = _run("print('direct')", env)
+        assert result.stdout == "direct\n"
+        assert result.returncode == 0
+
+    def test_clean_output_empties_output_dir_before_running(self, tmp_path):
+        """Test that --clean-output removes files left by a previous execution."""
+        output = tmp_path / "output"
+        (output / "nested").mkdir(parents=True)
+        (output / "nested" / "old.txt").write_text("old")
+        (output / ".hidden").write_text("old")
+        (output / "report.pptx").write_text("old")
+        env = {
+            **os.environ,
+            "SANDBOX_WORKER_SOCKET": str(tmp_path / "missing.sock"),
+            "SANDBOX_OUTPUT_DIR": str(output),
+        }
+        code = f"import os; print(sorted(os.listdir({str(output)!r})))"
+        assert _run(code, env).stdout != "[]\n"
+        result = _run(code, env, "--clean-output")
+        assert result.stdout == "[]\n"
+        assert output.is_dir()
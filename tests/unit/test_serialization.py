@@ -0,0 +1,39 @@
+"""Unit tests for SSE payload serialization."""
+
+import json
+
+import pytest
+
+from backend import serialization
+
+
+@pytest.fixture(autouse=True)
+def restore_backend():
+    original = serialization.get_serializer_name()
+    yield
+    serialization.set_serializer(original)
+
+
+class TestSerialization:
+    """Tests for the pluggable JSON serializer."""
+
+    @pytest.mark.parametrize("backend", list(serialization.SERIALIZERS))
+    def test_backends_round_trip_unicode(self, backend):
+        """Test that every backend keeps non-ASCII text unescaped."""
+        serialization.set_serializer(backend)
+        data = {"text": "季度报告", "n": [1, 2.5, None, True]}
+        encoded = serialization.dumps(data)
+        assert "季度报告" in encoded
+        assert json.loads(encoded) == data
+
+    def test_unknown_backend_falls_back_to_stdlib(self):
+        """Test that an unavailable backend selects stdlib json."""
+        assert serialization.set_serializer("does-not-exist") == "json"
+
+    def test_orjson_defers_unsupported_types_to_stdlib(self):
+        """Test that values orjson rejects still serialize like stdlib."""
+        if "orjson" not in serialization.SERIALIZERS:
+            pytest.skip("orjson not installed")
+        serialization.set_serializer("orjson")
+        big = 2**70
+        assert json.loads(serialization.dumps({"v": big})) == {"v": big}
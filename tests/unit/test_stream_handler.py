@@ -0,0 +1,119 @@
+"""Unit tests for SSE stream helpers."""
+
+import asyncio
+
+from backend.stream_handler import (
+    CoalesceConfig,
+    CoalesceStats,
+    _agent_events,
+    coalesce_text_deltas,
+)
+
+
+async def _source(items: list[tuple[str, dict]], delay: float = 0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+def _run(items, config, delay=0.0):
+    stats = CoalesceStats()
+
+    async def collect():
+        return [e async for e in coalesce_text_deltas(_source(items, delay), config, stats)]
+
+    return asyncio.run(collect()), stats
+
+
+class TestCoalesceTextDeltas:
+    """Tests for the text_delta coalescing stage."""
+
+    def test_merges_consecutive_text(self):
+        """Test that adjacent text deltas become one frame."""
+        items = [("text_delta", {"text": "Hel"}), ("text_delta", {"text": "lo"}), ("done", {})]
+        events, stats = _run(items, CoalesceConfig(interval_ms=1000))
+        assert events == [("text_delta", {"text": "Hello"}), ("done", {})]
+        assert stats.frames_saved == 1
+
+    def test_flushes_before_non_text_events(self):
+        """Test that ordering around non-text events is preserved."""
+        items = [
+            ("text_delta", {"text": "a"}),
+            ("tool_call_start", {"id": "1"}),
+            ("text_delta", {"text": "b"}),
+        ]
+        events, _ = _run(items, CoalesceConfig(interval_ms=1000))
+        assert events == [
+            ("text_delta", {"text": "a"}),
+            ("tool_call_start", {"id": "1"}),
+            ("text_delta", {"text": "b"}),
+        ]
+
+    def test_flushes_at_byte_limit(self):
+        """Test that reaching max_bytes flushes immediately."""
+        items = [("text_delta", {"text": "abc"})] * 4
+        events, stats = _run(items, CoalesceConfig(interval_ms=1000, max_bytes=6))
+        assert events == [("text_delta", {"text": "abcabc"})] * 2
+        assert stats.text_frames_out == 2
+
+    def test_flushes_on_interval(self):
+        """Test that pending text is flushed while the source is idle."""
+        items = [("text_delta", {"text": "x"}), ("text_delta", {"text": "y"})]
+        events, _ = _run(items, CoalesceConfig(interval_ms=10), delay=0.05)
+        assert events == [("text_delta", {"text": "x"}), ("text_delta", {"text": "y"})]
+
+
+    def test_closing_consumer_reaps_pump_and_source(self):
+        """Test that stopping early cancels the pump task and closes the source."""
+        closed = []
+
+        async def endless():
+            try:
+                while True:
+                    await asyncio.sleep(0)
+                    yield "tool_call_start", {"id": "1"}
+            finally:
+                closed.append(True)
+
+        async def scenario():
+            stream = coalesce_text_deltas(endless(), CoalesceConfig(interval_ms=1000), CoalesceStats())
+            assert await stream.__anext__() == ("tool_call_start", {"id": "1"})
+            await stream.aclose()
+            others = asyncio.all_tasks() - {asyncio.current_task()}
+            return others
+
+        assert asyncio.run(scenario()) == set()
+        assert closed == [True]
+
+
+class _FakeAgent:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.stream_mode = None
+
+    async def astream(self, stream_input, stream_mode=None, subgraphs=False, config=None):
+        self.stream_mode = stream_mode
+        for chunk in self.chunks:
+            yield chunk
+
+
+class TestToolCallProgress:
+    """Tests for forwarding custom tool output as tool_call_progress events."""
+
+    def test_custom_progress_becomes_sse_event(self):
+        """Test that tool_call_progress writes are emitted and other custom data is ignored."""
+        agent = _FakeAgent([
+            ((), "custom", {"type": "tool_call_progress", "id": "c1", "stream": "stdout", "text": "hi\n"}),
+            ((), "custom", {"type": "something_else"}),
+        ])
+
+        async def collect():
+            return [e async for e in _agent_events(agent, "t1", "run it", None)]
+
+        events = asyncio.run(collect())
+        assert "custom" in agent.stream_mode
+        assert events == [
+            ("tool_call_progress", {"id": "c1", "stream": "stdout", "text": "hi\n"}),
+            ("done", {}),
+        ]
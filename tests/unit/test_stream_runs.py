@@ -0,0 +1,176 @@
+"""Unit tests for background stream runs and the SSE replay log."""
+
+import asyncio
+
+from backend.stream_handler import EventCounter, _format_sse
+from backend.stream_runs import StreamRunManager
+
+
+def _source(texts: list[str], gate: asyncio.Event | None = None):
+    """Build a source factory yielding text_delta events then done."""
+
+    def factory(counter: EventCounter):
+        async def gen():
+            for text in texts:
+                if gate is not None:
+                    await gate.wait()
+                yield _format_sse("text_delta", {"text": text}, counter)
+            yield _format_sse("done", {}, counter)
+
+        return gen()
+
+    return factory
+
+
+async def _collect(agen) -> list[dict]:
+    return [event async for event in agen]
+
+
+class TestStreamRunManager:
+    """Tests for StreamRunManager and StreamRun replay."""
+
+    def test_subscribe_replays_full_run(self):
+        """Test that a fresh subscriber receives every event in order."""
+
+        async def scenario():
+            manager = StreamRunManager()
+            run = manager.start("t1", "u1", _source(["a", "b"]))
+            events = await _collect(run.subscribe())
+            await manager.shutdown()
+            return events
+
+        events = asyncio.run(scenario())
+        assert [e["event"] for e in events] == ["text_delta", "text_delta", "done"]
+        assert [e["id"] for e in events] == ["1", "2", "3"]
+
+    def test_last_event_id_replays_only_tail(self):
+        """Test that resuming after an ID skips already delivered events."""
+
+        async def scenario():
+            manager = StreamRunManager()
+            run = manager.start("t1", "u1", _source(["a", "b", "c"]))
+            await run.task
+            events = await _collect(run.subscribe(last_event_id=2))
+            await manager.shutdown()
+            return events
+
+        events = asyncio.run(scenario())
+        assert [e["id"] for e in events] == ["3", "4"]
+
+    def test_run_survives_subscriber_disconnect(self):
+        """Test that closing a subscriber does not cancel the run."""
+
+        async def scenario():
+            manager = StreamRunManager()
+            gate = asyncio.Event()
+            run = manager.start("t1", "u1", _source(["a", "b"], gate))
+            gate.set()
+            subscriber = run.subscribe()
+            first = await subscriber.__anext__()
+            await subscriber.aclose()
+            await run.task
+            rest = await _collect(run.subscribe(last_event_id=int(first["id"])))
+            await manager.shutdown()
+            return run, rest
+
+        run, rest = asyncio.run(scenario())
+        assert run.done
+        assert [e["id"] for e in rest] == ["2", "3"]
+
+    def test_ring_buffer_is_bounded(self):
+        """Test that only the newest events are retained."""
+
+        async def scenario():
+            manager = StreamRunManager(max_events=3)
+            run = manager.start("t1", "u1", _source(["a", "b", "c", "d"]))
+            await run.task
+            events = await _collect(run.subscribe(last_event_id=0))
+            await manager.shutdown()
+            return events
+
+        events = asyncio.run(scenario())
+        assert [e["id"] for e in events] == ["3", "4", "5"]
+
+    def test_eviction_warning_only_for_missed_events(self, caplog):
+        """Test that resuming from an earlier run's ID only warns if this run lost events."""
+
+        async def scenario(max_events):
+            manager = StreamRunManager(max_events=max_events)
+            manager.start("t1", "u1", _source(["x", "y"]))  # IDs 1-3
+            await manager.get("t1").task
+            run = manager.start("t1", "u1", _source(["a", "b"]))  # IDs 4-6
+            await run.task
+            events = await _collect(run.subscribe(last_event_id=1))
+            await manager.shutdown()
+            return events
+
+        with caplog.at_level("WARNING", logger="backend.stream_runs"):
+            events = asyncio.run(scenario(max_events=3))
+        assert [e["id"] for e in events] == ["4", "5", "6"]
+        assert "lost" not in caplog.text
+
+        with caplog.at_level("WARNING", logger="backend.stream_runs"):
+            events = asyncio.run(scenario(max_events=2))
+        assert [e["id"] for e in events] == ["5", "6"]
+        assert "lost 1 events" in caplog.text
+
+    def test_new_run_supersedes_and_continues_ids(self):
+        """Test that a new run cancels the active one and continues its IDs."""
+
+        async def scenario():
+            manager = StreamRunManager()
+            gate = asyncio.Event()
+            first = manager.start("t1", "u1", _source(["a"], gate))
+            await asyncio.sleep(0)
+            second = manager.start("t1", "u1", _source(["b"]))
+            events = await _collect(second.subscribe())
+            await asyncio.gather(first.task, return_exceptions=True)
+            await manager.shutdown()
+            return first, events
+
+        first, events = asyncio.run(scenario())
+        assert first.task.cancelled()
+        # The superseded run ended with error + done (IDs 1-2)
+        assert [e["id"] for e in events] == ["3", "4"]
+
+    def test_cancel_ends_attached_streams(self):
+        """Test that cancelling a run sends subscribers a terminal error and done frame."""
+
+        async def scenario():
+            manager = StreamRunManager()
+            gate = asyncio.Event()
+            run = manager.start("t1", "u1", _source(["a"], gate))
+            subscriber = asyncio.create_task(_collect(run.subscribe()))
+            await asyncio.sleep(0)
+            assert run.cancel("Cancelled by user")
+            events = await subscriber
+            await asyncio.gather(run.task, return_exceptions=True)
+            await manager.shutdown()
+            return run, events
+
+        run, events = asyncio.run(scenario())
+        assert run.task.cancelled()
+        assert [e["event"] for e in events] == ["error", "done"]
+        assert '"cancelled":true' in events[0]["data"].replace(" ", "")
+        assert not run.cancel()
+
+    def test_source_without_done_is_terminated(self):
+        """Test that a source that raises still ends the stream with error + done."""
+
+        def factory(counter: EventCounter):
+            async def gen():
+                yield _format_sse("text_delta", {"text": "a"}, counter)
+                raise RuntimeError("boom")
+
+            return gen()
+
+        async def scenario():
+            manager = StreamRunManager()
+            run = manager.start("t1", "u1", factory)
+            events = await _collect(run.subscribe())
+            await manager.shutdown()
+            return events
+
+        events = asyncio.run(scenario())
+        assert [e["event"] for e in events] == ["text_delta", "error", "done"]
+        assert [e["id"] for e in events] == ["1", "2", "3"]
@@ -0,0 +1,70 @@
+"""Unit tests for the authenticated-user cache."""
+
+import time
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from backend.auth.cache import UserCache
+from backend.auth.models import UserInfo, UserRole, UserStatus
+
+
+def _user() -> UserInfo:
+    return UserInfo(
+        id=uuid.uuid4(),
+        username="alice",
+        role=UserRole.USER,
+        status=UserStatus.ACTIVE,
+        created_at=datetime.now(timezone.utc),
+    )
+
+
+class TestUserCache:
+    """Tests for UserCache."""
+
+    def test_hit_and_miss(self):
+        """Test that cached users are returned and counted."""
+        cache = UserCache(max_size=10, ttl_seconds=60)
+        user = _user()
+        assert cache.get(user.id) is None
+        cache.set(user)
+        assert cache.get(user.id) == user
+        assert cache.stats["hits"] == 1
+        assert cache.stats["misses"] == 1
+
+    def test_entries_expire_after_ttl(self):
+        """Test that entries are dropped once their TTL has passed."""
+        cache = UserCache(max_size=10, ttl_seconds=5)
+        user = _user()
+        cache.set(user)
+        with patch("backend.auth.cache.time.monotonic", return_value=time.monotonic() + 6):
+            assert cache.get(user.id) is None
+
+    def test_least_recently_used_is_evicted(self):
+        """Test LRU eviction when the cache is full."""
+        cache = UserCache(max_size=2, ttl_seconds=60)
+        a, b, c = _user(), _user(), _user()
+        cache.set(a)
+        cache.set(b)
+        cache.get(a.id)  # a is now most recently used
+        cache.set(c)
+        assert cache.get(b.id) is None
+        assert cache.get(a.id) == a
+        assert cache.get(c.id) == c
+
+    def test_invalidate(self):
+        """Test explicit invalidation."""
+        cache = UserCache(max_size=10, ttl_seconds=60)
+        user = _user()
+        cache.set(user)
+        cache.invalidate(user.id)
+        assert cache.get(user.id) is None
+        assert cache.stats["invalidations"] == 1
+
+    def test_zero_ttl_disables_cache(self):
+        """Test that a zero TTL turns caching off."""
+        cache = UserCache(max_size=10, ttl_seconds=0)
+        user = _user()
+        cache.set(user)
+        assert not cache.enabled
+        assert cache.get(user.id) is None